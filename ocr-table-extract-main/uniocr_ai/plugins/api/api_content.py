@@ -2,39 +2,159 @@
 import os
 
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
-from flask import make_response
 import json
 import shutil
 import time
 import traceback
+from pathlib import Path
 
 from onbid.merge_by_serial import merge_by_serial         # 일련번호와 감정평가액 컬럼 기준
 from onbid.concat_table import concat_table               # 여러 페이지에 걸쳐 나누어진 표 데이터 병합
 from onbid.merge_price_empty import merge_if_price_empty  # 감정평가액이 비어있으면 아래 행과 병합
 from onbid.extract_final_result import create_final_json
-from ocr.ocr import ocr_immovable, ocr_movable
-from check_pdf import open_pdf, locked_pdf
-from common_module import Status, message, write_log
-from file_manager import appraisal_json_path, source_image, detectron_json_path, source_original, source_original2, title_table_result, final_result_path
-from preprocess_image import convert_tiff_to_png, convert_gif_to_png, correct_skew, dec_to_image
-from to_image import to_image
+from ocr.ocr import immovable_page_ocr, movable_page_ocr, ocr_immovable, ocr_movable, prefetch_immovable_page, prefetch_movable
+from check_pdf import fitz_lock, open_pdf, locked_pdf
+from common_module import Status, message, read_file, write_log
+from file_manager import appraisal_json_path, source_image, detectron_json_path, source_original, source_original2, title_table_result, final_result_path, ocr_result_meta, ocr_result_PDF2
+from file_manager import page_table_structure_path as structure_path
+from preprocess_image import convert_tiff_to_png, convert_gif_to_png, deskew, dec_to_image
+from page_images import PageImages
+from result_cache import CACHE_ENABLED, result_cache
+from artifact_writer import artifact_writer
+from to_image import PageStream
 from dbquery import error_insert
-from detectron2_deploy.detect_crop import detection_request
 from configs import etc_config, tatr_config, ocr_config, conv_file_ext, pdf_config
 from onbid.extract_appraisal_data import extract_appraisal_info
 from onbid.extract_location import location_extractor
 from onbid.extract_titles import group_consecutive_pages
+from onbid.page_triage import TRIAGE_ENABLED, PageTriage
 from onbid.llama_postpro import post_process_json_file
 from onbid.movable_text_pdf_json import movable_text_pdf_json
-from tatr.inference import infer as tatr
 from onbid.json_postprocessor import normalize_date_fields_in_json
 from onbid.json_postprocessor import normalize_price_fields_in_json
 from tatr.join_text import join_table_structure_with_pdf_text
 from wf.conv_pdf import gen_pdf_doc
 from visualization import *
 
+def run_task(*param):
+    '''원본 파일을 읽고 api_task 수행 (작업 스레드 또는 워커 프로세스에서 실행)
+    같은 파일 내용 + propertyType + 모델/설정 버전의 결과가 캐시에 있으면 api_task 없이 돌려준다'''
+    file_type, orgTimeStr, oid, result_save_path, file_basename, original_file_path, property_type, use_cache = param
+    task = param[:-1]
+
+    dec_file = read_file(original_file_path)
+    if not dec_file:
+        write_log('파일이 올바르지 않습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
+        return response_error_db('E918', 'atchmnflPath', oid)
+
+    cache_key = result_cache.key(dec_file, property_type) if CACHE_ENABLED and use_cache else None
+    if cache_key:
+        response_message = cached_result(cache_key, *task)
+        if response_message:
+            return response_message
+
+    # 페이지 이미지는 작업이 끝날 때까지 메모리(넘치면 임시 파일)에 두고 단계 사이에 넘긴다
+    with PageImages() as page_images:
+        try:
+            response_message = api_task(file_type, orgTimeStr, dec_file, oid, result_save_path, file_basename, original_file_path, property_type, page_images)
+        finally:
+            # 작업이 끝났다고 응답하기 전에 디버그/감사 JSON 저장 완료 (워커 프로세스는 atexit 없이 끝날 수 있다)
+            if artifact_writer.enabled:
+                artifact_writer.flush()
+
+    if cache_key and response_message['resultCode'] == 'E000':
+        cache_result(cache_key, *task, response_message)
+    return response_message
+
+
+def cached_result(cache_key, *param):
+    '''캐시된 결과 파일을 이번 요청의 경로로 복사하고 oid 등 요청별 값만 바꿔서 응답, 캐시에 없으면 None'''
+    file_type, orgTimeStr, oid, result_save_path, file_basename, original_file_path, property_type = param
+
+    entry_dir, entry = result_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    try:
+        with open(os.path.join(entry_dir, 'result.json'), 'r', encoding='utf-8') as f:
+            result = json.load(f)
+
+        text_pdf = None
+        if 'result.pdf' in entry['files']:
+            text_pdf = ocr_result_PDF2(orgTimeStr, oid)
+            shutil.copyfile(os.path.join(entry_dir, 'result.pdf'), text_pdf)
+            if file_type != 'pdf':  # 변환 파일은 원본 경로에 텍스트PDF 저장
+                shutil.copyfile(text_pdf, original_file_path.replace(file_type, 'pdf'))
+        if 'meta.json' in entry['files']:
+            shutil.copyfile(os.path.join(entry_dir, 'meta.json'), ocr_result_meta(orgTimeStr, oid))
+
+        result['oid'] = oid
+        result['doc_id'] = source_original2(orgTimeStr, oid)
+        if property_type == 'movable':
+            result['file_name'] = Path(text_pdf or original_file_path).stem + '.json'
+        else:
+            result['origin_pdf_path'] = original_file_path
+            figure_savepath = os.path.join(result_save_path, file_basename)
+            for k, (suffix, image) in enumerate(zip(entry['figures'], result['image_paths'])):
+                image['path'] = figure_savepath + suffix
+                shutil.copyfile(os.path.join(entry_dir, f'figure_{k}.png'), image['path'])
+
+        json_savepath = os.path.join(result_save_path, file_basename) + '.json'
+        with open(json_savepath, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    except (OSError, ValueError, KeyError) as e:
+        write_log(f'[결과 캐시] 캐시 결과 복원 실패, 다시 처리합니다: {e}', etc_config['LOG_LEVEL_WARNING'], oid)
+        return None
+
+    write_log(f'[결과 캐시] 같은 문서의 결과 사용 (처음 처리한 oid: {entry["oid"]}) {json_savepath}', etc_config['LOG_LEVEL_INFO'], oid)
+    response_message = {
+        'resultCode': 'E000',
+        'resultMessage': message('E000'),
+        'savePath': json_savepath
+    }
+    return response_message
+
+
+def cache_result(cache_key, *param):
+    '''성공한 작업의 최종 JSON, OCR 메타, 텍스트 PDF, 그림 이미지를 캐시에 저장 (실패해도 응답에는 영향 없음)'''
+    file_type, orgTimeStr, oid, result_save_path, file_basename, original_file_path, property_type, response_message = param
+
+    try:
+        files = {'result.json': response_message['savePath']}
+        text_pdf = ocr_result_PDF2(orgTimeStr, oid)
+        if os.path.exists(text_pdf):
+            files['result.pdf'] = text_pdf
+        elif file_type != 'pdf' and os.path.exists(original_file_path.replace(file_type, 'pdf')):
+            files['result.pdf'] = original_file_path.replace(file_type, 'pdf')
+        meta_json = ocr_result_meta(orgTimeStr, oid)
+        if os.path.exists(meta_json):
+            files['meta.json'] = meta_json
+
+        figures = []
+        if property_type == 'immovable':
+            with open(response_message['savePath'], 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            figure_savepath = os.path.join(result_save_path, file_basename)
+            for k, image in enumerate(result['image_paths']):
+                files[f'figure_{k}.png'] = image['path']
+                figures.append(image['path'][len(figure_savepath):])
+
+        entry = {
+            'oid': oid,
+            'property_type': property_type,
+            'file_type': file_type,
+            'created': orgTimeStr.strftime('%Y-%m-%d %H:%M:%S'),
+            'files': list(files),
+            'figures': figures,
+        }
+        if result_cache.put(cache_key, files, entry):
+            write_log(f'[결과 캐시] 저장 {cache_key}', etc_config['LOG_LEVEL_INFO'], oid)
+    except (OSError, ValueError, KeyError) as e:
+        write_log(f'[결과 캐시] 저장 실패: {e}', etc_config['LOG_LEVEL_WARNING'], oid)
+
+
 def api_task(*param):
-    file_type, orgTimeStr, dec_file, oid, result_save_path, file_basename, original_file_path, property_type = param
+    file_type, orgTimeStr, dec_file, oid, result_save_path, file_basename, original_file_path, property_type, page_images = param
 
     # 서버에도 원본 파일 저장 여부
     if ocr_config['SOURCE_CREATE'] == 'True':
@@ -57,6 +177,7 @@ def api_task(*param):
         originalSavePath = pdf_path
 
     pdf_doc = None
+    page_stream = None
     scale = 1.0
     rotate = dict()
 
@@ -65,15 +186,21 @@ def api_task(*param):
         image_save_path = source_image(orgTimeStr, 0, file_type, orgFileName)
         pdf_status = [Status.RAW]
 
+        image = dec_to_image(dec_file)
         try:
-            angle = correct_skew(image_save_path, dec_to_image(dec_file))
+            angle, image = deskew(image)
         except:
+            angle = 0
             response_error_db('E202', 'correct_skew', oid)
         if angle:
+            page_images.put(image_save_path, image)
             write_log(f'image saved, {angle}˚ rotated',etc_config['LOG_LEVEL_INFO'], oid)
         else:
             try:
-                shutil.copy(originalSavePath, image_save_path)
+                # 보정하지 않은 이미지는 보관할 때 원본 파일을 그대로 복사
+                page_images.put(image_save_path, image, write=False)
+                if page_images.keep_files:
+                    shutil.copy(originalSavePath, image_save_path)
                 write_log(f'image saved.', etc_config['LOG_LEVEL_INFO'], oid)
             except Exception as err:
                 write_log(str(err), etc_config['LOG_LEVEL_ERROR'], oid)
@@ -85,7 +212,7 @@ def api_task(*param):
         pdf_status = [Status.RAW]
         try:
             image_save_path = source_image(orgTimeStr, 0, 'png', orgFileName)
-            convert_gif_to_png(originalSavePath, image_save_path, oid)
+            convert_gif_to_png(originalSavePath, image_save_path, oid, page_images)
             image_path_list = [image_save_path]
         except:
             write_log(f'[GIF → JPG] 실패 {originalSavePath}', etc_config['LOG_LEVEL_ERROR'], oid)
@@ -93,7 +220,7 @@ def api_task(*param):
 
     elif file_type == 'tiff' or file_type == 'tif':
         try:
-            image_path_list = convert_tiff_to_png(originalSavePath, orgTimeStr, orgFileName, oid)
+            image_path_list = convert_tiff_to_png(originalSavePath, orgTimeStr, orgFileName, oid, page_images)
             pdf_status = [Status.RAW] * len(image_path_list)
         except:
             write_log(f'[TIFF → JPG] 실패 {originalSavePath}', etc_config['LOG_LEVEL_ERROR'], oid)
@@ -110,24 +237,39 @@ def api_task(*param):
         if locked_pdf(pdf_doc):
             return response_error_db('E199', '암호화된 PDF', oid)
         
-        try:
-            scale = float(pdf_config['PDF_TO_IMAGE_SCALE'])
-            image_path_list, rotate, pdf_status = to_image(pdf_doc, orgTimeStr, orgFileName, oid)
-        except:
-            write_log('PDF 이미지 생성에 실패했습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
-            return response_error_db('E201', 'save pdf image', oid)
+        # 페이지 렌더링은 detectron/OCR 단계가 페이지를 가져갈 때마다 진행된다 (전체를 먼저 만들지 않음)
+        scale = float(pdf_config['PDF_TO_IMAGE_SCALE'])
+        page_stream = PageStream(pdf_doc, orgTimeStr, orgFileName, oid, page_images)
+        rotate, pdf_status = page_stream.rotate, page_stream.pdf_status
+
+    image_pages = page_stream if page_stream is not None else image_path_list
 
     if property_type == 'immovable':
-        # detectron
+        # Detectron2/TATR는 부동산 문서에만 쓰므로 처음 필요할 때 import (모델도 처음 추론할 때 로드)
+        from detectron2_deploy.detect_crop import detection_request
+        from tatr.inference import infer_batch as tatr_batch
+
+        # 렌더링된 페이지부터 detectron, detectron 결과가 나온 페이지부터 OCR 미리 시작
+        page_ocr = immovable_page_ocr(scale, oid, page_images)
+        on_page = lambda i, image_path, tables: prefetch_immovable_page(page_ocr, i, image_path, pdf_status[i], bool(tables))
+        # 명세표/그림이 있을 수 있는 페이지만 detectron (이미지 페이지 판단에 쓴 제목 OCR은 이후 단계에서 재사용)
+        triage = PageTriage(pdf_status, page_images, lambda i, image_path: page_ocr.peek(i, image_path, 'title'), oid) if TRIAGE_ENABLED else None
+
         detectron_json = detectron_json_path(orgTimeStr, orgFileName)
         figure_savepath = os.path.join(result_save_path, file_basename)
-        detectron_results, fig_image_path, error_code = detection_request(image_path_list, detectron_json, orgTimeStr, figure_savepath, oid)
+        detectron_results, fig_image_path, error_code = detection_request(image_pages, detectron_json, orgTimeStr, figure_savepath, oid, page_images, on_page, triage)
+        if page_stream is not None and page_stream.error:
+            page_ocr.close()
+            write_log('PDF 이미지 생성에 실패했습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
+            return response_error_db('E201', 'save pdf image', oid)
         if error_code:
+            page_ocr.close()
             write_log(message(error_code), etc_config['LOG_LEVEL_ERROR'], oid)
             return response_error_db(error_code, 'detectron', oid)
+        image_path_list = page_stream.image_path_list if page_stream is not None else image_path_list
     
         try:
-            result_pdf_path, cover_page_idx, summary_page_idx, detail_pages, page_sizes, error_code = ocr_immovable(pdf_doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid)
+            result_pdf_path, cover_page_idx, summary_page_idx, detail_pages, page_sizes, error_code = ocr_immovable(pdf_doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid, page_images, page_ocr)
 
         except:
             traceback.print_exc()
@@ -135,8 +277,16 @@ def api_task(*param):
             return response_error_db('E900', 'OCR', oid)
 
     elif property_type == 'movable':
+        # 렌더링된 페이지부터 OCR 시작
+        page_ocr = movable_page_ocr(scale, oid, page_images)
+        image_path_list = prefetch_movable(page_ocr, image_pages, pdf_status)
+        if page_stream is not None and page_stream.error:
+            page_ocr.close()
+            write_log('PDF 이미지 생성에 실패했습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
+            return response_error_db('E201', 'save pdf image', oid)
+
         try:
-            result_pdf_path, error_code = ocr_movable(pdf_doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid)
+            result_pdf_path, error_code = ocr_movable(pdf_doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid, page_images, page_ocr)
 
         except:
             write_log("OCR 중 에러 발생", etc_config['LOG_LEVEL_ERROR'], oid)
@@ -154,7 +304,8 @@ def api_task(*param):
     if property_type == 'movable':
         try:
             write_log(f'[동산] OCR 데이터를 최종 JSON으로 변환 시작', etc_config['LOG_LEVEL_INFO'], oid)
-            movable_final_data = movable_text_pdf_json(result_pdf_path, rotate, oid, doc_id)
+            with fitz_lock:  # 아직 끝나지 않은 OCR 스레드의 렌더링과 겹치지 않게
+                movable_final_data = movable_text_pdf_json(result_pdf_path, rotate, oid, doc_id)
 
             # JSON 저장 경로 설정
             json_savepath = os.path.join(result_save_path, file_basename + '.json')
@@ -171,7 +322,7 @@ def api_task(*param):
                 'resultMessage': message('E000'),
                 'savePath': json_savepath
             }
-            return make_response(response_message, 200)
+            return response_message
         
         except Exception as e:
             write_log(f'[동산] JSON 변환 중 오류: {str(e)}', etc_config['LOG_LEVEL_ERROR'], oid)
@@ -179,7 +330,8 @@ def api_task(*param):
 
     detail_titles = group_consecutive_pages(detail_pages)
 
-    pdf_doc, appraisal_info = extract_appraisal_info(result_pdf_path, cover_page_idx, summary_page_idx, scale, oid)
+    with fitz_lock:  # 아직 끝나지 않은 OCR 스레드와 TATR의 렌더링과 겹치지 않게
+        pdf_doc, appraisal_info = extract_appraisal_info(result_pdf_path, cover_page_idx, summary_page_idx, scale, oid)
     appraisal_info['table_title'] = detail_titles
 
     with open(appraisal_json_path(orgTimeStr, orgFileName), 'w', encoding='utf-8') as json_file:
@@ -192,38 +344,48 @@ def api_task(*param):
     process_start_times = {}
     last_location = None    # OCR 오류로 제목이 달라져도 동소를 묶고싶음
 
-    # titles에 해당하는 페이지만 TATR
+    page_data = detectron_results   # detectron 결과는 파일로 다시 읽지 않고 그대로 사용
+
+    # titles에 해당하는 페이지의 표를 모아서 한 번에 TATR (여러 페이지 명세표도 batch로 추론)
+    detail_tables = dict()  # page_num -> (page_image_path, table_xyxy)
+    for title_info in detail_titles:
+        start_page, end_page = title_info['page_range']
+        for page_num in range(start_page, end_page + 1):
+            page_image_path = source_image(orgTimeStr, page_num, file_type, orgFileName).replace('pdf', 'png')
+            if page_image_path not in page_data or len(page_data[page_image_path]) == 0:    # 이어지는 페이지에 표가 없으면
+                break
+            detail_tables[page_num] = (page_image_path, page_data[page_image_path][0])    # x1, y1, x2, y2
+
+    try:
+        # TATR 시작 시간 기록
+        process_start_times['TATR'] = time.time()
+
+        write_log(f"[TATR 시작] 표 {len(detail_tables)}개, page {list(detail_tables)}", etc_config['LOG_LEVEL_INFO'], oid)
+        table_structures = tatr_batch([(page_image_path, table_xyxy, (orgTimeStr, orgFileName, page_num))
+                                       for page_num, (page_image_path, table_xyxy) in detail_tables.items()], page_images, oid)
+        table_structures = dict(zip(detail_tables, table_structures))
+
+        # 걸린 시간 계산
+        elapsed_time = time.time() - process_start_times['TATR']
+        write_log(f"[TATR 완료] 표 {len(table_structures)}개 ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
+    except Exception as e:
+        write_log(f"[TATR 실패] {str(e)}", etc_config['LOG_LEVEL_ERROR'], oid)
+        return response_error_db('E320', 'TATR', oid)
+
     for title_num, title_info in enumerate(detail_titles):
         start_page, end_page = title_info['page_range']
         write_log(f"[표 구조 분석] {title_info['text']} page {start_page} ~ {end_page}", etc_config['LOG_LEVEL_INFO'], oid)
 
-        structure_path = []
-
-        with open(detectron_json, 'r') as f:
-            page_data = json.load(f)
+        page_structures = []    # 페이지별 표 구조 (행 병합 결과, 실패하면 pts)
 
         for page_num in range(start_page, end_page + 1):
-            page_image_path = source_image(orgTimeStr, page_num, file_type, orgFileName).replace('pdf', 'png')
-
-            if page_image_path not in page_data or len(page_data[page_image_path]) == 0:    # 이어지는 페이지에 표가 없으면
+            if page_num not in detail_tables:    # 이어지는 페이지에 표가 없으면
                 break
 
-            table_xyxy = page_data[page_image_path][0]    # x1, y1, x2, y2
-            try:
-                # TATR 시작 시간 기록
-                process_key = f"TATR_{page_num}"
-                process_start_times[process_key] = time.time()
+            page_image_path, table_xyxy = detail_tables[page_num]
+            # 중간 결과 JSON/시각화 경로 (디버그/감사 모드에서만 저장)
+            table_structure_json = structure_path(orgTimeStr, orgFileName, page_num) if artifact_writer.enabled else None
 
-                write_log(f"[TATR 시작] {page_image_path}, table_xyxy: {table_xyxy}", etc_config['LOG_LEVEL_INFO'], oid)
-                table_structure_json = tatr(page_image_path, table_xyxy, (orgTimeStr, orgFileName, page_num))
-
-                # 걸린 시간 계산
-                elapsed_time = time.time() - process_start_times[process_key]
-                write_log(f"[TATR 완료] {table_structure_json} ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
-            except Exception as e:
-                write_log(f"[TATR 실패] {str(e)}", etc_config['LOG_LEVEL_ERROR'], oid)
-                return response_error_db('E320', 'TATR', oid)
-            
             try:
                 # OCR+TATR 시작 시간 기록
                 process_key = f"OCR_TATR_{page_num}"
@@ -231,24 +393,25 @@ def api_task(*param):
 
                 write_log( f"[OCR+TATR 시작]", etc_config['LOG_LEVEL_INFO'], oid)
                 # page_table_structure = join_table_structure_with_ocr_meta(ocr_data, page_num, table_structure_json, table_xyxy, scale)
-                page_table_structure = join_table_structure_with_pdf_text(pdf_doc[page_num], table_structure_json, table_xyxy, scale)
-
-                tocr_path = table_structure_json.replace('.json', '_pts.json')
-                with open(tocr_path, "w", encoding="utf-8") as f:
-                    json.dump(page_table_structure, f, ensure_ascii=False, indent=2)
+                with fitz_lock:
+                    text_page = pdf_doc[page_num]
+                page_table_structure = join_table_structure_with_pdf_text(text_page, table_structures[page_num], table_xyxy, scale)
 
                 # 걸린 시간 계산
                 elapsed_time = time.time() - process_start_times[process_key]
-                write_log(f"[OCR+TATR 완료] {tocr_path} ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
+                write_log(f"[OCR+TATR 완료] page {page_num} ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
 
-                if tatr_config['debug_mode'] == 'True':
-                    visualize_table_boxes(page_image_path, tocr_path, tocr_path.replace('.json', '.png'))
+                if artifact_writer.enabled:
+                    tocr_path = table_structure_json.replace('.json', '_pts.json')
+                    artifact_writer.write_json(tocr_path, page_table_structure, oid)
+                    if tatr_config['debug_mode'] == 'True':
+                        visualize_table_boxes(page_images.materialize(page_image_path), page_table_structure, tocr_path.replace('.json', '.png'))
             except Exception as e:
                 write_log(f"[OCR+TATR 실패]" + str(e), etc_config['LOG_LEVEL_ERROR'], oid)
                 return response_error_db('E320', 'OCR+TATR', oid)
 
             # OCR 완료 후 행 병합 처리
-            merged_path = None
+            merged_result = None
             try:
                 # 행 병합 시작 시간 기록
                 process_key = f"merge_by_serial_{page_num}"
@@ -256,33 +419,29 @@ def api_task(*param):
 
                 # 일련번호/감정평가액 기준 병합
                 write_log("[일련번호/감정평가액 기준 행 병합]", etc_config['LOG_LEVEL_INFO'], oid)
-                merged_result = merge_by_serial(tocr_path, oid)
+                merged_result = merge_by_serial(page_table_structure, oid)
                 if not merged_result:
                     continue
-                
-                # 행 병합 결과 저장 경로 생성
-                merged_path = tocr_path.replace('.json', '_merged.json')
-                
-                # 결과 저장
-                with open(merged_path, 'w', encoding='utf-8') as f:
-                    json.dump(merged_result, f, ensure_ascii=False, indent=2)
 
                 # 걸린 시간 계산
                 elapsed_time = time.time() - process_start_times[process_key]
-                write_log(f"{merged_path} ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
+                write_log(f"[일련번호/감정평가액 기준 행 병합 완료] page {page_num} ({elapsed_time:.2f}초)", etc_config['LOG_LEVEL_INFO'], oid)
 
-                if tatr_config['debug_mode'] == 'True':
-                    visualize_table_boxes(page_image_path, merged_path, merged_path.replace('.json', '.png'))
+                if artifact_writer.enabled:
+                    merged_path = table_structure_json.replace('.json', '_pts_merged.json')
+                    artifact_writer.write_json(merged_path, merged_result, oid)
+                    if tatr_config['debug_mode'] == 'True':
+                        visualize_table_boxes(page_images.materialize(page_image_path), merged_result, merged_path.replace('.json', '.png'))
 
             except Exception as e:
                 write_log(f"[일련번호/감정평가액 기준 행 병합 실패] " + str(e), etc_config['LOG_LEVEL_ERROR'], oid)
                 response_error_db('E320', 'merge rows', oid)
                 # 행 병합이 실패해도 원본 OCR 결과로 계속 진행
 
-            if merged_path:
-                structure_path.append(merged_path)
+            if merged_result:
+                page_structures.append(merged_result)
             else:
-                structure_path.append(tocr_path)
+                page_structures.append(page_table_structure)
 
         # 최종적으로 concat 처리
         try:
@@ -291,7 +450,7 @@ def api_task(*param):
             process_start_times[process_key] = time.time()
             
             write_log("[다중 페이지 표 연결 시작]", etc_config['LOG_LEVEL_INFO'], oid)
-            header, structure = concat_table(structure_path)
+            header, structure = concat_table(page_structures)
             if not structure:
                 continue
 
@@ -330,19 +489,17 @@ def api_task(*param):
         #     visualize_merged_table1(page_image_path, merged_structure, 'debug/' + atchmnfl_name + str(page_num)+'.png', page_num)
 
         # 빈 금액 병합 표 저장
-        if tatr_config['debug_mode'] == 'True':
+        if artifact_writer.enabled:
             title_table_savename = title_table_result(orgTimeStr, orgFileName, title_num)
-            with open(title_table_savename + '.json', 'w', encoding='utf-8') as f:
-                json.dump(table, f, ensure_ascii=False, indent=2)
-
-            with open(title_table_savename + '.html', 'w', encoding='utf-8') as f:
-                f.write(title_table_to_html(table))
-                write_log(title_table_savename + '.html', etc_config['LOG_LEVEL_INFO'], oid)
+            artifact_writer.write_json(title_table_savename + '.json', table, oid)
+            artifact_writer.write_text(title_table_savename + '.html', title_table_to_html(table), oid)
+            write_log(title_table_savename + '.html', etc_config['LOG_LEVEL_INFO'], oid)
 
         location_result, last_location = location_extractor(table, page_sizes, last_location, scale, oid)
         price_info.extend(location_result)
 
-    pdf_doc.close()
+    with fitz_lock:
+        pdf_doc.close()
 
     try:
         # 최종 JSON 저장 시작 시간 기록
@@ -397,7 +554,7 @@ def api_task(*param):
         'resultMessage': message('E000'),
         'savePath': json_savepath
     }
-    return make_response(response_message, 200)
+    return response_message
 
 
 def response_error_db(error_code, method, oid):
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+from common_module import message, write_log
+from configs import etc_config, job_config
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    '''작업 큐에 들어가는 OCR 작업 한 건'''
+    def __init__(self, func, args, oid):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.oid = oid or ''
+        self.state = QUEUED
+        self.result = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def finish(self, state, result):
+        self.state = state
+        self.result = result
+        self.finished_at = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        status = {
+            'jobId': self.id,
+            'oid': self.oid,
+            'state': self.state,
+            'queuedAt': self.queued_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+        }
+        if self.result is not None:
+            status.update(self.result)
+        return status
+
+
+class JobQueue:
+    '''정해진 수의 작업 스레드가 대기열의 작업을 처리 (대기열이 가득 차면 접수 거부)'''
+    def __init__(self, workers, queue_size, result_ttl):
+        self.result_ttl = result_ttl
+        self.jobs = dict()
+        self.jobs_lock = threading.Lock()
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._work, name=f'ocr-job-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, func, args, oid=''):
+        '''작업 등록, 대기열이 가득 찼으면 None'''
+        self._expire()
+        job = Job(func, args, oid)
+        try:
+            self.pending.put_nowait(job)
+        except queue.Full:
+            write_log(f'[작업 대기열] 가득 참 ({self.pending.maxsize}건)', etc_config['LOG_LEVEL_WARNING'], job.oid)
+            return None
+
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+        write_log(f'[작업 대기열] {job.id} 등록 (대기 {self.pending.qsize()}건)', etc_config['LOG_LEVEL_INFO'], job.oid)
+        return job
+
+    def get(self, job_id):
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self.pending.get()
+            job.state = RUNNING
+            job.started_at = time.time()
+            write_log(f'[작업 대기열] {job.id} 시작', etc_config['LOG_LEVEL_INFO'], job.oid)
+            try:
+                result = job.func(*job.args)
+                state = DONE if result.get('resultCode') == 'E000' else FAILED
+            except Exception:
+                write_log(f'[작업 대기열] {job.id} 오류\n{traceback.format_exc()}', etc_config['LOG_LEVEL_ERROR'], job.oid)
+                result = {'resultCode': 'E900', 'resultMessage': message('E900'), 'savePath': None}
+                state = FAILED
+            job.finish(state, result)
+            write_log(f'[작업 대기열] {job.id} {state} ({job.finished_at - job.started_at:.2f}초)', etc_config['LOG_LEVEL_INFO'], job.oid)
+            self.pending.task_done()
+
+    def _expire(self):
+        '''결과 보관 시간이 지난 완료 작업 삭제'''
+        now = time.time()
+        with self.jobs_lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at and now - job.finished_at > self.result_ttl]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+
+job_queue = JobQueue(
+    workers=int(job_config['WORKERS']),
+    queue_size=int(job_config['QUEUE_SIZE']),
+    result_ttl=float(job_config['RESULT_TTL'])
+)
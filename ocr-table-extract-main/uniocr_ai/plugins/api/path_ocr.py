@@ -4,57 +4,112 @@ import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 import datetime
 
-from api.api_content import api_task, response_error_db
-from common_module import read_file, write_log
+from api.api_content import response_error_db
+from api.job_queue import job_queue
+from api.worker_pool import execute
+from common_module import message, write_log
 
 from configs import etc_config, conv_file_ext, native_file_ext
 from visualization import *
 
 def path_ocr(request):
-    orgTimeStr = datetime.datetime.now()
+    '''동기 요청: 작업 풀에서 처리가 끝날 때까지 기다린 후 결과 반환'''
     write_log('Path-OCR API 요청', etc_config['LOG_LEVEL_INFO'])
 
     if request.method != 'POST':
         return
-    
-    dt = request.json
+
+    param, error = parse_request(request.json)
+    if error:
+        return error
+
+    oid = param[2]
+    job = job_queue.submit(execute, param, oid)
+    if job is None:
+        return response_error_db('E600', 'job queue', oid), 503
+
+    job.wait()
+    return job.result
+
+
+def submit_job(request):
+    '''비동기 요청: 작업 ID를 바로 반환하고 작업 풀에서 처리'''
+    write_log('Path-OCR Job API 요청', etc_config['LOG_LEVEL_INFO'])
+
+    param, error = parse_request(request.json)
+    if error:
+        return error
+
+    oid = param[2]
+    job = job_queue.submit(execute, param, oid)
+    if job is None:
+        return response_error_db('E600', 'job queue', oid), 503
+
+    response_message = {
+        'resultCode': 'E000',
+        'resultMessage': message('E000'),
+        'jobId': job.id,
+        'state': job.state
+    }
+    return response_message, 202
+
+
+def job_status(job_id):
+    '''작업 상태 및 결과 (savePath) 조회'''
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'resultCode': 'E601', 'resultMessage': message('E601'), 'savePath': None}, 404
+    return job.to_dict()
+
+
+def parse_flag(value):
+    '''JSON true/false 또는 "true"/"false" 문자열(대소문자 무관), 그 외 값이면 None'''
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    return None
+
+
+def parse_request(dt):
+    '''요청 매개변수 검증 후 api_task 매개변수 반환'''
+    orgTimeStr = datetime.datetime.now()
+    dt = dt or {}
     oid = dt.get('oid')
     original_file_path = dt.get('pdfPath')
     result_save_path = dt.get('savePath')
     property_type = dt.get('propertyType')
+    bypass_cache = parse_flag(dt.get('bypassCache', False))   # true면 결과 캐시를 쓰지 않고 다시 처리 (null은 잘못된 값)
 
     # 매개변수 검증
     if not (original_file_path and result_save_path):
         write_log(f'필수 매개변수를 확인해주세요.', etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E103', 'parameter', oid)
-    
+        return None, response_error_db('E103', 'parameter', oid)
+
+    if bypass_cache is None:
+        write_log(f'bypassCache는 true/false로 입력해야 합니다.', etc_config['LOG_LEVEL_ERROR'], oid)
+        return None, response_error_db('E103', 'parameter bypassCache', oid)
+
     if property_type not in ['movable', 'immovable']:
         write_log(f'propertyType은 movable(동산)/immovable(부동산) 중 하나로 입력해야 합니다.', etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E103', 'parameter property', oid)
-    
+        return None, response_error_db('E103', 'parameter property', oid)
+
     write_log('작업 파일:' + original_file_path, etc_config['LOG_LEVEL_INFO'], oid)
     filename = os.path.basename(original_file_path)
     file_basename, file_type = os.path.splitext(filename)
 
     if os.path.exists(original_file_path) == False:
         write_log(f'요청 파일이 존재하지 않습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E101', 'original_file_path', oid)
-    
+        return None, response_error_db('E101', 'original_file_path', oid)
+
     if os.path.exists(result_save_path) == False:
         write_log(f'저장 경로가 올바르지 않습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E104', 'result_save_path', oid)
+        return None, response_error_db('E104', 'result_save_path', oid)
 
     file_type = file_type[1:].lower() if len(file_type) else ''
     if file_type not in native_file_ext + conv_file_ext:
         write_log('유효하지 않은 파일 타입: ' + file_type, etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E102', 'file type: ' + file_type, oid)
-
-    dec_file = read_file(original_file_path)
-    if not dec_file:
-        write_log('파일이 올바르지 않습니다.', etc_config['LOG_LEVEL_ERROR'], oid)
-        return response_error_db('E918', 'atchmnflPath', oid)
-
+        return None, response_error_db('E102', 'file type: ' + file_type, oid)
 
-    result = api_task(file_type, orgTimeStr, dec_file, oid, result_save_path, file_basename, original_file_path, property_type)
+    return (file_type, orgTimeStr, oid, result_save_path, file_basename, original_file_path, property_type, not bypass_cache), None
 
-    return result
\ No newline at end of file
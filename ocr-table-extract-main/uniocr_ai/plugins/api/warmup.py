@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import cv2
+import fitz  # PyMuPDF
+from PIL import Image
+
+from common_module import message, write_log
+from configs import etc_config, pdf_config, warmup_config
+
+COLD = 'cold'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# 워밍업할 모델 (ocr, detectron, tatr), 페이지 렌더링은 항상 한다
+WARMUP_MODELS = [name.strip() for name in warmup_config['MODELS'].split(',') if name.strip()]
+WARMUP_ON_START = warmup_config['ON_START'] == 'True'
+WARMUP_OID = 'warmup'
+WARMUP_PATH = 'warmup_0.png'     # PageImages 키 (파일로 저장하지 않음)
+FONT_FILE = f"./resources/{pdf_config['FONT_NAME_LIN']}.ttf"
+# 합성 페이지의 표 영역 (PDF 좌표)
+TABLE_RECT = fitz.Rect(40, 120, 555, 520)
+HEADER = ['일련번호', '소재지', '지번', '지목및용도', '용도지역및구조', '면적', '감정평가액']
+
+
+def synthetic_page():
+    '''감정평가명세표 모양의 합성 PDF 페이지 (제목, 컬럼명이 있는 표, 사진 영역)'''
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_font(fontname='warmup', fontfile=FONT_FILE)
+    page.insert_text((200, 80), '감 정 평 가 명 세 표', fontname='warmup', fontsize=20)
+
+    rows, cols = 12, len(HEADER)
+    row_h = TABLE_RECT.height / rows
+    col_w = TABLE_RECT.width / cols
+    for r in range(rows + 1):
+        y = TABLE_RECT.y0 + r * row_h
+        page.draw_line((TABLE_RECT.x0, y), (TABLE_RECT.x1, y))
+    for c in range(cols + 1):
+        x = TABLE_RECT.x0 + c * col_w
+        page.draw_line((x, TABLE_RECT.y0), (x, TABLE_RECT.y1))
+    for c, name in enumerate(HEADER):
+        page.insert_text((TABLE_RECT.x0 + c * col_w + 3, TABLE_RECT.y0 + row_h * 0.65), name, fontname='warmup', fontsize=7)
+    for r in range(1, rows):
+        y = TABLE_RECT.y0 + r * row_h + row_h * 0.65
+        values = [str(r), '서울특별시 강남구', f'{100 + r}-{r}', '대', '일반상업지역', f'{r * 12.5:.1f}', f'{r * 1234567:,}']
+        for c, value in enumerate(values):
+            page.insert_text((TABLE_RECT.x0 + c * col_w + 3, y), value, fontname='warmup', fontsize=7)
+
+    page.draw_rect(fitz.Rect(60, 560, 300, 780), color=(0.2, 0.3, 0.2), fill=(0.35, 0.5, 0.3))
+    page.draw_circle((180, 640), 40, color=(0.8, 0.8, 0.6), fill=(0.9, 0.85, 0.6))
+    return doc
+
+
+@contextmanager
+def step(times, name):
+    start = time.time()
+    yield
+    times[name] = round(time.time() - start, 3)
+
+
+def warm_models(models=WARMUP_MODELS):
+    '''합성 페이지를 렌더링 → detectron → CRAFT → 인식 → TATR 순서로 실제 추론 경로에 통과시킨다
+    모델 로드, 커널 선택(oneDNN/cuDNN), 메모리 할당을 첫 요청 전에 끝내기 위함이며 결과 캐시/artifact 캐시는 쓰지 않는다
+    단계별 걸린 시간(초) 반환'''
+    from check_pdf import fitz_lock
+    from page_images import PageImages
+    from preprocess_image import estimate_skew
+    from to_image import PDF_TO_IMAGE_SCALE, PREVIEW_SCALE, render_page
+
+    times = OrderedDict()
+    with step(times, 'rasterize'):
+        with fitz_lock:  # 스레드 모드에서는 처리 중인 작업과 같은 프로세스
+            doc = synthetic_page()
+            image = render_page(doc[0])
+            preview = render_page(doc[0], PREVIEW_SCALE)
+            doc.close()
+        estimate_skew(preview, PREVIEW_SCALE / PDF_TO_IMAGE_SCALE)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    if 'detectron' in models:
+        from detectron2_deploy.detect_crop import predictor
+        with step(times, 'detectron'):
+            predictor(preview)
+
+    if 'ocr' in models:
+        import ocr.ocr as ocr_module
+        import ocr.ocr_craft as ocr_craft
+        with step(times, 'load_ocr'):
+            error_code = ocr_module.load_ocr_models(WARMUP_OID)
+            if error_code:
+                raise RuntimeError(message(error_code))
+        with step(times, 'craft'):
+            bboxes = ocr_craft.detect_run(ocr_module.opt, 0.8, rgb)
+        with step(times, 'recognizer'), PageImages(keep_files=False) as page_images:
+            page_images.put(WARMUP_PATH, image, write=False)
+            error_code, _ = ocr_craft.classfy_run(ocr_module.opt, 0, WARMUP_PATH, bboxes, rgb, PDF_TO_IMAGE_SCALE, WARMUP_OID, page_images)
+            if error_code:
+                raise RuntimeError(message(error_code))
+
+    if 'tatr' in models:
+        from tatr.inference import pipe
+        x0, y0, x1, y1 = [int(v * PDF_TO_IMAGE_SCALE) for v in TABLE_RECT]
+        with step(times, 'tatr'):
+            pipe.get().recognize(Image.fromarray(rgb[y0:y1, x0:x1]))
+    return times
+
+
+class Warmup:
+    '''프로세스의 워밍업 상태 (cold → warming → ready / failed)
+    run_func가 끝나야 ready가 되고, /ready는 ready일 때만 200을 반환해서 식은 워커에 문서가 가지 않게 한다'''
+    def __init__(self, run_func=warm_models):
+        self.run_func = run_func
+        self.state = COLD
+        self.times = dict()
+        self.error = None
+        self.lock = threading.Lock()
+
+    def run(self):
+        '''워밍업 실행 (이미 다른 스레드가 실행 중이면 끝날 때까지 기다린다), 상태 dict 반환'''
+        with self.lock:
+            if self.state != READY:
+                self.state = WARMING
+                start = time.time()
+                try:
+                    self.times = dict(self.run_func())
+                    self.times['total'] = round(time.time() - start, 3)
+                    self.error = None
+                    self.state = READY
+                    write_log(f'[워밍업] 완료 {self.times}', etc_config['LOG_LEVEL_INFO'], WARMUP_OID)
+                except Exception as e:
+                    traceback.print_exc()
+                    self.error = str(e)
+                    self.state = FAILED
+                    write_log(f'[워밍업] 실패: {e}', etc_config['LOG_LEVEL_ERROR'], WARMUP_OID)
+        return self.status()
+
+    def start(self):
+        '''서버 시작 시 백그라운드로 워밍업'''
+        threading.Thread(target=self.run, name='warmup', daemon=True).start()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def status(self):
+        return {'state': self.state, 'times': self.times, 'error': self.error}
+
+
+warmup = Warmup()
+
+
+def status_response(status):
+    '''(응답 JSON, HTTP 상태) ready면 200, 워밍업 전/중이면 503, 실패면 500'''
+    if status['state'] == READY:
+        code, http_status = 'E000', 200
+    elif status['state'] == FAILED:
+        code, http_status = 'E603', 500
+    else:
+        code, http_status = 'E602', 503
+    return dict(status, resultCode=code, resultMessage=message(code)), http_status
+
+
+def warmup_request():
+    '''/warmup: 워밍업이 끝날 때까지 기다린 후 결과 반환 (이미 ready면 바로 반환)'''
+    write_log('Warmup API 요청', etc_config['LOG_LEVEL_INFO'], WARMUP_OID)
+    return status_response(warmup.run())
+
+
+def ready_request():
+    '''/ready: 로드밸런서 readiness probe, 워밍업이 끝난 뒤에만 200'''
+    return status_response(warmup.status())
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import threading
+import time
+
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+import torch
+
+from api.api_content import run_task
+from common_module import write_log
+from api.warmup import READY, WARMUP_ON_START, Warmup, warmup
+from configs import etc_config, job_config, worker_config
+from model_registry import MODEL_LOADERS, PRELOAD_MODELS, load_models
+
+# MODE = thread: 작업 스레드에서 바로 실행
+# MODE = prefork: 부모 프로세스에서 모델을 로드한 뒤 fork한 워커 프로세스에 문서를 분배
+#                (모델 가중치는 copy-on-write로 공유)
+prefork = worker_config['MODE'] == 'prefork'
+processes = int(worker_config['PROCESSES'])
+torch_threads = int(worker_config['TORCH_THREADS'])
+max_tasks_per_child = int(worker_config['MAX_TASKS_PER_CHILD']) or None
+
+pool = None
+worker_warmup = None    # 워커 프로세스 안의 워밍업 상태
+# fork 전에 만들어서 워커가 공유: 워밍업 작업을 워커마다 한 번씩 받게 하는 barrier, 워커 전체 워밍업 완료 여부
+warm_barrier = None
+pool_warmed = None
+# 다른 워커의 워밍업을 기다리는 최대 시간(초), 넘으면 워밍업 실패
+WARM_BARRIER_TIMEOUT = 600
+
+
+def set_torch_threads():
+    '''프로세스별 torch intra-op 스레드 수 설정 (0이면 torch 기본값)'''
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+
+
+def init_worker():
+    '''fork된 워커 프로세스 초기화, WARMUP_ON_START거나 워커 전체 워밍업이 이미 끝났으면 작업을 받기 전에 워밍업
+    (MAX_TASKS_PER_CHILD나 워커 종료로 새로 만든 워커도 워밍업이 끝나야 문서를 받는다)'''
+    global worker_warmup
+    set_torch_threads()
+    write_log(f'[워커] pid {os.getpid()} 시작 (torch 스레드 {torch.get_num_threads()}개)', etc_config['LOG_LEVEL_INFO'])
+    worker_warmup = Warmup()
+    if WARMUP_ON_START or pool_warmed.value:
+        worker_warmup.run()
+
+
+def warm_worker(_):
+    '''워커를 워밍업하고 나머지 워커가 모두 워밍업 작업을 받을 때까지 barrier에서 기다린다
+    기다리는 동안 다른 워밍업 작업을 가져가지 않으므로 processes개 작업이 워커마다 하나씩 실행된다'''
+    status = worker_warmup.run()
+    warm_barrier.wait(WARM_BARRIER_TIMEOUT)
+    return dict(status, pid=os.getpid())
+
+
+def warm_workers():
+    '''prefork: 워커 프로세스마다 워밍업 (부모에서는 추론하지 않는다), 첫 워커의 단계별 시간 반환
+    모든 워커 pid가 워밍업을 마쳐야 ready'''
+    warm_barrier.reset()    # 이전 워밍업이 timeout으로 깨졌으면 다시 사용
+    try:
+        statuses = pool.map(warm_worker, range(processes), chunksize=1)
+    except threading.BrokenBarrierError:
+        raise RuntimeError(f'워커 {processes}개가 {WARM_BARRIER_TIMEOUT}초 안에 워밍업을 마치지 못했습니다.')
+    failed = [status for status in statuses if status['state'] != READY]
+    if failed:
+        raise RuntimeError(failed[0]['error'])
+    warmed_pids = {status['pid'] for status in statuses}
+    if len(warmed_pids) != processes:
+        raise RuntimeError(f'워밍업된 워커 {len(warmed_pids)}/{processes}개')
+    pool_warmed.value = 1
+    write_log(f'[워커] 워밍업 완료 pid {sorted(warmed_pids)}', etc_config['LOG_LEVEL_INFO'])
+    return statuses[0]['times']
+
+
+def preload_models(names=PRELOAD_MODELS):
+    '''names 모델만 미리 로드 (prefork면 fork 전 부모 프로세스에서 로드해서 워커가 공유)
+    나머지 모델은 처음 사용할 때 로드된다 (prefork면 워커마다 따로 로드).
+    부모에서는 추론을 실행하지 않는다 (OpenMP 스레드 풀이 생긴 뒤 fork하면 자식이 멈출 수 있음)'''
+    if not names:
+        return
+    start_time = time.time()
+    load_models(names)
+    write_log(f'[워커] 모델 로드 완료: {", ".join(names)} ({time.time() - start_time:.2f}초)', etc_config['LOG_LEVEL_INFO'])
+
+
+def start_workers():
+    '''prefork 모드면 모델 로드 후 워커 프로세스 생성, 작업 스레드보다 먼저 호출해야 한다'''
+    global pool, prefork, warm_barrier, pool_warmed
+    if not prefork:
+        set_torch_threads()
+        preload_models()
+        return
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        write_log('[워커] fork를 지원하지 않는 OS입니다. thread 모드로 실행합니다.', etc_config['LOG_LEVEL_WARNING'])
+        prefork = False
+        set_torch_threads()
+        preload_models()
+        return
+
+    if int(job_config['WORKERS']) < processes:
+        write_log(f'[워커] [JOB] WORKERS({job_config["WORKERS"]})가 PROCESSES({processes})보다 작아 일부 워커가 쉬게 됩니다.', etc_config['LOG_LEVEL_WARNING'])
+
+    # 비워두면 전체 모델을 부모에서 로드 (워커마다 따로 로드하지 않도록)
+    preload_models(PRELOAD_MODELS or list(MODEL_LOADERS))
+    context = multiprocessing.get_context('fork')
+    warm_barrier = context.Barrier(processes)
+    pool_warmed = context.Value('b', 0)
+    pool = context.Pool(processes=processes, initializer=init_worker, maxtasksperchild=max_tasks_per_child)
+    warmup.run_func = warm_workers
+    write_log(f'[워커] 워커 프로세스 {processes}개 생성', etc_config['LOG_LEVEL_INFO'])
+
+
+def execute(*param):
+    '''작업 스레드에서 호출: prefork 모드면 워커 프로세스에서, 아니면 현재 스레드에서 run_task 실행'''
+    if pool is None:
+        return run_task(*param)
+    return pool.apply(run_task, param)
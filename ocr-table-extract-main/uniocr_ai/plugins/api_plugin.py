@@ -1,8 +1,42 @@
 from flask import request
 
+from common_module import write_log
+from configs import etc_config
+
 def register(app):
-    from api.path_ocr import path_ocr
+    from model_registry import startup_times, timed
+
+    # 구성요소별 준비 시간은 [시작] 로그로 남는다 (모델은 PRELOAD_MODELS 외에는 처음 사용할 때 로드)
+    # prefork 모드면 작업 스레드가 생기기 전에 모델 로드 후 워커 프로세스를 만든다
+    with timed('작업 워커'):
+        from api.worker_pool import start_workers
+        start_workers()
+
+    with timed('API 모듈'):
+        from api.path_ocr import path_ocr, submit_job, job_status
+        from api.warmup import WARMUP_ON_START, ready_request, warmup, warmup_request
+    write_log('[시작] ' + ', '.join(f'{name} {elapsed:.2f}초' for name, elapsed in startup_times.items()), etc_config['LOG_LEVEL_INFO'])
+
+    # 워밍업이 끝나기 전에는 /ready가 503이라 로드밸런서가 문서를 보내지 않는다
+    if WARMUP_ON_START:
+        warmup.start()
+
+    @app.route("/warmup", methods=['GET', 'POST'])
+    def api_warmup():
+        return warmup_request()
+
+    @app.route("/ready", methods=['GET'])
+    def api_ready():
+        return ready_request()
 
     @app.route("/path-ocr", methods=['POST'])
     def api_path_ocr():
-        return path_ocr(request)
\ No newline at end of file
+        return path_ocr(request)
+
+    @app.route("/jobs", methods=['POST'])
+    def api_submit_job():
+        return submit_job(request)
+
+    @app.route("/jobs/<job_id>", methods=['GET'])
+    def api_job_status(job_id):
+        return job_status(job_id)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from configs import artifact_config, path_config
+from result_cache import OCR_MODEL_FILES, config_version
+
+ARTIFACT_ENABLED = artifact_config['ENABLED'] == 'True'
+ARTIFACT_PATH = path_config['ARTIFACT_CACHE_PATH']
+ARTIFACT_MAX_BYTES = int(artifact_config['MAX_MB']) * 1024 * 1024
+# 종류별로 결과에 영향을 주는 (설정 section, 모델 파일)
+KIND_VERSIONS = {
+    'detectron': (('Detectron', 'PDF'), ()),
+    'craft': (('OCR',), OCR_MODEL_FILES),
+    'fields': (('OCR',), OCR_MODEL_FILES),
+    'tatr': (('TATR',), ()),
+}
+# 이 횟수만큼 저장할 때마다 크기를 확인해서 오래된 항목 삭제
+EVICT_EVERY = 200
+
+
+def image_key(image):
+    '''모델에 넣는 이미지 배열의 해시 (같은 페이지 이미지면 같은 값)'''
+    h = hashlib.blake2b(image.tobytes(), digest_size=20)
+    h.update(str(image.shape).encode())
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    '''페이지 이미지 해시 + 모델 버전을 키로 모델 출력(detectron box, CRAFT box, 인식 필드, TATR 셀)을 저장하는 캐시
+    실패 후 재요청이나 표지/감정평가표처럼 같은 페이지가 들어간 문서는 바뀐 페이지만 모델을 실행한다.
+    값은 JSON으로 ARTIFACT_PATH/<종류>/<해시 앞 2자리>/<해시>.json에 저장 (여러 프로세스가 같이 써도 된다)'''
+    def __init__(self, path=ARTIFACT_PATH, max_bytes=ARTIFACT_MAX_BYTES, enabled=ARTIFACT_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.versions = dict()
+        self.puts = 0
+        self.lock = threading.Lock()
+
+    def _file(self, kind, key):
+        version = self.versions.get(kind)
+        if version is None:
+            version = self.versions[kind] = config_version(*KIND_VERSIONS[kind])
+        digest = hashlib.sha1(f'{version}:{key}'.encode()).hexdigest()
+        return os.path.join(self.path, kind, digest[:2], digest + '.json')
+
+    def get(self, kind, key):
+        '''저장된 값, 없으면 None'''
+        if not self.enabled:
+            return None
+        path = self._file(kind, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # 최근 사용 시각 (LRU)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def put(self, kind, key, value):
+        if not self.enabled:
+            return
+        path = self._file(kind, key)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self.lock:
+            self.puts += 1
+            evict = self.puts % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        '''전체 크기가 max_bytes 이하가 될 때까지 오래 사용하지 않은 항목 삭제'''
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+artifact_cache = ArtifactCache()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+'''중간 결과(detectron 표 영역, TATR 셀, pts, merged, 제목별 표) 파일 저장
+표 단계는 메모리의 구조를 그대로 다음 단계로 넘기고, 파일은 디버그/감사 모드([ETC] DEBUG_MODE, AUDIT, [TATR] debug_mode)에서만 별도 스레드가 쓴다.
+write_json/write_text는 호출 시점의 내용을 문자열로 만들어 두므로 이후 단계가 구조를 바꿔도 저장되는 내용은 그대로다.'''
+import atexit
+import json
+import os
+import queue
+import threading
+
+from common_module import write_log
+from configs import etc_config, tatr_config
+
+WRITER_ENABLED = etc_config['debug_mode'] == 'True' or etc_config['AUDIT'] == 'True' or tatr_config['debug_mode'] == 'True'
+
+
+class ArtifactWriter:
+    def __init__(self, enabled=WRITER_ENABLED):
+        self.enabled = enabled
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def _start(self):
+        '''처음 저장할 때 스레드 시작 (prefork 워커는 fork 후 자기 스레드를 따로 시작)'''
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='artifact-writer', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            path, text, oid = self.queue.get()
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            except OSError as e:
+                write_log(f'[artifact] {path} 저장 실패: {e}', etc_config['LOG_LEVEL_WARNING'], oid)
+            finally:
+                self.queue.task_done()
+
+    def write_text(self, path, text, oid=''):
+        if not self.enabled:
+            return
+        if self.thread is None or self.pid != os.getpid():
+            self._start()
+        self.queue.put((path, text, oid))
+
+    def write_json(self, path, data, oid=''):
+        if not self.enabled:
+            return
+        self.write_text(path, json.dumps(data, ensure_ascii=False, indent=2), oid)
+
+    def flush(self):
+        '''지금까지 넣은 파일을 다 쓸 때까지 대기 (run_task가 작업을 끝낼 때마다 호출)'''
+        if self.thread is not None and self.pid == os.getpid():
+            self.queue.join()
+
+
+artifact_writer = ArtifactWriter()
+atexit.register(artifact_writer.flush)
@@ -1,15 +1,23 @@
+import threading
+
 import fitz
 from pdfrw import PdfReader
 
+# PyMuPDF는 문서가 달라도 스레드 안전하지 않아서 작업 중 fitz 호출(열기, 렌더링, 텍스트 읽기, 닫기)은 모두 이 lock 안에서 한다
+# 렌더링 중인 다른 스레드(OCR 등)를 기다리는 동안에는 잡고 있지 않는다 (같은 스레드에서는 다시 잡을 수 있음)
+fitz_lock = threading.RLock()
+
 
 def open_pdf(pdf_path):
     '''보안 PDF 판단'''
-    return fitz.open(pdf_path)
+    with fitz_lock:
+        return fitz.open(pdf_path)
 
 
 def locked_pdf(doc):
     '''암호화 PDF 판단'''
-    return doc.is_encrypted and not doc.authenticate("")
+    with fitz_lock:
+        return doc.is_encrypted and not doc.authenticate("")
 
 
 def doc_open_ok(input_file_path, pdf_doc, image_path_list):
@@ -9,6 +9,14 @@ pdf_config = properties['PDF']
 ocr_config = properties['OCR']
 tatr_config = properties['TATR']
 detectron_config = properties['Detectron']
+job_config = properties['JOB']
+worker_config = properties['WORKER']
+page_image_config = properties['PAGE_IMAGE']
+skew_config = properties['SKEW']
+cache_config = properties['CACHE']
+artifact_config = properties['ARTIFACT']
+triage_config = properties['TRIAGE']
+warmup_config = properties['WARMUP']
 
 file_ext = properties['WF']['FILE_POS_EXT']
 native_file_ext = ['jpg', 'jpeg', 'jpe', 'bmp', 'png', 'gif', 'tiff', 'tif', 'pdf']
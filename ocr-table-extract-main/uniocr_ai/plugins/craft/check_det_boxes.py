@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''getDetBoxes_core 회귀 확인
+저장한 score map (.npz: textmap, linkmap)에 대해 ROI 방식 getDetBoxes_core와
+기존 전체 페이지 방식 구현의 box가 같은지, 각각 얼마나 걸리는지 비교한다.
+
+score map 저장 (craft.detection.post_process 등에서):
+    np.savez_compressed(path, textmap=score_text, linkmap=score_link)
+실행 (plugins 경로에서):
+    python -m craft.check_det_boxes score_maps/*.npz
+파일을 주지 않으면 표처럼 글자가 빽빽한 임의 score map으로 확인한다.
+'''
+import math
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from craft.craft_utils import getDetBoxes_core
+
+TEXT_THRESHOLD = 0.3
+LOW_TEXT = 0.3
+LINK_THRESHOLDS = (0.8, 0.2)    # 부동산, 동산
+
+
+def getDetBoxes_core_reference(textmap, linkmap, text_threshold, link_threshold, low_text):
+    '''component마다 전체 페이지 크기 segmap을 만드는 기존 구현 (비교용)'''
+    linkmap = linkmap.copy()
+    textmap = textmap.copy()
+    img_h, img_w = textmap.shape
+
+    ret, text_score = cv2.threshold(textmap, low_text, 1, 0)
+    ret, link_score = cv2.threshold(linkmap, link_threshold, 1, 0)
+
+    text_score_comb = np.clip(text_score + link_score, 0, 1)
+    nLabels, labels, stats, centroids = cv2.connectedComponentsWithStats(text_score_comb.astype(np.uint8))
+
+    det = []
+    for k in range(1,nLabels):
+        size = stats[k, cv2.CC_STAT_AREA]
+        if size < 10: continue
+
+        if np.max(textmap[labels==k]) < text_threshold: continue
+
+        segmap = np.zeros(textmap.shape, dtype=np.uint8)
+        segmap[labels==k] = 255
+        segmap[np.logical_and(link_score==1, text_score==0)] = 0
+        x, y = stats[k, cv2.CC_STAT_LEFT], stats[k, cv2.CC_STAT_TOP]
+        w, h = stats[k, cv2.CC_STAT_WIDTH], stats[k, cv2.CC_STAT_HEIGHT]
+        niter = int(math.sqrt(size * min(w, h) / (w * h)) * 2)
+        sx, ex, sy, ey = x - niter, x + w + niter + 1, y - niter, y + h + niter + 1
+        if sx < 0 : sx = 0
+        if sy < 0 : sy = 0
+        if ex >= img_w: ex = img_w
+        if ey >= img_h: ey = img_h
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT,(1 + niter, 1 + niter))
+        segmap[sy:ey, sx:ex] = cv2.dilate(segmap[sy:ey, sx:ex], kernel)
+
+        np_contours = np.roll(np.array(np.where(segmap!=0)),1,axis=0).transpose().reshape(-1,2)
+        rectangle = cv2.minAreaRect(np_contours)
+        box = cv2.boxPoints(rectangle)
+
+        w, h = np.linalg.norm(box[0] - box[1]), np.linalg.norm(box[1] - box[2])
+        box_ratio = max(w, h) / (min(w, h) + 1e-5)
+        if abs(1 - box_ratio) <= 0.1:
+            l, r = min(np_contours[:,0]), max(np_contours[:,0])
+            t, b = min(np_contours[:,1]), max(np_contours[:,1])
+            box = np.array([[l, t], [r, t], [r, b], [l, b]], dtype=np.float32)
+
+        startidx = box.sum(axis=1).argmin()
+        box = np.roll(box, 4-startidx, 0)
+        box = np.array(box)
+
+        det.append(box)
+
+    return det
+
+
+def synthetic_score_maps(seed=0, height=640, width=452):
+    '''명세표처럼 작은 글자 영역이 많은 score map (canvas 1280 기준 절반 크기)'''
+    rng = np.random.default_rng(seed)
+    textmap = np.zeros((height, width), dtype=np.float32)
+    linkmap = np.zeros((height, width), dtype=np.float32)
+    for row in range(8, height - 8, 12):
+        x = 4
+        while x < width - 30:
+            n_chars = int(rng.integers(1, 6))
+            for c in range(n_chars):
+                cx, cy = x + c * 6, row + int(rng.integers(-1, 2))
+                cv2.circle(textmap, (cx, cy), 3, float(rng.uniform(0.2, 1.0)), -1)
+                if c:
+                    cv2.line(linkmap, (cx - 6, cy), (cx, cy), float(rng.uniform(0.1, 1.0)), 2)
+            x += n_chars * 6 + int(rng.integers(6, 20))
+    textmap = cv2.GaussianBlur(textmap, (3, 3), 0)
+    return textmap, linkmap
+
+
+def same_boxes(boxes, reference):
+    return len(boxes) == len(reference) and all(np.array_equal(a, b) for a, b in zip(boxes, reference))
+
+
+def check(name, textmap, linkmap):
+    ok = True
+    for link_threshold in LINK_THRESHOLDS:
+        start = time.time()
+        reference = getDetBoxes_core_reference(textmap, linkmap, TEXT_THRESHOLD, link_threshold, LOW_TEXT)
+        reference_time = time.time() - start
+
+        start = time.time()
+        boxes = getDetBoxes_core(textmap, linkmap, TEXT_THRESHOLD, link_threshold, LOW_TEXT)
+        roi_time = time.time() - start
+
+        same = same_boxes(boxes, reference)
+        ok = ok and same
+        print(f'{name} link={link_threshold}: box {len(boxes)}개, {"같음" if same else "다름"}, '
+              f'기존 {reference_time:.3f}초 / ROI {roi_time:.3f}초')
+    return ok
+
+
+if __name__ == '__main__':
+    ok = True
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            data = np.load(path)
+            ok = check(path, data['textmap'], data['linkmap']) and ok
+    else:
+        for seed in range(3):
+            textmap, linkmap = synthetic_score_maps(seed)
+            ok = check(f'synthetic-{seed}', textmap, linkmap) and ok
+    sys.exit(0 if ok else 1)
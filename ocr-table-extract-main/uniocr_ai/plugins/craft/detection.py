@@ -8,7 +8,6 @@ import torch
 import torch.backends.cudnn as cudnn
 from torch.autograd import Variable
 import cv2
-import numpy as np
 from craft.craft_utils import adjustResultCoordinates, getDetBoxes
 from craft.imgproc import resize_aspect_ratio, normalizeMeanVariance
 from craft.craft import CRAFT
@@ -40,13 +39,50 @@ def test_net(net, image, text_threshold, link_threshold, low_text, cuda, canvas_
     img_resized, target_ratio = resize_aspect_ratio(image, square_size=canvas_size,
                                                                   interpolation=cv2.INTER_LINEAR, mag_ratio=mag_ratio)
 
-    ratio_h = ratio_w = 1 / target_ratio
-
     # preprocessing
+    x = to_tensor(img_resized).unsqueeze(0)  # [c, h, w] to [b, c, h, w]
+
+    # forward pass
+    score_texts, score_links = forward(net, x, cuda, refine_net)
+
+    # t0 = time.time() - t0
+    # t1 = time.time()
+
+    # if args.show_time : print("\ninfer/postproc time : {:.3f}/{:.3f}".format(t0, t1))
+
+    return post_process(score_texts[0], score_links[0], target_ratio, text_threshold, link_threshold, low_text)
+
+
+def test_net_batch(net, images, text_threshold, link_threshold, low_text, cuda, canvas_size, mag_ratio, refine_net=None, batch_size=4):
+    '''여러 페이지 이미지를 resize 후 크기가 같은 것끼리 묶어서 한 번에 forward, 이미지별 boxes 목록 반환
+    한 PDF의 페이지는 보통 크기가 같아서 같은 canvas로 묶인다'''
+    resized = [resize_aspect_ratio(image, square_size=canvas_size, interpolation=cv2.INTER_LINEAR, mag_ratio=mag_ratio)
+               for image in images]
+
+    # canvas 크기별로 그룹
+    groups = OrderedDict()
+    for i, (img_resized, _) in enumerate(resized):
+        groups.setdefault(img_resized.shape, []).append(i)
+
+    results = [None] * len(images)
+    for indices in groups.values():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            x = torch.stack([to_tensor(resized[i][0]) for i in batch])
+            score_texts, score_links = forward(net, x, cuda, refine_net)
+            for i, score_text, score_link in zip(batch, score_texts, score_links):
+                results[i] = post_process(score_text, score_link, resized[i][1], text_threshold, link_threshold, low_text)
+    return results
+
+
+def to_tensor(img_resized):
     x = normalizeMeanVariance(img_resized)
-    x = torch.from_numpy(x).permute(2, 0, 1)  # [h, w, c] to [c, h, w]
-    x = Variable(x.unsqueeze(0))  # [c, h, w] to [b, c, h, w]
+    return torch.from_numpy(x).permute(2, 0, 1)  # [h, w, c] to [c, h, w]
 
+
+def forward(net, x, cuda, refine_net=None):
+    '''[b, c, h, w] 입력으로 배치 전체의 score text/link map 반환'''
+    x = Variable(x)
     if cuda:
         x = x.cuda()
 
@@ -55,18 +91,21 @@ def test_net(net, image, text_threshold, link_threshold, low_text, cuda, canvas_
         y, feature = net(x)
 
     # make score and link map
-    score_text = y[0, :, :, 0].cpu().data.numpy()
-    score_link = y[0, :, :, 1].cpu().data.numpy()
+    score_text = y[:, :, :, 0].cpu().data.numpy()
+    score_link = y[:, :, :, 1].cpu().data.numpy()
 
     # refine link
     if refine_net is not None:
         with torch.no_grad():
             y_refiner = refine_net(y, feature)
 
-        score_link = y_refiner[0, :, :, 0].cpu().data.numpy()
+        score_link = y_refiner[:, :, :, 0].cpu().data.numpy()
 
-    # t0 = time.time() - t0
-    # t1 = time.time()
+    return score_text, score_link
+
+
+def post_process(score_text, score_link, target_ratio, text_threshold, link_threshold, low_text):
+    ratio_h = ratio_w = 1 / target_ratio
 
     # Post-processing
     boxes = getDetBoxes(score_text, score_link, text_threshold, link_threshold, low_text)
@@ -74,12 +113,6 @@ def test_net(net, image, text_threshold, link_threshold, low_text, cuda, canvas_
     # coordinate adjustment
     boxes = adjustResultCoordinates(boxes, ratio_w, ratio_h)
 
-    # render results (optional)
-    render_img = score_text.copy()
-    render_img = np.hstack((render_img, score_link))
-
-    # if args.show_time : print("\ninfer/postproc time : {:.3f}/{:.3f}".format(t0, t1))
-
     return boxes
 
 
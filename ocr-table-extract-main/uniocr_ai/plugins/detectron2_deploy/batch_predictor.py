@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import torch
+import detectron2.data.transforms as T
+from detectron2.checkpoint import DetectionCheckpointer
+from detectron2.modeling import build_model
+
+from micro_batcher import MicroBatcher
+
+
+class BatchPredictor(MicroBatcher):
+    '''DefaultPredictor와 같은 전처리/추론을 여러 페이지 이미지에 대해 한 번의 model 호출로 수행
+    predict_batch(images)는 페이지별 predictions(dict) 목록을 반환하고,
+    predictor(image)는 다른 스레드(페이지)의 호출과 batch_size개까지 모아서 추론한 뒤 자기 결과만 돌려준다.
+    모은 페이지는 resize 후 크기가 같은 것끼리 묶어서, padding 때문에 한 장씩 추론한 결과와 달라지지 않게 한다.
+    max_wait = 0이면 호출한 스레드에서 바로 한 장씩 추론 (DefaultPredictor와 같음)'''
+    def __init__(self, cfg, batch_size=1, max_wait=0.0):
+        super().__init__(max_wait, 'detectron-batch')
+        self.cfg = cfg.clone()
+        self.model = build_model(self.cfg)
+        self.model.eval()
+        DetectionCheckpointer(self.model).load(cfg.MODEL.WEIGHTS)
+        self.aug = T.ResizeShortestEdge([cfg.INPUT.MIN_SIZE_TEST, cfg.INPUT.MIN_SIZE_TEST], cfg.INPUT.MAX_SIZE_TEST)
+        self.input_format = cfg.INPUT.FORMAT
+        self.batch_size = max(1, batch_size)
+
+    def __call__(self, image):
+        '''BGR 이미지 한 장의 predictions (다른 페이지와 묶여서 실행될 수 있음)'''
+        if self.max_wait <= 0 or self.batch_size == 1:
+            return self.predict_batch([image])[0]
+
+        return self.submit(image)
+
+    def preprocess(self, image):
+        '''DefaultPredictor와 같은 test-time resize, 모델 입력 dict 반환'''
+        if self.input_format == 'RGB':
+            image = image[:, :, ::-1]
+        height, width = image.shape[:2]
+        resized = self.aug.get_transform(image).apply_image(image)
+        tensor = torch.as_tensor(resized.astype('float32').transpose(2, 0, 1))
+        return {'image': tensor, 'height': height, 'width': width}
+
+    def predict_batch(self, images):
+        '''BGR 이미지 목록의 predictions 목록 (입력 순서대로)'''
+        inputs = [self.preprocess(image) for image in images]
+        groups = dict()
+        for i, data in enumerate(inputs):
+            groups.setdefault(tuple(data['image'].shape), []).append(i)
+
+        results = [None] * len(images)
+        with torch.no_grad():
+            for indices in groups.values():
+                for start in range(0, len(indices), self.batch_size):
+                    batch = indices[start:start + self.batch_size]
+                    outputs = self.model([inputs[i] for i in batch])
+                    for i, output in zip(batch, outputs):
+                        results[i] = output
+        return results
+
+    def batch_limit(self, first):
+        return self.batch_size
+
+    def run_batch(self, images):
+        return self.predict_batch(images)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+'''BatchPredictor 벤치마크
+페이지 이미지 목록을 기존 방식(DefaultPredictor로 한 장씩)과 BatchPredictor(batch 크기별)로
+CPU에서 추론해서 걸린 시간과 검출 box가 같은지 비교한다.
+
+실행 (uniocr_ai 경로에서, config.ini의 [Detectron] 모델 사용):
+    PYTHONPATH=plugins python -m detectron2_deploy.bench_batch Source/Image/*.png
+이미지를 주지 않으면 표/사진 모양이 있는 임의 페이지(PREVIEW_SCALE 크기)로 확인한다.
+'''
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from detectron2.engine.defaults import DefaultPredictor
+
+from detectron2_deploy.batch_predictor import BatchPredictor
+from detectron2_deploy.detect_crop import setup_cfg
+
+BATCH_SIZES = (1, 2, 4, 8)
+PAGE_COUNT = 8
+BOX_TOLERANCE = 1e-3
+
+
+def cpu_cfg():
+    cfg = setup_cfg().clone()
+    cfg.defrost()
+    cfg.MODEL.DEVICE = 'cpu'
+    cfg.freeze()
+    return cfg
+
+
+def synthetic_pages(count=PAGE_COUNT, seed=0, height=1263, width=893):
+    '''표 격자와 사진 영역이 있는 흰 페이지'''
+    rng = np.random.default_rng(seed)
+    pages = []
+    for _ in range(count):
+        page = np.full((height, width, 3), 255, dtype=np.uint8)
+        top = int(rng.integers(80, 300))
+        rows = int(rng.integers(8, 25))
+        for r in range(rows + 1):
+            y = top + r * 30
+            cv2.line(page, (60, y), (width - 60, y), (0, 0, 0), 1)
+        for x in np.linspace(60, width - 60, 7).astype(int):
+            cv2.line(page, (int(x), top), (int(x), top + rows * 30), (0, 0, 0), 1)
+        if rng.random() < 0.5:
+            y = min(top + rows * 30 + 40, height - 260)
+            page[y:y + 220, 120:420] = rng.integers(0, 255, (220, 300, 3), dtype=np.uint8)
+        pages.append(page)
+    return pages
+
+
+def load_pages(paths):
+    pages = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f'{path}: 읽을 수 없음')
+            continue
+        pages.append(image)
+    return pages
+
+
+def same_predictions(a, b):
+    a, b = a['instances'].to('cpu'), b['instances'].to('cpu')
+    if len(a) != len(b) or not torch.equal(a.pred_classes, b.pred_classes):
+        return False
+    return torch.allclose(a.pred_boxes.tensor, b.pred_boxes.tensor, atol=BOX_TOLERANCE)
+
+
+def bench(pages):
+    cfg = cpu_cfg()
+    torch.set_grad_enabled(False)
+
+    single = DefaultPredictor(cfg)
+    single(pages[0])    # 첫 호출 준비 시간 제외
+    start = time.time()
+    reference = [single(page) for page in pages]
+    loop_time = time.time() - start
+    print(f'페이지 {len(pages)}장, 기존 방식(한 장씩): {loop_time:.2f}초 ({loop_time / len(pages):.3f}초/페이지)')
+
+    ok = True
+    batched = BatchPredictor(cfg)
+    batched.predict_batch(pages[:1])
+    for batch_size in BATCH_SIZES:
+        batched.batch_size = batch_size
+        start = time.time()
+        results = batched.predict_batch(pages)
+        batch_time = time.time() - start
+        same = all(same_predictions(a, b) for a, b in zip(results, reference))
+        ok = ok and same
+        print(f'batch {batch_size}: {batch_time:.2f}초 ({batch_time / len(pages):.3f}초/페이지, '
+              f'x{loop_time / batch_time:.2f}), 결과 {"같음" if same else "다름"}')
+    return ok
+
+
+if __name__ == '__main__':
+    pages = load_pages(sys.argv[1:]) if len(sys.argv) > 1 else synthetic_pages()
+    if not pages:
+        sys.exit(1)
+    sys.exit(0 if bench(pages) else 1)
@@ -1,6 +1,5 @@
 # Copyright (c) Facebook, Inc. and its affiliates.
 
-import json
 import torch
 import cv2
 import shutil
@@ -9,16 +8,24 @@ from PIL import Image
 from configs import detectron_config
 
 from detectron2.config import get_cfg
-from detectron2.engine.defaults import DefaultPredictor
 from file_manager import make_detectron_directory, detectron_table_path, detectron_figure_path
 
+from artifact_cache import artifact_cache, image_key
+from artifact_writer import artifact_writer
+from detectron2_deploy.batch_predictor import BatchPredictor
 from common_module import write_log
+from model_registry import LazyModel
 from configs import etc_config
+from page_pool import ordered_map
 
 # class = ['table', 'figure']
 table_threshold = float(detectron_config['table_threshold'])
 figure_threshold = float(detectron_config['figure_threshold'])
 debug_mode = detectron_config['debug_mode'] == 'True'
+batch_size = int(detectron_config['batch_size'])
+batch_max_wait = float(detectron_config['batch_max_wait_ms']) / 1000
+# 후보가 아니라 추론하지 않은 페이지의 결과 (process_image 결과와 같은 형태)
+SKIPPED = ([], 0, [], 0.0, 0.0)
 
 def setup_cfg():
     '''Detectron2 설정'''
@@ -36,7 +43,8 @@ def setup_cfg():
     cfg.freeze()
     return cfg
 
-predictor = DefaultPredictor(setup_cfg())
+# 동시에 처리 중인 페이지를 batch_size장까지 묶어서 추론, 처음 추론할 때 로드
+predictor = LazyModel('Detectron2', lambda: BatchPredictor(setup_cfg(), batch_size, batch_max_wait))
 
 
 def filter_containing_boxes(boxes, scores, containment_threshold=0.7):
@@ -86,37 +94,62 @@ def calculate_area(box):
     return (box[2] - box[0]) * (box[3] - box[1])
 
 
-def process_image(image, predictor, image_path, oid, fig_savepath=''):
-    '''한 페이지 이미지 처리'''
+def crop_box(page_images, image_path, box):
+    '''원래 해상도 box 영역 PIL 이미지'''
+    return Image.fromarray(page_images.clip_rgb(image_path, box))
+
+
+def predict_boxes(image, predictor, factor=1.0):
+    '''(표 box 목록, 그림 box 목록) 원래 해상도 좌표, 검출 결과가 없으면 None'''
+    predictions = predictor(image)
+    if 'instances' not in predictions:
+        return None
+
+    instances = predictions['instances']
+    instances.pred_boxes.scale(factor, factor)  # 원래 해상도 좌표로
+
+    indices = torch.where(instances.pred_classes == 0)[0]
+    indices = indices[instances.scores[indices] >= table_threshold]
+    boxes = instances.pred_boxes[indices].tensor.tolist()
+    scores = instances.scores[indices].tolist()
+    table_boxes, _ = filter_containing_boxes(boxes, scores)   # 큰 박스 필터링 (table인 경우에만)
+
+    indices = torch.where(instances.pred_classes == 1)[0]
+    indices = indices[instances.scores[indices] >= figure_threshold]
+    figure_boxes = instances.pred_boxes[indices].tensor.tolist()
+    return table_boxes, figure_boxes
+
+
+def process_image(image, predictor, image_path, oid, page_images, factor=1.0, fig_savepath=''):
+    '''한 페이지 이미지 처리
+    image는 원래 해상도를 factor배 줄인 이미지일 수 있고, 결과 box와 그림은 원래 해상도 기준
+    같은 이미지의 검출 결과가 artifact_cache에 있으면 추론하지 않는다'''
     # 추론 시작 시간 기록
     inference_start_time = time.time()
 
     # 객체 검출
-    predictions = predictor(image)
+    cache_key = f'{image_key(image)}:{factor}'
+    boxes = artifact_cache.get('detectron', cache_key)
+    cached = boxes is not None
+    if not cached:
+        boxes = predict_boxes(image, predictor, factor)
+        artifact_cache.put('detectron', cache_key, boxes)
 
     # 추론 종료 시간 기록
     inference_time = time.time() - inference_start_time
 
-    if 'instances' not in predictions:
+    if boxes is None:
         write_log(f'[detectron] 객체 검출 결과 없음: {image_path}', etc_config['LOG_LEVEL_WARNING'], oid)
         return [], 0, [], inference_time, 0.0
-
-    instances = predictions['instances']
-
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    image = Image.fromarray(rgb_image)  # PIL 이미지
+    table_boxes, figure_boxes = boxes
 
     # table
     tables = []
-    indices = torch.where(instances.pred_classes == 0)[0]
-    indices = indices[instances.scores[indices] >= table_threshold]
-    boxes = instances.pred_boxes[indices].tensor.tolist()
-    scores = instances.scores[indices].tolist()
-    boxes, scores = filter_containing_boxes(boxes, scores)   # 큰 박스 필터링 (table인 경우에만)
+    boxes = table_boxes
 
     if debug_mode:
         for i, box in enumerate(boxes):
-            table_img = image.crop(box)
+            table_img = crop_box(page_images, image_path, box)
             table_image_path = detectron_table_path(image_path, i)
             table_img.save(table_image_path)
 
@@ -130,16 +163,13 @@ def process_image(image, predictor, image_path, oid, fig_savepath=''):
     figure_save_time = 0.0
 
     # figure
-    indices = torch.where(instances.pred_classes == 1)[0]
-    indices = indices[instances.scores[indices] >= figure_threshold]
-    boxes = instances.pred_boxes[indices].tensor.tolist()
-    scores = instances.scores[indices].tolist()
+    boxes = figure_boxes
 
     page_num = image_path.split('_')[1].split('.')[0]
 
     figure_images = list()
     for i, box in enumerate(boxes):
-        figure_img = image.crop(box)
+        figure_img = crop_box(page_images, image_path, box)
         figure_image_path = f'{fig_savepath}_{page_num}_{i}.png'
         figure_img.save(figure_image_path)
         figure_images.append(figure_image_path)
@@ -150,37 +180,66 @@ def process_image(image, predictor, image_path, oid, fig_savepath=''):
     figure_save_time = time.time() - figure_save_start_time
 
     # 전체 처리 시간 계산 및 기록
-    log_string = (f'[detectron] {int(page_num):>2}페이지 │ 표 {table_count}개 / 그림 {figure_count}개 탐지 │ 추론 시간: {inference_time:.4f}초')
+    log_string = (f'[detectron] {int(page_num):>2}페이지 │ 표 {table_count}개 / 그림 {figure_count}개 탐지 │ 추론 시간: {inference_time:.4f}초{" (캐시)" if cached else ""}')
     if figure_count:
         log_string += f' │ 그림 이미지 저장: {figure_save_time:.4f}초'
     write_log(log_string, etc_config['LOG_LEVEL_INFO'], oid)
 
     return tables, table_count, figure_images, inference_time, figure_save_time
 
-def detection_request(image_path_list, json_output_path, timeStr, fig_savepath, oid):
+def detect_page(image_path, oid, fig_savepath, page_images, page_no=0, triage=None):
+    '''한 페이지 이미지 가져오기 + 추론 (페이지별로 병렬 실행 가능)
+    detectron은 짧은 변을 줄여서 추론하므로 PDF 페이지는 저해상도 이미지를 쓴다
+    triage가 있으면 명세표/그림 후보가 아닌 페이지는 추론하지 않는다 (텍스트 페이지는 렌더링도 하지 않음)'''
+    text_page = triage is not None and triage.has_text(page_no)
+    if text_page and not triage.text_page(page_no):
+        triage.skip(page_no)
+        return image_path, SKIPPED, None
+
+    image, factor = page_images.preview(image_path)
+    if image is None:
+        write_log(f'[detectron] 이미지를 읽을 수 없음: {image_path}', etc_config['LOG_LEVEL_ERROR'], oid)
+        return image_path, None, 'E300'
+
+    if len(image.shape) == 2:  # 흑백 이미지
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
+
+    if triage is not None and not text_page and not triage.image_page(page_no, image_path, image):
+        triage.skip(page_no)
+        return image_path, SKIPPED, None
+
+    try:
+        result = process_image(image, predictor, image_path, oid, page_images, factor, fig_savepath)
+    except:
+        write_log(f'[detectron] 추론 중 오류: {image_path}', etc_config['LOG_LEVEL_ERROR'], oid)
+        return image_path, None, 'E300'
+    return image_path, result, None
+
+
+def detection_request(image_path_list, json_output_path, timeStr, fig_savepath, oid, page_images, on_page=None, triage=None):
+    '''image_path_list는 페이지가 준비되는 대로 나오는 iterable이어도 된다 (PageStream)
+    on_page(page_no, image_path, tables)는 페이지 결과가 나올 때마다 페이지 순서대로 호출
+    triage(PageTriage)가 있으면 명세표/그림 후보 페이지만 추론한다'''
     make_detectron_directory(timeStr, debug_mode)
     detectron_results = dict()
     total_infer_time = 0.0
     total_tables = 0
     total_save_time = 0.0
     all_figure_images = []
-
-    for image_path in image_path_list:
-        image = cv2.imread(image_path)
-        if image is None:
-            write_log(f'[detectron] 이미지를 읽을 수 없음: {image_path}', etc_config['LOG_LEVEL_ERROR'], oid)
-            return None, None, 'E300'
-        
-        if len(image.shape) == 2:  # 흑백 이미지
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-        elif image.shape[2] == 4:
-            image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
-
-        try:
-            tables, table_count, figure_images, infer_time, save_time = process_image(image, predictor, image_path, oid, fig_savepath)
-        except:
-            write_log(f'[detectron] 추론 중 오류: {image_path}', etc_config['LOG_LEVEL_ERROR'], oid)
-            return None, None, 'E300'
+    page_count = 0
+
+    # 페이지별 추론은 병렬로, 결과는 페이지 순서대로 모은다
+    pages = ((image_path, oid, fig_savepath, page_images, page_no, triage) for page_no, image_path in enumerate(image_path_list))
+    for page_no, (image_path, result, error_code) in enumerate(ordered_map(detect_page, pages)):
+        if error_code:
+            return None, None, error_code
+
+        page_count += 1
+        tables, table_count, figure_images, infer_time, save_time = result
+        if on_page:
+            on_page(page_no, image_path, tables)
         if tables:
             detectron_results[image_path] = tables
             total_tables += table_count
@@ -189,17 +248,13 @@ def detection_request(image_path_list, json_output_path, timeStr, fig_savepath,
         all_figure_images.extend(figure_images)
 
     # 전체 결과 요약 로그
-    write_log(
-        f"[detectron] 전체 결과 │ 총 표 {total_tables}개 / 그림 {len(all_figure_images)}개 │ "
-        f"총 추론 시간: {total_infer_time:.4f}초 │ 총 이미지 저장 시간: {total_save_time:.4f}초",
-        etc_config['LOG_LEVEL_INFO'], oid
-    )
+    log_string = (f"[detectron] 전체 결과 │ 총 표 {total_tables}개 / 그림 {len(all_figure_images)}개 │ "
+                  f"총 추론 시간: {total_infer_time:.4f}초 │ 총 이미지 저장 시간: {total_save_time:.4f}초")
+    if triage is not None:
+        log_string += f" │ 후보가 아니라 건너뛴 페이지: {len(triage.skipped)}/{page_count}페이지"
+    write_log(log_string, etc_config['LOG_LEVEL_INFO'], oid)
 
-    try:
-        with open(json_output_path, 'w', encoding='utf-8') as f:
-            json.dump(detectron_results, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        write_log(f'[detectron] {json_output_path}:' + str(e), etc_config['LOG_LEVEL_ERROR'], oid)
-        return None, None, 'E301'
+    # 이후 단계는 detectron_results를 그대로 쓰고, JSON은 디버그/감사 모드에서만 저장
+    artifact_writer.write_json(json_output_path, detectron_results, oid)
 
     return detectron_results, all_figure_images, None
\ No newline at end of file
@@ -50,5 +50,11 @@ error_message = {
     'E919': 'OCR 이력(MD-05) 삽입에 실패했습니다.',
 
     # Workflow
-    'E500': 'Workflow PDF 변환 요청이 실패했습니다.'
+    'E500': 'Workflow PDF 변환 요청이 실패했습니다.',
+
+    # Job
+    'E600': '작업 대기열이 가득 찼습니다. 잠시 후 다시 요청해주세요.',
+    'E601': '존재하지 않는 작업 ID입니다.',
+    'E602': '서버가 준비(워밍업) 중입니다. 잠시 후 다시 요청해주세요.',
+    'E603': '서버 워밍업에 실패했습니다.'
 }
\ No newline at end of file
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    '''여러 스레드(페이지/요청)의 요청을 모아서 한 번에 실행하는 백그라운드 스레드
+    첫 요청 후 max_wait초가 지나거나 요청 크기(request_size) 합이 batch_limit만큼 모이면 run_batch를 실행하고
+    결과를 요청별로 돌려준다. max_wait = 0이면 호출한 스레드에서 바로 실행
+    하위 클래스는 run_batch(requests) -> 요청별 결과 목록, batch_limit(첫 요청), request_size(요청)를 구현한다'''
+    def __init__(self, max_wait, name):
+        self.max_wait = max_wait
+        self.name = name
+        self.requests = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def run_batch(self, requests):
+        raise NotImplementedError
+
+    def batch_limit(self, first):
+        raise NotImplementedError
+
+    def request_size(self, request):
+        return 1
+
+    def submit(self, request):
+        '''request의 결과 반환 (다른 스레드의 요청과 묶여서 실행될 수 있음)'''
+        if self.max_wait <= 0:
+            return self.run_batch([request])[0]
+
+        future = Future()
+        self._queue().put((request, future))
+        return future.result()
+
+    def _queue(self):
+        # 스레드는 fork 후 자식 프로세스에 복사되지 않으므로 프로세스마다 처음 사용할 때 시작
+        with self.lock:
+            if self.pid != os.getpid():
+                self.requests = queue.Queue()
+                self.pid = os.getpid()
+                threading.Thread(target=self._loop, args=(self.requests,), name=self.name, daemon=True).start()
+            return self.requests
+
+    def _loop(self, requests):
+        while True:
+            pending = [requests.get()]
+            limit = self.batch_limit(pending[0][0])
+            count = self.request_size(pending[0][0])
+            deadline = time.time() + self.max_wait
+            while count < limit:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                count += self.request_size(request[0])
+            self._run(pending)
+
+    def _run(self, pending):
+        try:
+            results = self.run_batch([request for request, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from common_module import write_log
+from configs import etc_config, worker_config
+
+# 서버 시작 시 (prefork면 fork 전 부모에서) 미리 로드할 모델, 나머지는 처음 사용할 때 로드
+PRELOAD_MODELS = [name.strip() for name in worker_config['PRELOAD_MODELS'].split(',') if name.strip()]
+
+# 구성요소 -> 준비에 걸린 시간(초), 시작/워밍업 로그와 상태 조회용
+startup_times = OrderedDict()
+startup_lock = threading.Lock()
+
+
+@contextmanager
+def timed(name):
+    '''with 블록에 걸린 시간을 startup_times[name]에 기록하고 로그를 남긴다'''
+    start = time.time()
+    yield
+    elapsed = time.time() - start
+    with startup_lock:
+        startup_times[name] = elapsed
+    write_log(f'[시작] {name} 준비 {elapsed:.2f}초', etc_config['LOG_LEVEL_INFO'])
+
+
+class LazyModel:
+    '''처음 사용할 때 load_func()로 모델을 만드는 핸들 (여러 스레드가 동시에 써도 한 번만 로드)
+    모듈 import 시에는 모델을 만들지 않아서 쓰지 않는 모델은 메모리와 시작 시간을 쓰지 않는다'''
+    def __init__(self, name, load_func):
+        self.name = name
+        self.load_func = load_func
+        self.model = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def get(self):
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    with timed(f'{self.name} 모델'):
+                        self.model = self.load_func()
+        return self.model
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+def load_ocr():
+    from ocr.ocr import load_ocr_models
+    error_code = load_ocr_models()
+    if error_code:
+        raise RuntimeError(f'OCR 모델 로드 실패 ({error_code})')
+
+
+def load_detectron():
+    from detectron2_deploy.detect_crop import predictor
+    predictor.get()
+
+
+def load_tatr():
+    from tatr.inference import pipe
+    pipe.get()
+
+
+# 이름 -> 로드 함수 (모듈 import도 처음 로드할 때 한다)
+MODEL_LOADERS = OrderedDict([
+    ('ocr', load_ocr),
+    ('detectron', load_detectron),
+    ('tatr', load_tatr),
+])
+
+
+def load_models(names=None):
+    '''names(기본: 전체)의 모델을 로드하고 {이름: 걸린 시간(초)} 반환, 이미 로드된 모델은 바로 넘어간다'''
+    names = list(MODEL_LOADERS) if names is None else names
+    times = dict()
+    for name in names:
+        if name not in MODEL_LOADERS:
+            raise ValueError(f'알 수 없는 모델: {name}')
+        start = time.time()
+        MODEL_LOADERS[name]()
+        times[name] = time.time() - start
+    return times
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+
+import torch
+
+from common_module import write_log
+from configs import etc_config, ocr_config
+
+EAGER = 'eager'
+TORCHSCRIPT = 'torchscript'
+ONNX = 'onnx'
+BACKENDS = (EAGER, TORCHSCRIPT, ONNX)
+
+# CRAFT / 인식기 추론 backend, torchscript/onnx는 ocr.export_models로 만든 파일을 사용
+BACKEND = ocr_config['BACKEND'].strip().lower()
+EXPORT_PATH = ocr_config['MODEL_EXPORT_PATH']
+EXTENSIONS = {TORCHSCRIPT: '.pt', ONNX: '.onnx'}
+# 인식기는 TPS + ResNet + BiLSTM(encoder)만 변환하고, [s]에서 멈추는 attention greedy decoding은 eager로 실행
+CRAFT_NAME = 'craft'
+ENCODER_NAME = 'recognizer_encoder'
+
+
+def export_file(name, backend, path=EXPORT_PATH):
+    return os.path.join(path, name + EXTENSIONS[backend])
+
+
+class OnnxModule:
+    '''onnxruntime(CPU) 세션을 torch 모듈처럼 호출 (tensor 입력 -> tensor 또는 tensor tuple)'''
+    def __init__(self, file):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = onnxruntime.InferenceSession(file, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        outputs = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})
+        outputs = [torch.from_numpy(output).to(x.device) for output in outputs]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+    def eval(self):
+        return self
+
+
+def load_module(name, backend, device='cpu', path=EXPORT_PATH):
+    file = export_file(name, backend, path)
+    if not os.path.isfile(file):
+        raise FileNotFoundError(f'{file} 없음 (python -m ocr.export_models --backend {backend})')
+    if backend == TORCHSCRIPT:
+        module = torch.jit.load(file, map_location=device)
+        module.eval()
+        return torch.jit.optimize_for_inference(torch.jit.freeze(module)) if device == 'cpu' else module
+    return OnnxModule(file)
+
+
+class Recognizer:
+    '''변환한 encoder + eager attention decoder, Model.predict와 같은 결과 형식'''
+    def __init__(self, model, encoder):
+        self.model = model
+        self.encoder = encoder
+
+    def predict(self, input):
+        return self.model.Prediction.greedy_decode(self.encoder(input), batch_max_length=self.model.opt.batch_max_length)
+
+    def eval(self):
+        return self
+
+
+def select(backend, oid=''):
+    if backend not in BACKENDS:
+        write_log(f'[OCR] 알 수 없는 BACKEND {backend}, eager 사용', etc_config['LOG_LEVEL_WARNING'], oid)
+        return EAGER
+    return backend
+
+
+def detector_backend(net, device='cpu', backend=BACKEND, oid=''):
+    '''get_detector로 만든 CRAFT를 backend로 바꾼다 (net(x) -> (y, feature) 형식 유지)
+    변환 파일이 없거나 불러오지 못하면 eager 모델을 그대로 사용'''
+    backend = select(backend, oid)
+    if backend == EAGER:
+        return net
+    try:
+        module = load_module(CRAFT_NAME, backend, device)
+    except Exception as e:
+        write_log(f'[OCR] CRAFT {backend} 로드 실패, eager 사용: {e}', etc_config['LOG_LEVEL_WARNING'], oid)
+        return net
+    write_log(f'[OCR] CRAFT backend: {backend}', etc_config['LOG_LEVEL_INFO'], oid)
+    return module
+
+
+def recognizer_backend(model, device='cpu', backend=BACKEND, oid=''):
+    '''get_recognizer로 만든 모델(DataParallel)에서 predict(image)를 가진 인식기 반환'''
+    model = model.module if isinstance(model, torch.nn.DataParallel) else model
+    model.eval()
+    backend = select(backend, oid)
+    if backend == EAGER:
+        return model
+    try:
+        encoder = load_module(ENCODER_NAME, backend, device)
+    except Exception as e:
+        write_log(f'[OCR] 인식기 {backend} 로드 실패, eager 사용: {e}', etc_config['LOG_LEVEL_WARNING'], oid)
+        return model
+    write_log(f'[OCR] 인식기 backend: {backend}', etc_config['LOG_LEVEL_INFO'], oid)
+    return Recognizer(model, encoder)
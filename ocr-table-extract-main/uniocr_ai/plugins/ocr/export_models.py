@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+'''CRAFT / 인식기 TorchScript, ONNX 변환과 eager 결과 비교
+CRAFT 전체와 인식기의 encoder(TPS + ResNet + BiLSTM)를 [OCR] MODEL_EXPORT_PATH에 저장하고,
+저장한 파일을 서버와 같은 방법(ocr.backends)으로 불러와서 eager 모델과 결과(score map, box, 인식 글자)와 시간을 비교한다.
+attention decoder는 [s]가 나오면 batch에서 빠지는 반복이라 변환하지 않고 eager로 실행한다.
+
+실행 (uniocr_ai 경로에서):
+    PYTHONPATH=plugins python -m ocr.export_models --backend all 페이지이미지...
+    PYTHONPATH=plugins python -m ocr.export_models --backend onnx --check-only
+이미지를 주지 않으면 워밍업용 합성 명세표 페이지로 확인한다. 결과가 다르면 종료 코드 1
+'''
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+import ocr.ocr as ocr_module
+from craft.detection import forward, get_detector, post_process, to_tensor
+from craft.imgproc import resize_aspect_ratio
+from ocr.backends import (BACKENDS, CRAFT_NAME, EAGER, ENCODER_NAME, EXPORT_PATH, ONNX, TORCHSCRIPT,
+                          Recognizer, export_file, load_module)
+from recognition.dataset import AlignCollate
+from recognition.recognition import get_recognizer
+
+OID = 'export'
+ONNX_OPSET = 16     # grid_sample (TPS)
+SCORE_TOLERANCE = 1e-3
+BOX_TOLERANCE = 1.0     # 원래 이미지 픽셀
+CONFIDENCE_TOLERANCE = 1e-3
+LINK_THRESHOLD = 0.8
+REPEAT = 3
+
+
+class Encoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input):
+        return self.model.encode(input)
+
+
+def load_eager(opt):
+    net, _ = get_detector(opt.detector, False, False, opt.refiner)
+    net.eval()
+    model, converter = get_recognizer(opt)
+    model = model.module.to('cpu')
+    model.eval()
+    return net, model, converter
+
+
+def export_craft(net, backend, file, canvas=(736, 1280)):
+    x = torch.randn(1, 3, *canvas)
+    with torch.no_grad():
+        if backend == TORCHSCRIPT:
+            torch.jit.save(torch.jit.trace(net, x), file)
+        else:
+            torch.onnx.export(net, x, file, opset_version=ONNX_OPSET, input_names=['image'], output_names=['y', 'feature'],
+                              dynamic_axes={'image': {0: 'batch', 2: 'height', 3: 'width'},
+                                            'y': {0: 'batch', 1: 'height', 2: 'width'},
+                                            'feature': {0: 'batch', 2: 'height', 3: 'width'}})
+
+
+def export_encoder(model, opt, backend, file, batch_size=4):
+    encoder = Encoder(model).eval()
+    x = torch.randn(batch_size, opt.input_channel, opt.imgH, opt.imgW)
+    with torch.no_grad():
+        if backend == TORCHSCRIPT:
+            torch.jit.save(torch.jit.trace(encoder, x), file)
+        else:
+            torch.onnx.export(encoder, x, file, opset_version=ONNX_OPSET, input_names=['image'], output_names=['feature'],
+                              dynamic_axes={'image': {0: 'batch'}, 'feature': {0: 'batch'}})
+
+
+def timed(func, repeat=REPEAT):
+    '''(마지막 결과, 평균 시간(초)), 첫 호출 준비 시간 제외'''
+    result = func()
+    start = time.time()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.time() - start) / repeat
+
+
+def load_pages(paths):
+    if not paths:
+        from api.warmup import synthetic_page
+        from to_image import render_page
+        doc = synthetic_page()
+        pages = [render_page(doc[0])]
+        doc.close()
+        return [cv2.cvtColor(page, cv2.COLOR_BGR2RGB) for page in pages]
+    pages = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f'{path}: 읽을 수 없음')
+            continue
+        pages.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return pages
+
+
+def same_boxes(a, b):
+    if len(a) != len(b):
+        return False
+    return all(np.abs(np.array(box_a) - np.array(box_b)).max() <= BOX_TOLERANCE for box_a, box_b in zip(a, b))
+
+
+def check_craft(net, module, opt, pages):
+    '''페이지별 score map 차이, box 일치 여부와 forward 시간 비교, 페이지 box 목록(eager) 반환'''
+    ok = True
+    eager_time = backend_time = 0.0
+    page_boxes = []
+    for i, page in enumerate(pages):
+        img_resized, target_ratio = resize_aspect_ratio(page, square_size=opt.canvas_size, interpolation=cv2.INTER_LINEAR, mag_ratio=opt.mag_ratio)
+        x = to_tensor(img_resized).unsqueeze(0)
+        (eager_text, eager_link), t0 = timed(lambda: forward(net, x, False))
+        (text, link), t1 = timed(lambda: forward(module, x, False))
+        eager_time, backend_time = eager_time + t0, backend_time + t1
+
+        diff = max(np.abs(eager_text - text).max(), np.abs(eager_link - link).max())
+        boxes = post_process(eager_text[0], eager_link[0], target_ratio, opt.text_threshold, LINK_THRESHOLD, opt.low_text)
+        same = same_boxes(boxes, post_process(text[0], link[0], target_ratio, opt.text_threshold, LINK_THRESHOLD, opt.low_text))
+        ok = ok and same and diff <= SCORE_TOLERANCE
+        print(f'  CRAFT {i}페이지 {tuple(x.shape[2:])}: score 최대 차이 {diff:.2e}, box {len(boxes)}개 {"같음" if same else "다름"}')
+        page_boxes.append(boxes)
+    print(f'  CRAFT forward: eager {eager_time:.3f}초, 변환 {backend_time:.3f}초 (x{eager_time / max(backend_time, 1e-9):.2f})')
+    return ok, page_boxes
+
+
+def crops(pages, page_boxes):
+    '''검출 box 영역의 회색조 글자 이미지 (recognize_images 입력과 같은 PIL 이미지)'''
+    images = []
+    for page, boxes in zip(pages, page_boxes):
+        gray = cv2.cvtColor(page, cv2.COLOR_RGB2GRAY)
+        for box in boxes:
+            x0, y0 = np.maximum(np.array(box).min(axis=0).astype(int), 0)
+            x1, y1 = np.array(box).max(axis=0).astype(int)
+            if x1 > x0 and y1 > y0:
+                images.append(Image.fromarray(gray[y0:y1, x0:x1], 'L'))
+    return images
+
+
+def check_recognizer(model, encoder, converter, opt, images):
+    '''encoder 출력 차이, 인식 글자/confidence 일치 여부와 시간 비교'''
+    if not images:
+        print('  인식기: 비교할 글자 이미지 없음')
+        return True
+    collate = AlignCollate(imgH=opt.imgH, imgW=opt.imgW, keep_ratio_with_pad=opt.PAD)
+    recognizer = Recognizer(model, encoder)
+    ok = True
+    diff = 0.0
+    eager_time = backend_time = 0.0
+    mismatches = 0
+    with torch.no_grad():
+        for start in range(0, len(images), opt.batch_size):
+            batch = images[start:start + opt.batch_size]
+            x, _ = collate([(image, i) for i, image in enumerate(batch)])
+            diff = max(diff, float((model.encode(x) - encoder(x)).abs().max()))
+            expected, t0 = timed(lambda: model.predict(x))
+            actual, t1 = timed(lambda: recognizer.predict(x))
+            eager_time, backend_time = eager_time + t0, backend_time + t1
+            for (tokens_a, conf_a), (tokens_b, conf_b) in zip(expected, actual):
+                if tokens_a != tokens_b or abs(conf_a - conf_b) > CONFIDENCE_TOLERANCE:
+                    mismatches += 1
+                    text_a = ''.join(converter.character[t] for t in tokens_a)
+                    text_b = ''.join(converter.character[t] for t in tokens_b)
+                    print(f'    다름: {text_a!r} ({conf_a:.4f}) / {text_b!r} ({conf_b:.4f})')
+    ok = mismatches == 0 and diff <= SCORE_TOLERANCE
+    print(f'  인식기 {len(images)}개: encoder 최대 차이 {diff:.2e}, 글자 다름 {mismatches}개')
+    print(f'  인식기 predict: eager {eager_time:.3f}초, 변환 {backend_time:.3f}초 (x{eager_time / max(backend_time, 1e-9):.2f})')
+    return ok
+
+
+def main(args):
+    error_code = ocr_module.init_opt(OID)
+    if error_code:
+        print(f'OCR 설정 실패 ({error_code})')
+        return False
+    opt = ocr_module.opt
+    torch.set_grad_enabled(False)
+    net, model, converter = load_eager(opt)
+
+    backends = [b for b in BACKENDS if b != EAGER] if args.backend == 'all' else [args.backend]
+    os.makedirs(args.output, exist_ok=True)
+    pages = load_pages(args.images)
+    if not pages:
+        return False
+
+    ok = True
+    for backend in backends:
+        if not args.check_only:
+            export_craft(net, backend, export_file(CRAFT_NAME, backend, args.output))
+            export_encoder(model, opt, backend, export_file(ENCODER_NAME, backend, args.output))
+            print(f'{backend}: {export_file(CRAFT_NAME, backend, args.output)}, {export_file(ENCODER_NAME, backend, args.output)} 저장')
+        print(f'{backend} 비교 (페이지 {len(pages)}장)')
+        craft_ok, page_boxes = check_craft(net, load_module(CRAFT_NAME, backend, path=args.output), opt, pages)
+        recog_ok = check_recognizer(model, load_module(ENCODER_NAME, backend, path=args.output), converter, opt, crops(pages, page_boxes))
+        ok = ok and craft_ok and recog_ok
+        print(f'{backend}: {"eager와 같음" if craft_ok and recog_ok else "eager와 다름"}')
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CRAFT / 인식기 TorchScript, ONNX 변환과 eager 결과 비교')
+    parser.add_argument('images', nargs='*', help='비교할 페이지 이미지 (없으면 합성 페이지)')
+    parser.add_argument('--backend', choices=[TORCHSCRIPT, ONNX, 'all'], default='all')
+    parser.add_argument('--output', default=EXPORT_PATH, help='변환 파일 경로 ([OCR] MODEL_EXPORT_PATH)')
+    parser.add_argument('--check-only', action='store_true', help='변환하지 않고 저장된 파일만 비교')
+    sys.exit(0 if main(parser.parse_args()) else 1)
@@ -2,19 +2,23 @@
 import json
 import os
 import time
-from typing import Tuple
+from functools import partial
+from typing import List, Tuple
 import traceback
 
-from check_pdf import doc_open_ok
+from artifact_cache import artifact_cache, image_key
+from check_pdf import doc_open_ok, fitz_lock
 from to_image import get_image_size
 from to_pdf import create_pdf, create_image_pdf
 from file_manager import ocr_result_PDF2, ocr_result_meta
 from ocr import ocr_meta
+from ocr.page_ocr import DETECT_BATCH_SIZE, PageOcr
 from onbid.extract_agency import is_cover_page_ocr, is_cover_page_pdf, extract_exact_agency_info
 from onbid.extract_titles import extract_page_title_ocr, extract_page_title_pdf, filter_title_fields, text_in_content
 from onbid.table_utils import check_detail_page, check_detail_ocr, is_bbox_overlap
 
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
+import numpy as np
 import torch
 
 import easydict
@@ -33,9 +37,18 @@ opt_lock = threading.Lock()
 
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 title_ratio = float(ocr_config['TITLE_RATIO'])
+# 디버그 모드는 인식 단계(classfy_run)에서 글자 crop 이미지를 저장하므로 인식 필드 artifact는 쓰지 않는다
+OCR_DEBUG = ocr_config['debug_mode'] == 'True'
 
 # OCR 실행 후 결과를 JSON 및 PDF (JSON 내장) 저장
-def ocr_run(pageNo, image_path, scale, oid, link_threshold, ocr_rect=None) -> Tuple[dict, str]:
+def ocr_run(pageNo, image_path, scale, oid, link_threshold, ocr_rect=None, page_images=None) -> Tuple[dict, str]:
+    return ocr_run_batch([(pageNo, image_path, ocr_rect)], scale, oid, link_threshold, page_images)[0]
+
+
+def ocr_run_batch(pages, scale, oid, link_threshold, page_images=None) -> List[Tuple[dict, str]]:
+    '''(pageNo, image_path, ocr_rect) 목록을 탐지는 묶어서, 인식은 페이지별로 수행
+    같은 OCR 영역 이미지의 결과(인식 필드, CRAFT box)가 artifact_cache에 있으면 그 단계는 건너뛴다 (OCR_DEBUG면 인식은 항상 실행)
+    페이지 순서대로 (page_data, errCode) 목록 반환'''
     ocr = ocr_craft
 
     global opt
@@ -43,12 +56,57 @@ def ocr_run(pageNo, image_path, scale, oid, link_threshold, ocr_rect=None) -> Tu
         error_code = init_opt(oid)
         if error_code:
             insert_error_history(error_code, oid)
-            return None, error_code
+            return [(None, error_code)] * len(pages)
 
-    errCode = ocr.load_models(opt, oid)
+    errCode = load_ocr_models(oid)
     if errCode:
-        return {}, errCode
+        return [({}, errCode)] * len(pages)
+
+    results = [None] * len(pages)
+    images = dict()
+    keys = dict()
+    for k, (pageNo, image_path, ocr_rect) in enumerate(pages):
+        write_log(ocr_log(pageNo, ocr_rect), etc_config['LOG_LEVEL_INFO'], oid)
+        try:
+            image = ocr.load_image(image_path, ocr_rect, page_images)
+        except Exception as e:
+            write_log(str(e), etc_config['LOG_LEVEL_ERROR'], oid)
+            results[k] = ({}, 'E906')
+            continue
+
+        keys[k] = f'{image_key(image)}:{link_threshold}'
+        fields = None if OCR_DEBUG else artifact_cache.get('fields', f'{keys[k]}:{scale}')
+        if fields is None:
+            images[k] = image
+        else:
+            results[k] = cached_page(pageNo, image_path, fields, scale, ocr_rect, page_images)
+
+    # detect
+    bboxes_list = dict()
+    for k in images:
+        bboxes = artifact_cache.get('craft', keys[k])
+        if bboxes is not None:
+            bboxes_list[k] = [np.array(box) for box in bboxes]
+    detect = [k for k in images if k not in bboxes_list]
+    try:
+        if len(detect) == 1:
+            bboxes_list[detect[0]] = ocr.detect_run(opt, link_threshold, images[detect[0]])
+        elif detect:
+            bboxes_list.update(zip(detect, ocr.detect_batch(opt, link_threshold, [images[k] for k in detect])))
+    except Exception as e:
+        write_log(str(e), etc_config['LOG_LEVEL_ERROR'], oid)
+        return [result or ({}, 'E907') for result in results]
+    for k in detect:
+        artifact_cache.put('craft', keys[k], [np.asarray(box).tolist() for box in bboxes_list[k]])
+
+    # classify
+    for k in images:
+        pageNo, image_path, ocr_rect = pages[k]
+        results[k] = classify_page(pageNo, image_path, bboxes_list[k], images[k], scale, oid, ocr_rect, page_images, f'{keys[k]}:{scale}')
+    return results
+
 
+def ocr_log(pageNo, ocr_rect):
     ocr_log = f"[OCR] {pageNo}페이지"
     if ocr_rect is None:
         ocr_log += " OCR"
@@ -58,27 +116,29 @@ def ocr_run(pageNo, image_path, scale, oid, link_threshold, ocr_rect=None) -> Tu
         ocr_log += " 명세표인지 OCR"
     elif ocr_rect == 'agency':
         ocr_log += " 기관 OCR"
-    
-    write_log(ocr_log, etc_config['LOG_LEVEL_INFO'], oid)
-    
-    try:
-        image = ocr.load_image(image_path, ocr_rect)
-    except Exception as e:
-        write_log(str(e), etc_config['LOG_LEVEL_ERROR'], oid)
-        return {}, 'E906'
+    return ocr_log
 
-    # detect
-    try:
-        bboxes = ocr.detect_run(opt, link_threshold, image)
-    except Exception as e:
-        write_log(str(e), etc_config['LOG_LEVEL_ERROR'], oid)
-        return {}, 'E907'
 
-    # classify
-    (errCode, page_data) = ocr.classfy_run(opt, pageNo, image_path, bboxes, image, scale, oid)
+def classify_page(pageNo, image_path, bboxes, image, scale, oid, ocr_rect, page_images=None, cache_key=None) -> Tuple[dict, str]:
+    (errCode, page_data) = ocr_craft.classfy_run(opt, pageNo, image_path, bboxes, image, scale, oid, page_images)
     if errCode:
         return {}, errCode
-    
+    if cache_key:
+        artifact_cache.put('fields', cache_key, page_data['FIELDS'])
+
+    # JSON 결과값 리턴
+    return finish_page(page_data, ocr_rect), errCode
+
+
+def cached_page(pageNo, image_path, fields, scale, ocr_rect, page_images=None) -> Tuple[dict, str]:
+    '''artifact_cache에 있던 인식 필드로 page_data 생성'''
+    h, w = get_image_size(image_path, scale, page_images)
+    page_data = ocr_meta.create_page(pageNo, image_path, '', w, h)
+    ocr_meta.set_fields(page_data, fields)
+    return finish_page(page_data, ocr_rect), ''
+
+
+def finish_page(page_data, ocr_rect):
     page_data['OCR_TYPE'] = ocr_rect if ocr_rect else "FULL"
 
     # 하단으로 옮기기
@@ -87,9 +147,16 @@ def ocr_run(pageNo, image_path, scale, oid, link_threshold, ocr_rect=None) -> Tu
         for field in page_data['FIELDS']:
             field['FIELD_RELM'][1] += offset_y
             field["FIELD_RELM_NOM"][1] = 0.75 + field["FIELD_RELM_NOM"][1] * 0.25
+    return page_data
+
+def load_ocr_models(oid='') -> str:
+    '''OCR 설정 및 탐지/인식 모델 로드 (서버 시작 시 미리 로드할 때도 사용)'''
+    if opt is None:
+        error_code = init_opt(oid)
+        if error_code:
+            return error_code
+    return ocr_craft.load_models(opt, oid)
 
-    # JSON 결과값 리턴
-    return page_data, errCode
 
 # OPT 설정
 def init_opt(oid) -> str:
@@ -116,7 +183,7 @@ def init_opt(oid) -> str:
                 opt.device = "cpu"
 
             opt.workers = 0
-            opt.batch_size = 512
+            opt.batch_size = int(ocr_config['RECOG_BATCH_SIZE'])
             opt.text_threshold = 0.3
             opt.low_text = 0.3
             # opt.link_threshold = 0.8 # property_type에 따라 변경
@@ -179,19 +246,50 @@ def insert_error_history(errorCode, oid):
         error_insert({'ERROR_CODE': 'E919', 'ERROR_MESSAGE': error_message['E919'], 'METHOD': 'OCR'}, oid)
 
 
-def skip_ocr(i, image_path, scale):
-    h, w = get_image_size(image_path, scale)
+def skip_ocr(i, image_path, scale, page_images):
+    h, w = get_image_size(image_path, scale, page_images)
     return ocr_meta.skip_page(i, image_path, w, h)
 
 
-def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid):
+def immovable_page_ocr(scale, oid, page_images):
+    return PageOcr(partial(ocr_run, page_images=page_images), scale, oid, link_threshold=0.8)
+
+
+def prefetch_immovable_page(page_ocr, i, image_path, status, has_table):
+    '''부동산 문서 한 페이지에서 필요할 가능성이 높은 OCR을 미리 병렬로 시작 (페이지가 준비되는 대로 호출 가능)
+    표지는 대부분 첫 페이지라 첫 페이지가 이미지면 전체 OCR, 명세표 후보와 앞쪽 페이지는 제목 OCR'''
+    if status == Status.TEXT:
+        return
+    if i == 0:
+        page_ocr.prefetch(i, image_path)
+    elif has_table or i < 5:
+        page_ocr.prefetch(i, image_path, 'title')
+
+
+def prefetch_immovable(page_ocr, pdf_status, image_path_list, detectron_results):
+    for i, image_path in enumerate(image_path_list):
+        prefetch_immovable_page(page_ocr, i, image_path, pdf_status[i], image_path in detectron_results)
+
+
+def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid, page_images, page_ocr=None):
+    '''page_ocr: 페이지 스트림 단계에서 이미 OCR을 미리 시작해둔 실행기 (없으면 여기서 만든다)'''
+    if page_ocr is None:
+        page_ocr = immovable_page_ocr(scale, oid, page_images)
+        prefetch_immovable(page_ocr, pdf_status, image_path_list, detectron_results)
+    try:
+        return immovable_pages(page_ocr, doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid, page_images)
+    finally:
+        page_ocr.close()
+
+
+def immovable_pages(page_ocr, doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, detectron_results, rotate, scale, oid, page_images):
     metadata = ocr_meta.create(orgFileName, originalSavePath, orgTimeStr)
     cover_page_idx = None
     summary_page_idx = None
     summary_possible = True
     detail_pages = []
+    deferred_pages = []     # 제목으로 필요한 페이지인 걸 확인하고 전체 OCR 결과는 나중에 받을 페이지
     start_time = time.time()
-    link_threshold = 0.8
 
     bug_pdf = False
     if not (doc_open_ok(originalSavePath, doc, image_path_list) or all(status == Status.TEXT for status in pdf_status)):
@@ -202,21 +300,26 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
     for i, image_path in enumerate(image_path_list):
         detail_possible = image_path in detectron_results
         if pdf_status[i] == Status.TEXT:    # 텍스트 페이지
-            page_data = skip_ocr(i, image_path, scale)
-            page = doc.load_page(i)
+            page_data = skip_ocr(i, image_path, scale, page_images)
+            # 텍스트 레이어를 읽는 동안 다른 스레드가 렌더링하지 않게 fitz 호출은 fitz_lock 안에서 (page_ocr.run을 기다릴 때는 풀어둔다)
+            with fitz_lock:
+                page = doc.load_page(i)
             ocr_meta.add_page(metadata, page_data)
 
             if cover_page_idx is None:
                 # 나라감정평가법인, 대일감정원
-                agency_info = extract_exact_agency_info(cover_page_idx, page, scale)
+                with fitz_lock:
+                    agency_info = extract_exact_agency_info(cover_page_idx, page, scale)
                 if agency_info:
                     cover_page_idx = i
                     continue
                 # TODO agency_info return 하는 거 필요
 
-                if is_cover_page_pdf(page, page_data):
+                with fitz_lock:
+                    cover_page = is_cover_page_pdf(page, page_data)
+                if cover_page:
                     cover_page_idx = i 
-                    agency_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold, 'agency')
+                    agency_data, error_code = page_ocr.run(i, image_path, 'agency')
                     if error_code:
                         return immovable_ocr_error(error_code, oid)
                     metadata['PAGES'][i]['FIELDS'] = filter_new_fields(page, agency_data['FIELDS'], 'agency')
@@ -224,7 +327,8 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
                     continue
 
             if summary_possible or detail_possible:
-                title_text, title_type = extract_page_title_pdf(page, summary_possible, detail_possible)
+                with fitz_lock:
+                    title_text, title_type = extract_page_title_pdf(page, summary_possible, detail_possible)
                 if title_type:
                     if title_type == "감정평가표":
                         summary_page_idx = i
@@ -232,8 +336,10 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
                     elif title_type == "감정평가명세표":
                         detail_pages.append((i, title_text))
 
-                    if not text_in_content(page):                # 제목 부분이 text인데 내용 부분은 이미지
-                        page_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold)
+                    with fitz_lock:
+                        content_text = text_in_content(page)
+                    if not content_text:                # 제목 부분이 text인데 내용 부분은 이미지
+                        page_data, error_code = page_ocr.run(i, image_path)
                         if error_code:
                             return immovable_ocr_error(error_code, oid)
                         metadata['PAGES'][i]['FIELDS'] = [field for field in page_data['FIELDS'] if field['FIELD_RELM_NOM'][3] > title_ratio]
@@ -243,10 +349,12 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
                 # 제목은 안나왔는데 Detectron돼서 명세표일 수도 있을 때, 명세표는 1페이지에 1개
                     table_rect = [x / scale for x in detectron_results[image_path][0]]
                     if page_data['PAGE_HEIGHT'] * 0.5 < table_rect[3] - table_rect[1]:
-                        if check_detail_page(page, table_rect):   # 명세표는 큼
+                        with fitz_lock:
+                            detail_page = check_detail_page(page, table_rect)
+                        if detail_page:   # 명세표는 큼
                             detail_pages.append((i, ''))
                         else:
-                            title_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold, 'detectron')
+                            title_data, error_code = page_ocr.run(i, image_path, 'detectron')
                             if error_code:
                                 return immovable_ocr_error(error_code, oid)
                             
@@ -258,7 +366,7 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
 
         else:   # 이미지 페이지
             if cover_page_idx is None:  # full ocr
-                page_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold)
+                page_data, error_code = page_ocr.run(i, image_path)
                 if error_code:
                     return immovable_ocr_error(error_code, oid)
                 pdf_status[i] = Status.OCR
@@ -275,7 +383,7 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
                             detail_pages.append((i, title_text))
 
             elif summary_possible or detail_possible:
-                page_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold, 'title')
+                page_data, error_code = page_ocr.run(i, image_path, 'title')
                 if error_code:
                     return immovable_ocr_error(error_code, oid)
                 
@@ -286,23 +394,29 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
                         summary_possible = False
                     elif title_type == "감정평가명세표" and detail_possible:
                         detail_pages.append((i, title_text))
-                    
-                    page_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold)
-                    if error_code:
-                        return immovable_ocr_error(error_code, oid)
+
+                    # 전체 OCR 결과는 이후 페이지 판단에 쓰이지 않으므로 미리 시작만 하고 루프 뒤에 받는다
+                    page_ocr.prefetch(i, image_path)
+                    deferred_pages.append(i)
                     pdf_status[i] = Status.OCR
 
             else:
-                page_data = skip_ocr(i, image_path, scale)
+                page_data = skip_ocr(i, image_path, scale, page_images)
 
             ocr_meta.add_page(metadata, page_data)
 
+    for i in deferred_pages:
+        page_data, error_code = page_ocr.run(i, image_path_list[i])
+        if error_code:
+            return immovable_ocr_error(error_code, oid)
+        metadata['PAGES'][i] = page_data
+
     # 표지, 감정평가표 못 찾았을 때
     cover_page_idx = cover_page_idx or 0
     if summary_page_idx is None:
         summary_page_idx = cover_page_idx + 1 if len(pdf_status) > cover_page_idx + 1 else cover_page_idx
         if pdf_status[summary_page_idx] == Status.RAW:
-            page_data, error_code = ocr_run(summary_page_idx, image_path_list[summary_page_idx], scale, oid, link_threshold)
+            page_data, error_code = page_ocr.run(summary_page_idx, image_path_list[summary_page_idx])
             if error_code:
                 return immovable_ocr_error(error_code, oid)
             pdf_status[summary_page_idx] = Status.OCR
@@ -313,17 +427,19 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
     # 원본 파일이 텍스트 PDF일 때, OCR 다시 한 거 없을 때
     if all(status == Status.TEXT for status in pdf_status):
         write_log("[TEXT PDF] 원본 파일이 텍스트 PDF 입니다.", etc_config['LOG_LEVEL_INFO'], oid)
-        doc.close()
+        with fitz_lock:
+            doc.close()
         return originalSavePath, cover_page_idx, summary_page_idx, detail_pages, page_sizes, None
 
     result_pdf_path = ocr_result_PDF2(orgTimeStr, orgFileName)  # MF-05
     required_pages = {cover_page_idx, summary_page_idx, *[p[0] for p in detail_pages]}   # 필요한 모든 페이지
 
-    if doc:
-        pdf_textfields = fields_from_pdf(required_pages, pdf_status, metadata, doc)
-        doc.close()
-    else:
-        pdf_textfields = dict()
+    with fitz_lock:
+        if doc:
+            pdf_textfields = fields_from_pdf(required_pages, pdf_status, metadata, doc)
+            doc.close()
+        else:
+            pdf_textfields = dict()
 
     if bug_pdf: # 손상파일
         for i in pdf_textfields:
@@ -332,9 +448,9 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
     # PDF 생성
     try:
         if bug_pdf or doc is None:  # 이미지이거나 손상파일
-            create_image_pdf(result_pdf_path, metadata, oid)
+            create_image_pdf(result_pdf_path, metadata, oid, page_images)
         else:
-            create_pdf(originalSavePath, result_pdf_path, required_pages, metadata, pdf_status, rotate, pdf_textfields, oid)
+            create_pdf(originalSavePath, result_pdf_path, required_pages, metadata, pdf_status, rotate, pdf_textfields, oid, page_images)
         write_log('[TEXT PDF] ' + result_pdf_path, etc_config['LOG_LEVEL_INFO'], oid)
     except:
         traceback.print_exc()
@@ -362,14 +478,44 @@ def ocr_immovable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, im
     return result_pdf_path, cover_page_idx, summary_page_idx, detail_pages, page_sizes, None
 
 
-def ocr_movable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid):
+def movable_page_ocr(scale, oid, page_images):
+    return PageOcr(partial(ocr_run, page_images=page_images), scale, oid, link_threshold=0.2,
+                   batch_func=partial(ocr_run_batch, page_images=page_images))
+
+
+def prefetch_movable(page_ocr, image_pages, pdf_status):
+    '''동산은 이미지 페이지를 모두 OCR하므로 페이지가 준비되는 대로 DETECT_BATCH_SIZE장씩 묶어서 시작
+    image_pages는 PageStream이어도 되고, 나온 image_path 목록을 반환'''
+    image_path_list = []
+    chunk = []
+    for i, image_path in enumerate(image_pages):
+        image_path_list.append(image_path)
+        if pdf_status[i] != Status.TEXT:
+            chunk.append((i, image_path, None))
+        if len(chunk) >= DETECT_BATCH_SIZE:
+            page_ocr.prefetch_many(chunk)
+            chunk = []
+    page_ocr.prefetch_many(chunk)
+    return image_path_list
+
+
+def ocr_movable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid, page_images, page_ocr=None):
+    '''page_ocr: 페이지 스트림 단계에서 이미 OCR을 미리 시작해둔 실행기 (없으면 여기서 만든다)'''
+    if page_ocr is None:
+        page_ocr = movable_page_ocr(scale, oid, page_images)
+        prefetch_movable(page_ocr, image_path_list, pdf_status)
+    try:
+        # 원본 파일이 텍스트 PDF
+        if all(status == Status.TEXT for status in pdf_status):
+            return originalSavePath, None
+        return movable_pages(page_ocr, doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid, page_images)
+    finally:
+        page_ocr.close()
+
+
+def movable_pages(page_ocr, doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, image_path_list, rotate, scale, oid, page_images):
     metadata = ocr_meta.create(orgFileName, originalSavePath, orgTimeStr)
     start_time = time.time()
-    link_threshold = 0.2
-
-    # 원본 파일이 텍스트 PDF
-    if all(status == Status.TEXT for status in pdf_status):
-        return originalSavePath, None
 
     bug_pdf = False
     if not doc_open_ok(originalSavePath, doc, image_path_list):
@@ -378,24 +524,25 @@ def ocr_movable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, imag
 
     for i, image_path in enumerate(image_path_list):
         if pdf_status[i] == Status.TEXT:    # 텍스트 페이지
-            page_data = skip_ocr(i, image_path, scale)
+            page_data = skip_ocr(i, image_path, scale, page_images)
             ocr_meta.add_page(metadata, page_data)
 
         else:   # 이미지 페이지
-            page_data, error_code = ocr_run(i, image_path, scale, oid, link_threshold)
+            page_data, error_code = page_ocr.run(i, image_path)
             if error_code:
-                return movable_ocr_error(error_code)
+                return movable_ocr_error(error_code, oid)
             pdf_status[i] = Status.OCR
 
             ocr_meta.add_page(metadata, page_data)
 
     required_pages = set(range(len(image_path_list)))
 
-    if doc:
-        pdf_textfields = fields_from_pdf(required_pages, pdf_status, metadata, doc)
-        doc.close()
-    else:
-        pdf_textfields = dict()
+    with fitz_lock:
+        if doc:
+            pdf_textfields = fields_from_pdf(required_pages, pdf_status, metadata, doc)
+            doc.close()
+        else:
+            pdf_textfields = dict()
 
     if bug_pdf: # 손상파일
         for i in pdf_textfields:
@@ -406,9 +553,9 @@ def ocr_movable(doc, orgFileName, originalSavePath, orgTimeStr, pdf_status, imag
     # PDF 생성
     try:
         if bug_pdf or doc is None:  # 이미지이거나 손상파일
-            create_image_pdf(result_pdf_path, metadata, oid)
+            create_image_pdf(result_pdf_path, metadata, oid, page_images)
         else:
-            create_pdf(originalSavePath, result_pdf_path, required_pages, metadata, pdf_status, rotate, pdf_textfields, oid)
+            create_pdf(originalSavePath, result_pdf_path, required_pages, metadata, pdf_status, rotate, pdf_textfields, oid, page_images)
         write_log('[TEXT PDF] ' + result_pdf_path, etc_config['LOG_LEVEL_INFO'], oid)
     except:
         traceback.print_exc()
@@ -493,12 +640,13 @@ def fields_from_pdf(required_pages, pdf_status, metadata, pdf_doc):
 
 
 def filter_new_fields(page, fields, ocr_rect):
-    if ocr_rect == 'agency':
-        clip = (0, page.rect.height * 0.75, page.rect.width, page.rect.height)
-    elif ocr_rect == 'detectron':
-        clip = (0, 0, page.rect.width, page.rect.height * 0.25)
+    with fitz_lock:
+        if ocr_rect == 'agency':
+            clip = (0, page.rect.height * 0.75, page.rect.width, page.rect.height)
+        elif ocr_rect == 'detectron':
+            clip = (0, 0, page.rect.width, page.rect.height * 0.25)
 
-    blocks = page.get_text('blocks', clip=clip)
+        blocks = page.get_text('blocks', clip=clip)
     blocks = [b for b in blocks if b[4].strip() and b[6] == 0]
     new_fields = []
     for field in fields:
@@ -1,21 +1,24 @@
 # -*- coding: utf-8 -*-
+import bisect
 import os
 from typing import Tuple
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 import torch
-import torch.nn.functional as F
 
 import cv2
 import numpy as np
 from craft.imgproc import loadImage
-from craft.detection import get_detector, test_net
+from craft.detection import get_detector, test_net, test_net_batch
 from recognition.recognition import get_recognizer
 from recognition.dataset import AlignCollate, EditorPostRGBDataset
+from ocr.backends import detector_backend, recognizer_backend
+from quantization import DETECT_QUANTIZE, RECOG_QUANTIZE, load_quantized_craft, quantize_recognizer
 
 from common_module import write_log, get_logger, release_cpu_memory
 from configs import etc_config, ocr_config
 import ocr.line_sort as line_sort
 import ocr.ocr_meta as ocr_meta
+from ocr.recognition_batcher import RecognitionBatcher
 from to_image import get_image_size
 
 import threading
@@ -46,10 +49,11 @@ python3.9 -m pip install pyicu==2.9
 """
 
 CSGT = float(ocr_config['CONFIDENCE_SCORE_GREATER_THAN'])
+DETECT_BATCH_SIZE = int(ocr_config['DETECT_BATCH_SIZE'])
+# 인식 batch를 나누는 crop 가로/세로 비율 경계 (숫자, 호/층 같은 짧은 글자는 앞쪽 구간)
+RATIO_BUCKETS = (1.5, 3, 6, 12)
 logger = get_logger()
 
-counter = 0
-
 def safe_rect(img, box):
     poly = np.array(box).astype(np.int32).reshape((-1))
     poly = poly.reshape(-1, 2)
@@ -103,10 +107,17 @@ def load_models(opt, oid) -> str:
     write_log("[OCR] load_models", etc_config['LOG_LEVEL_INFO'], oid)
 
     with model_lock:
+        # [OCR] *_QUANTIZE면 eager 모델을 int8 양자화, BACKEND가 torchscript/onnx면 변환한 모델로 추론 (refine_net과 attention decoding은 eager)
         if detector is None:
-            detector, refine_net = get_detector(opt.detector, opt.cuda, opt.refine, opt.refiner)
+            net, refine_net = get_detector(opt.detector, opt.cuda, opt.refine, opt.refiner)
+            if DETECT_QUANTIZE:
+                net = load_quantized_craft(net, device=opt.device, oid=oid)
+            detector = detector_backend(net, opt.device, oid=oid)
         if recognizer is None:
-            recognizer, converter = get_recognizer(opt)
+            model, converter = get_recognizer(opt)
+            if RECOG_QUANTIZE:
+                model = quantize_recognizer(model, opt.device, oid)
+            recognizer = recognizer_backend(model, opt.device, oid=oid)
 
         if detector == None or recognizer == None:
             errCode = 'E904'
@@ -118,7 +129,12 @@ def detect_run(opt, link_threshold, image):
     return test_net(detector, image, opt.text_threshold, link_threshold, opt.low_text, opt.cuda, opt.canvas_size, opt.mag_ratio, opt.refine_net)
 
 
-def classfy_run(opt, pageNo, image_file_path, bboxes, image, scale, oid) -> Tuple[str, int, float, dict]:
+def detect_batch(opt, link_threshold, images):
+    '''여러 페이지를 DETECT_BATCH_SIZE장씩 묶어서 탐지, 페이지별 bboxes 목록 반환'''
+    return test_net_batch(detector, images, opt.text_threshold, link_threshold, opt.low_text, opt.cuda, opt.canvas_size, opt.mag_ratio, opt.refine_net, DETECT_BATCH_SIZE)
+
+
+def classfy_run(opt, pageNo, image_file_path, bboxes, image, scale, oid, page_images=None) -> Tuple[str, int, float, dict]:
     # detect 한 문자들을 crop 하고 파일로 저장
     global counter
     with counter_lock:
@@ -150,78 +166,31 @@ def classfy_run(opt, pageNo, image_file_path, bboxes, image, scale, oid) -> Tupl
 
     # prepare data
     try:
-        h, w = get_image_size(image_file_path, scale)
+        h, w = get_image_size(image_file_path, scale, page_images)
         # opt.canvas_size = image_h  # <-- 실제 크기로 치환
         # print(f"width: {image_w},    height: {image_h}")
 
         # Editor 에서 정의한 FIELD_RELM 에 맞게 구해진 boxes  <-- 이걸 JSON 에 담아 리턴해야 함!
         edit_boxes = relm_data.edit_boxes
-        AlignCollate_data = AlignCollate(imgH=opt.imgH, imgW=opt.imgW, keep_ratio_with_pad=opt.PAD)
     except Exception as e:
         logger.error(e)
         return ('E909', None)
 
     try:
-        data_loader = torch.utils.data.DataLoader(relm_data, batch_size=opt.batch_size,
-                                                  shuffle=False,
-                                                  num_workers=int(opt.workers),
-                                                  collate_fn=AlignCollate_data, pin_memory=True)
-
-        # predict
-        recognizer.eval()
+        # predict (다른 페이지/요청의 crop과 묶어서 인식)
+        predictions = recognition_batcher.recognize(opt, relm_data.image_list)
 
         fields = []
-        number = 0
-
-        with torch.no_grad():
-            for image_tensors, image_path_list in data_loader:
-                batch_size = image_tensors.size(0)
-                image = image_tensors.to(opt.device)
-                # For max length prediction
-                length_for_pred = torch.IntTensor([opt.batch_max_length] * batch_size).to(opt.device)
-                text_for_pred = torch.LongTensor(batch_size, opt.batch_max_length + 1).fill_(0).to(opt.device)
-
-                # if 'CTC' in opt.Prediction:
-                #     preds = recognizer(image, text_for_pred)
-
-                #     # Select max probabilty (greedy decoding) then decode index to character
-                #     preds_size = torch.IntTensor([preds.size(1)] * batch_size)
-                #     _, preds_index = preds.max(2)
-                #     # preds_index = preds_index.view(-1)
-                #     preds_str = converter.decode(preds_index, preds_size)
-                # else:
-                preds = recognizer(image, text_for_pred, is_train=False)
-
-                # select max probabilty (greedy decoding) then decode index to character
-                # preds_size = torch.IntTensor([preds.size(1)] * batch_size)
-                _, preds_index = preds.max(2)
-                preds_str = converter.decode(preds_index, length_for_pred)
-
-                preds_prob = F.softmax(preds, dim=2)
-                preds_max_prob, _ = preds_prob.max(dim=2)
-
-                for img_name, pred, pred_max_prob in zip(image_path_list, preds_str, preds_max_prob):
-                    # if 'Attn' in opt.Prediction:
-                    pred_EOS = pred.find('[s]')
-                    pred = pred[:pred_EOS]  # prune after "end of sentence" token ([s])
-                    pred_max_prob = pred_max_prob[:pred_EOS]
-
-                    try:
-                        confidence_score = pred_max_prob.cumprod(dim=0)[-1]
-                    except:
-                        confidence_score = 0  # for empty pred case, when prune after "end of sentence" token ([s])
-
-                    # 정확도가 50% 이하라면 텍스트 아닐 수 있다.
-                    if float(f'{confidence_score:0.4f}') > CSGT:
-                        # FIELDS에 데이터 기입
-                        field_relm = edit_boxes[number]
-                        field = ocr_meta.create_field(str(img_name), pred, field_relm, w, h)
-                        fields.append(field)
-
-                    number = number + 1
-
-            # 텍스트 라인 정렬
-            fields = line_sort.run(fields)
+        for number, (pred, confidence_score) in enumerate(predictions):
+            # 정확도가 50% 이하라면 텍스트 아닐 수 있다.
+            if float(f'{confidence_score:0.4f}') > CSGT:
+                # FIELDS에 데이터 기입
+                field_relm = edit_boxes[number]
+                field = ocr_meta.create_field(str(number), pred, field_relm, w, h)
+                fields.append(field)
+
+        # 텍스트 라인 정렬
+        fields = line_sort.run(fields)
 
         pageData = ocr_meta.create_page(pageNo, image_file_path, ocrCropPath, w, h)
         ocr_meta.set_fields(pageData, fields)
@@ -238,16 +207,61 @@ def classfy_run(opt, pageNo, image_file_path, bboxes, image, scale, oid) -> Tupl
     return ('', pageData)
 
 
-def load_image(image_path, ocr_rect=None):
-    img = loadImage(image_path)
+def ratio_bucket(image):
+    '''crop 이미지 가로/세로 비율 구간 (글자 수가 비슷한 것끼리 묶기 위함)'''
+    w, h = image.size
+    return bisect.bisect(RATIO_BUCKETS, w / max(h, 1))
+
+
+def recognize_images(opt, images) -> list:
+    '''crop 이미지 목록을 비율 구간별로 opt.batch_size개씩 인식해서 입력 순서대로 [(pred, confidence_score), ...] 반환
+    글자 수가 비슷한 crop끼리 묶어야 attention decoder의 batch가 빨리 줄어든다'''
+    AlignCollate_data = AlignCollate(imgH=opt.imgH, imgW=opt.imgW, keep_ratio_with_pad=opt.PAD)
+
+    buckets = dict()
+    for i, image in enumerate(images):
+        buckets.setdefault(ratio_bucket(image), []).append(i)
+    batches = [indices[start:start + opt.batch_size]
+               for _, indices in sorted(buckets.items())
+               for start in range(0, len(indices), opt.batch_size)]
 
-    if ocr_rect:
-        h = img.shape[0]
-        if ocr_rect == 'title':
-            img = img[:int(h * float(ocr_config['TITLE_RATIO'])), :]
-        elif ocr_rect == 'detectron':
-            img = img[:int(h * 0.25), :]
-        elif ocr_rect == 'agency':
-            img = img[int(h * 0.75):, :]
-            
-    return img
\ No newline at end of file
+    results = [None] * len(images)
+    with torch.no_grad():
+        for batch in batches:
+            image_tensors, _ = AlignCollate_data([(images[i], i) for i in batch])
+            image = image_tensors.to(opt.device)
+
+            # greedy decoding, [s]를 낸 문장은 batch에서 빠지고 [s] 이전 글자와 confidence만 반환
+            predictions = recognizer.predict(image)
+
+            for i, (tokens, confidence_score) in zip(batch, predictions):
+                pred = ''.join(converter.character[token] for token in tokens)
+                results[i] = (pred, confidence_score)
+    return results
+
+
+recognition_batcher = RecognitionBatcher(recognize_images, float(ocr_config['RECOG_MAX_WAIT_MS']) / 1000)
+
+
+def ocr_rows(h, ocr_rect=None):
+    '''OCR 영역의 세로 범위 (top, bottom) 픽셀'''
+    if ocr_rect == 'title':
+        return 0, int(h * float(ocr_config['TITLE_RATIO']))
+    elif ocr_rect == 'detectron':
+        return 0, int(h * 0.25)
+    elif ocr_rect == 'agency':
+        return int(h * 0.75), h
+    return 0, h
+
+
+def load_image(image_path, ocr_rect=None, page_images=None):
+    '''OCR할 영역의 RGB 이미지
+    page_images에 있으면 파일을 다시 읽지 않고, 렌더링하지 않은 PDF 페이지는 OCR 영역만 원래 해상도로 렌더링한다'''
+    if page_images is not None:
+        w, h = page_images.size(image_path)
+        top, bottom = ocr_rows(h, ocr_rect)
+        return page_images.clip_rgb(image_path, (0, top, w, bottom))
+
+    img = loadImage(image_path)
+    top, bottom = ocr_rows(img.shape[0], ocr_rect)
+    return img[top:bottom, :]
\ No newline at end of file
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from configs import ocr_config
+from page_pool import PAGE_WORKERS
+
+DETECT_BATCH_SIZE = int(ocr_config['DETECT_BATCH_SIZE'])
+
+
+class PageOcr:
+    '''페이지 OCR을 (페이지 번호, OCR 영역) 단위로 미리 실행해두고 결과를 꺼내 쓰는 실행기
+    페이지 순서에 따라 달라지는 판단(표지/감정평가표/명세표)은 호출하는 쪽에서 순서대로 하고,
+    OCR 자체는 PAGE_WORKERS개 스레드에서 병렬로 수행한다. PAGE_WORKERS = 1이면 run 호출 시점에 실행
+    batch_func가 있으면 prefetch_many로 여러 페이지의 탐지를 묶어서 실행할 수 있다'''
+    def __init__(self, ocr_func, scale, oid, link_threshold, workers=PAGE_WORKERS, batch_func=None):
+        self.ocr_func = ocr_func
+        self.batch_func = batch_func
+        self.scale = scale
+        self.oid = oid
+        self.link_threshold = link_threshold
+        self.executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.futures = dict()
+        self.lock = threading.Lock()
+
+    def _ocr(self, page_no, image_path, ocr_rect):
+        return self.ocr_func(page_no, image_path, self.scale, self.oid, self.link_threshold, ocr_rect)
+
+    def prefetch(self, page_no, image_path, ocr_rect=None):
+        '''나중에 필요할 OCR을 미리 시작'''
+        if self.executor is None:
+            return
+        key = (page_no, ocr_rect)
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = self.executor.submit(self._ocr, page_no, image_path, ocr_rect)
+
+    def prefetch_many(self, pages):
+        '''꼭 필요한 (page_no, image_path, ocr_rect) 목록을 DETECT_BATCH_SIZE개씩 묶어서 실행
+        스레드가 없으면 (PAGE_WORKERS = 1) 바로 순서대로 실행한다'''
+        if self.batch_func is None:
+            for page_no, image_path, ocr_rect in pages:
+                self.prefetch(page_no, image_path, ocr_rect)
+            return
+
+        with self.lock:
+            pages = [page for page in pages if (page[0], page[2]) not in self.futures]
+            batches = []
+            for i in range(0, len(pages), DETECT_BATCH_SIZE):
+                chunk = pages[i:i + DETECT_BATCH_SIZE]
+                futures = [Future() for _ in chunk]
+                for (page_no, _, ocr_rect), future in zip(chunk, futures):
+                    self.futures[(page_no, ocr_rect)] = future
+                batches.append((chunk, futures))
+
+        for chunk, futures in batches:
+            if self.executor is None:
+                self._ocr_batch(chunk, futures)
+            else:
+                self.executor.submit(self._ocr_batch, chunk, futures)
+
+    def _ocr_batch(self, chunk, futures):
+        # 모두 취소된 경우 (close) 실행하지 않음
+        running = [future.set_running_or_notify_cancel() for future in futures]
+        if not any(running):
+            return
+        try:
+            results = self.batch_func(chunk, self.scale, self.oid, self.link_threshold)
+        except Exception as e:
+            for future, is_running in zip(futures, running):
+                if is_running:
+                    future.set_exception(e)
+            return
+        for future, is_running, result in zip(futures, running, results):
+            if is_running:
+                future.set_result(result)
+
+    def run(self, page_no, image_path, ocr_rect=None):
+        '''OCR 결과 (page_data, error_code) 반환, 미리 시작한 게 없으면 지금 실행'''
+        with self.lock:
+            future = self.futures.pop((page_no, ocr_rect), None)
+        if future is None:
+            return self._ocr(page_no, image_path, ocr_rect)
+        return future.result()
+
+    def peek(self, page_no, image_path, ocr_rect=None):
+        '''run과 같지만 결과를 남겨둬서 나중에 같은 OCR을 run하면 다시 실행하지 않는다'''
+        key = (page_no, ocr_rect)
+        with self.lock:
+            future = self.futures.get(key)
+            owner = future is None
+            if owner:
+                future = self.futures[key] = Future()
+        if owner and future.set_running_or_notify_cancel():
+            try:
+                future.set_result(self._ocr(page_no, image_path, ocr_rect))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def close(self):
+        '''쓰지 않은 예측 실행 취소'''
+        if self.executor is None:
+            return
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from micro_batcher import MicroBatcher
+
+
+class RecognitionBatcher(MicroBatcher):
+    '''여러 페이지/요청의 crop 이미지를 모아서 한 번에 인식하는 백그라운드 스레드
+    opt.batch_size장만큼 모이거나 첫 요청 후 max_wait초가 지나면 recognize_func를 실행하고
+    결과를 요청별로 나눠서 돌려준다. max_wait = 0이면 호출한 스레드에서 바로 인식'''
+    def __init__(self, recognize_func, max_wait):
+        super().__init__(max_wait, 'ocr-recognizer')
+        self.recognize_func = recognize_func
+
+    def recognize(self, opt, images):
+        '''images 인식 결과 [(pred, confidence_score), ...] 반환 (다른 요청과 묶여서 실행될 수 있음)'''
+        if not images:
+            return []
+        return self.submit((opt, images))
+
+    def batch_limit(self, first):
+        return first[0].batch_size
+
+    def request_size(self, request):
+        return len(request[1])
+
+    def run_batch(self, requests):
+        opt = requests[0][0]
+        images = [image for _, request_images in requests for image in request_images]
+        results = self.recognize_func(opt, images)
+
+        split = []
+        start = 0
+        for _, request_images in requests:
+            split.append(results[start:start + len(request_images)])
+            start += len(request_images)
+        return split
@@ -1,8 +1,8 @@
 import json
 from onbid.table_utils import find_header_indices, mainheader_keyword
 
-def concat_table(structure_path):
-    """표 구조를 연결하면서 cell 구조 변환"""
+def concat_table(page_structures):
+    """페이지별 표 구조({'page_num', 'table'}, merge_by_serial 결과나 pts)를 연결하면서 cell 구조 변환"""
 
     header_len = {group: 0 for group in mainheader_keyword}
 
@@ -10,11 +10,9 @@ def concat_table(structure_path):
     all_header = []
     all_data = []
 
-    for json_file in structure_path:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            all_page.append(data['page_num'])
-            table = data['table']
+    for data in page_structures:
+        all_page.append(data['page_num'])
+        table = data['table']
 
         header_rows = list()
         data_rows = list()
@@ -104,11 +102,12 @@ if __name__ == "__main__":
     import os
     dir = '../Source/TableStructure/jsons/2025/06/04/test'
 
-    structure = []
-    json_files = [os.path.join(dir, f) for f in os.listdir(dir) if f.endswith('pts_merged.json')]
+    json_files = sorted(os.path.join(dir, f) for f in os.listdir(dir) if f.endswith('pts_merged.json'))
+    pages = []
     for j in json_files:
-        first = j == os.path.join(dir, '2922004_0045_00_pts_merged.json')
-        structure = concat_table(structure, j, first)
-    
+        with open(j, 'r', encoding='utf-8') as f:
+            pages.append(json.load(f))
+    structure = concat_table(pages)
+
     with open(os.path.join(dir, 'concat.json'), 'w', encoding='utf-8') as f:
         json.dump(structure, f, ensure_ascii=False)
\ No newline at end of file
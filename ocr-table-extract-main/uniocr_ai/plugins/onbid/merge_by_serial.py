@@ -236,12 +236,12 @@ def group_and_merge_rows(data, oid):
     return data
 
 
-def merge_by_serial(input_path, oid):
-    """테이블 처리 메인 함수"""
+def merge_by_serial(page_table_structure, oid):
+    """테이블 처리 메인 함수 (page_table_structure는 바꾸지 않고 병합한 복사본 반환)"""
     try:
-        # 데이터 로드 및 처리
-        data = load_json(input_path)
-        
+        # 병합에 실패하면 호출한 쪽이 원래 표를 쓰므로 복사본으로 처리
+        data = copy.deepcopy(page_table_structure)
+
         # 행 병합 처리
         return group_and_merge_rows(data, oid)
 
@@ -250,10 +250,15 @@ def merge_by_serial(input_path, oid):
         return None
 
 if __name__ == "__main__":
+    import json
+
     input_path = "/home/dami/workspace/행나누기/명세표_0425/05.pts_json/0616042_0021_00_pts2.json"
     output_path = "/home/dami/workspace/행나누기/명세표_0425/05.pts_json/0616042_0021_00_pts_merged2.json"
 
     # input_path = "/home/dami/workspace/행나누기/명세표_0425/05.pts_json/1443002_0021_00_pts.json"
     # output_path = "/home/dami/workspace/행나누기/명세표_0425/05.pts_json/1443002_0021_00_pts_merged.json"
     
-    merge_by_serial(input_path, output_path)
\ No newline at end of file
+    merged = merge_by_serial(load_json(input_path), 'merge_by_serial')
+    if merged:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
\ No newline at end of file
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+
+import cv2
+import fitz  # PyMuPDF
+
+from check_pdf import fitz_lock
+from common_module import Status, write_log
+from configs import etc_config, ocr_config, triage_config
+from onbid.extract_titles import extract_page_title_ocr, extract_page_title_pdf, text_in_content
+from onbid.table_utils import check_detail_ocr, check_detail_page
+
+TRIAGE_ENABLED = triage_config['ENABLED'] == 'True'
+# 제목에 있으면 그림(사진, 지도, 도면) 페이지로 보는 단어
+FIGURE_TITLES = [word.strip() for word in triage_config['FIGURE_TITLES'].split(',') if word.strip()]
+# 그림으로 보는 영역이 페이지 면적에서 차지하는 최소 비율
+FIGURE_AREA = float(triage_config['FIGURE_AREA'])
+# 텍스트 페이지에서 이만큼 곡선이 있으면 벡터 그림(지도, 도면, 글자 외곽선)으로 본다
+DRAWING_CURVES = int(triage_config['DRAWING_CURVES'])
+# 이미지 페이지를 이 너비의 격자로 줄여서 (격자 한 칸 = 영역 평균) 어둡거나 색이 있는 칸을 그림으로 본다
+GRID_WIDTH = 32
+DARK_VALUE = 160
+COLOR_SATURATION = 60
+TITLE_RATIO = float(ocr_config['TITLE_RATIO'])
+
+
+def picture_ratio(image):
+    '''이미지 페이지에서 사진/컬러 그림으로 보이는 영역 비율
+    글자만 있는 칸은 줄이면 밝은 회색이 되고, 사진이나 컬러 지도는 어둡거나 채도가 높다'''
+    h, w = image.shape[:2]
+    grid = cv2.resize(image, (GRID_WIDTH, max(1, round(h * GRID_WIDTH / w))), interpolation=cv2.INTER_AREA)
+    if len(grid.shape) == 2:
+        grid = cv2.cvtColor(grid, cv2.COLOR_GRAY2BGR)
+    hsv = cv2.cvtColor(grid, cv2.COLOR_BGR2HSV)
+    picture = (hsv[..., 2] < DARK_VALUE) | (hsv[..., 1] > COLOR_SATURATION)
+    return float(picture.mean())
+
+
+def figure_title(text):
+    text = re.sub(r'[^가-힣]', '', text)
+    return next((word for word in FIGURE_TITLES if word in text), None)
+
+
+class PageTriage:
+    '''detectron을 돌릴 페이지(감정평가명세표나 그림이 있을 수 있는 페이지)를 고르는 단계
+    detectron 결과는 명세표 판단/TATR과 그림 저장에만 쓰이므로, 둘 다 없는 페이지는 추론하지 않는다.
+    텍스트 페이지는 텍스트 레이어(제목, 컬럼명, 이미지/곡선)로, 이미지 페이지는 저해상도 이미지와 제목 영역 OCR로 판단하고
+    애매하면(OCR 실패 등) 후보로 둔다. 페이지별로 병렬 호출 가능
+    title_ocr(page_no, image_path) -> (page_data, error_code): 제목 영역 OCR (결과는 이후 단계에서 재사용)'''
+    def __init__(self, pdf_status, page_images, title_ocr, oid):
+        self.pdf_status = pdf_status
+        self.page_images = page_images
+        self.title_ocr = title_ocr
+        self.oid = oid
+        self.skipped = list()
+        self.lock = threading.Lock()
+
+    def has_text(self, page_no):
+        '''텍스트 레이어로 판단할 수 있는 페이지인지'''
+        return self.page_images.pdf is not None and self.pdf_status[page_no] == Status.TEXT
+
+    def text_page(self, page_no):
+        '''텍스트 페이지가 후보인 이유, 후보가 아니면 빈 문자열'''
+        try:
+            with fitz_lock:   # 렌더링 전용 문서는 OCR/TATR 스레드와 같이 쓴다
+                return self._text_page(self.page_images.pdf.load_page(page_no))
+        except Exception as e:
+            write_log(f'[triage] {page_no}페이지 텍스트 확인 실패: {e}', etc_config['LOG_LEVEL_WARNING'], self.oid)
+            return '텍스트 확인 실패'
+
+    def _text_page(self, page):
+        title_rect = fitz.Rect(0, 0, page.rect.width, page.rect.height * TITLE_RATIO)
+        if extract_page_title_pdf(page, False, True)[1]:
+            return '명세표 제목'
+        if check_detail_page(page, page.rect):
+            return '명세표 컬럼'
+        if not text_in_content(page):
+            return '내용이 이미지'
+        if figure_title(page.get_text(clip=title_rect)):
+            return '그림 제목'
+        page_area = abs(page.rect)
+        image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+        if image_area >= page_area * FIGURE_AREA:
+            return '이미지'
+        curves = sum(1 for path in page.get_drawings() for item in path['items'] if item[0] == 'c')
+        if curves >= DRAWING_CURVES:
+            return '벡터 그림'
+        return ''
+
+    def image_page(self, page_no, image_path, image):
+        '''이미지 페이지가 후보인 이유, 후보가 아니면 빈 문자열 (image: detectron에 넣을 저해상도 이미지)'''
+        if picture_ratio(image) >= FIGURE_AREA:
+            return '그림 영역'
+        try:
+            page_data, error_code = self.title_ocr(page_no, image_path)
+        except Exception as e:
+            write_log(f'[triage] {page_no}페이지 제목 OCR 실패: {e}', etc_config['LOG_LEVEL_WARNING'], self.oid)
+            return '제목 OCR 실패'
+        if error_code:
+            return '제목 OCR 실패'
+        fields = page_data['FIELDS']
+        if extract_page_title_ocr(fields, False, True)[1]:
+            return '명세표 제목'
+        if check_detail_ocr(fields):
+            return '명세표 컬럼'
+        if figure_title(''.join(field['FIELD_TEXT'] for field in fields)):
+            return '그림 제목'
+        return ''
+
+    def skip(self, page_no):
+        with self.lock:
+            self.skipped.append(page_no)
+        write_log(f'[triage] {page_no:>2}페이지 │ 명세표/그림 후보 아님, detectron 생략', etc_config['LOG_LEVEL_INFO'], self.oid)
@@ -0,0 +1,200 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from check_pdf import fitz_lock, open_pdf
+from configs import etc_config, ocr_config, page_image_config
+from to_image import PDF_TO_IMAGE_SCALE, PREVIEW_SCALE, render_page
+
+MEMORY_LIMIT = int(page_image_config['MEMORY_MB']) * 1024 * 1024
+SPILL_PATH = page_image_config['SPILL_PATH'] or None
+# 원본/디버그 보관 설정일 때만 페이지 PNG를 Source/Image에 저장
+KEEP_FILES = ocr_config['SOURCE_CREATE'] == 'True' or etc_config['debug_mode'] == 'True'
+
+
+class PageImages:
+    '''작업 하나 동안 페이지 이미지(cv2 BGR 배열)를 메모리에 들고 있는 캐시
+    키는 기존 페이지 이미지 경로(source_image)라서 경로를 넘기던 코드는 같은 값으로 꺼내 쓴다.
+    메모리 상한을 넘으면 먼저 넣은 페이지부터 .npy로 내려두고, PNG는 KEEP_FILES이거나 materialize할 때만 쓴다
+    PDF 페이지는 단계마다 필요한 만큼만 렌더링한다: detectron은 preview(저해상도), OCR/TATR은 clip(원래 해상도의 해당 영역)
+    좌표는 항상 원래 해상도(scale) 기준 픽셀이다'''
+    def __init__(self, memory_limit=MEMORY_LIMIT, keep_files=KEEP_FILES):
+        self.memory_limit = memory_limit
+        self.keep_files = keep_files
+        self.images = OrderedDict()   # path -> 배열 (메모리)
+        self.spilled = dict()         # path -> .npy 경로
+        self.sizes = dict()           # path -> (width, height)
+        self.memory = 0
+        self.spill_dir = None
+        self.spill_count = 0
+        self.pdf = None               # 렌더링 전용 문서 (open_pdf)
+        self.scale = PDF_TO_IMAGE_SCALE
+        self.pdf_pages = dict()       # path -> 페이지 번호 (렌더링하지 않고 등록만 한 PDF 페이지)
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, path, image, write=True):
+        '''페이지 이미지 등록, write이고 KEEP_FILES면 PNG도 저장'''
+        if write and self.keep_files:
+            cv2.imwrite(path, image)
+        with self.lock:
+            self._remove(path)
+            self.images[path] = image
+            self.sizes[path] = (image.shape[1], image.shape[0])
+            self.memory += image.nbytes
+            self._spill()
+
+    def open_pdf(self, pdf_path, scale=PDF_TO_IMAGE_SCALE):
+        '''PDF 페이지를 필요한 해상도/영역으로 다시 렌더링할 문서를 연다
+        작업 스레드가 텍스트를 읽는 문서와 따로 열고, 어느 문서든 fitz 호출은 fitz_lock 안에서 한다'''
+        self.pdf = open_pdf(pdf_path)
+        self.scale = scale
+
+    def put_pdf_page(self, path, page_no, size):
+        '''렌더링하지 않은 PDF 페이지 등록, 픽셀이 필요한 단계가 요청할 때 필요한 만큼만 렌더링한다
+        size는 scale 기준 (width, height) 픽셀 (PDF 페이지 크기로 구한 값)'''
+        with self.lock:
+            self.pdf_pages[path] = page_no
+            self.sizes[path] = size
+
+    def get(self, path):
+        '''BGR 이미지 반환, 캐시에 없으면 PDF 페이지는 렌더링하고 그 외에는 파일에서 읽는다'''
+        image = self._cached(path)
+        if image is not None:
+            return image
+        with self.lock:
+            page_no = self.pdf_pages.get(path)
+        if page_no is not None:
+            image = self.render(page_no, self.scale)
+            self.put(path, image, write=False)
+            return image
+        image = cv2.imread(path)
+        if image is not None and len(image.shape) == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        return image
+
+    def rgb(self, path):
+        image = self.get(path)
+        return None if image is None else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def preview(self, path):
+        '''(저해상도 BGR 이미지, 원래 해상도 / 저해상도 배율) 반환
+        PDF 페이지가 아니면 원래 이미지를 그대로 준다 (배율 1)'''
+        if self.pdf is None or self.scale <= PREVIEW_SCALE:
+            return self.get(path), 1.0
+        with self.lock:
+            page_no = self.pdf_pages.get(path)
+        full = self._cached(path)
+        if full is None and page_no is not None:
+            image = self.render(page_no, PREVIEW_SCALE)
+        else:
+            full = self.get(path) if full is None else full
+            image = cv2.resize(full, None, fx=PREVIEW_SCALE / self.scale, fy=PREVIEW_SCALE / self.scale, interpolation=cv2.INTER_AREA)
+        return image, self.scale / PREVIEW_SCALE
+
+    def clip(self, path, box):
+        '''box (x0, y0, x1, y1, 원래 해상도 픽셀) 영역의 BGR 이미지
+        메모리에 있는 페이지는 잘라서 주고, 렌더링하지 않은 PDF 페이지는 그 영역만 원래 해상도로 렌더링한다'''
+        width, height = self.size(path)
+        x0, y0, x1, y1 = [int(round(v)) for v in box]   # PIL crop과 같은 반올림
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+
+        image = self._cached(path)
+        if image is None:
+            with self.lock:
+                page_no = self.pdf_pages.get(path)
+            # 페이지 전체이거나 회전된 페이지(clip 좌표계가 다름)는 전체를 렌더링해서 캐시에 둔다
+            whole = (x0, y0, x1, y1) == (0, 0, width, height)
+            if page_no is not None and not whole and not self._rotated(page_no):
+                scale = self.scale
+                return self.render(page_no, scale, (x0 / scale, y0 / scale, x1 / scale, y1 / scale))
+            image = self.get(path)
+        return image[y0:y1, x0:x1]
+
+    def clip_rgb(self, path, box):
+        return cv2.cvtColor(self.clip(path, box), cv2.COLOR_BGR2RGB)
+
+    def lazy_pages(self):
+        '''등록만 하고 아직 원래 해상도로 렌더링하지 않은 페이지 수'''
+        with self.lock:
+            return sum(1 for path in self.pdf_pages if path not in self.images and path not in self.spilled)
+
+    def size(self, path):
+        '''이미지 (width, height) 픽셀, 렌더링하지 않은 PDF 페이지는 등록할 때 구한 크기'''
+        with self.lock:
+            size = self.sizes.get(path)
+        if size is None:
+            image = self.get(path)
+            size = (image.shape[1], image.shape[0])
+        return size
+
+    def materialize(self, path):
+        '''PNG 파일이 꼭 필요한 곳(시각화 등)을 위해 파일이 없으면 저장하고 경로 반환'''
+        if not os.path.exists(path):
+            cv2.imwrite(path, self.get(path))
+        return path
+
+    def close(self):
+        '''메모리와 내려둔 파일 정리 (작업 종료 시)'''
+        with self.lock:
+            self.images.clear()
+            self.spilled.clear()
+            self.pdf_pages.clear()
+            self.memory = 0
+            if self.spill_dir:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+                self.spill_dir = None
+        if self.pdf is not None:
+            with fitz_lock:
+                self.pdf.close()
+            self.pdf = None
+
+    def _cached(self, path):
+        '''메모리나 내려둔 파일에 있는 이미지 (없으면 None)'''
+        with self.lock:
+            image = self.images.get(path)
+            spill_path = self.spilled.get(path)
+        if image is None and spill_path:
+            image = np.load(spill_path)
+        return image
+
+    def render(self, page_no, scale=None, clip=None):
+        '''렌더링 전용 문서의 페이지를 scale(기본: 원래 해상도)로 렌더링, 캐시에 넣지는 않는다'''
+        scale = scale or self.scale
+        with fitz_lock:
+            page = self.pdf.load_page(page_no)
+        return render_page(page, scale, clip)
+
+    def _rotated(self, page_no):
+        with fitz_lock:
+            return bool(self.pdf.load_page(page_no).rotation)
+
+    def _remove(self, path):
+        image = self.images.pop(path, None)
+        if image is not None:
+            self.memory -= image.nbytes
+        spill_path = self.spilled.pop(path, None)
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def _spill(self):
+        # 마지막에 넣은 페이지는 바로 쓰일 테니 남긴다
+        while self.memory > self.memory_limit and len(self.images) > 1:
+            path, image = self.images.popitem(last=False)
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='page_images_', dir=SPILL_PATH)
+            self.spill_count += 1
+            spill_path = os.path.join(self.spill_dir, f'{self.spill_count}.npy')
+            np.save(spill_path, image)
+            self.spilled[path] = spill_path
+            self.memory -= image.nbytes
@@ -0,0 +1,26 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from configs import worker_config
+
+# 한 문서 안에서 페이지를 동시에 처리할 스레드 수 (1이면 순차 처리)
+PAGE_WORKERS = int(worker_config['PAGE_WORKERS'])
+
+
+def ordered_map(func, items, workers=PAGE_WORKERS):
+    '''items의 각 인자 튜플로 func를 병렬 실행하고 결과는 입력 순서대로 반환
+    items는 필요할 때마다 꺼내므로 (예: 페이지 렌더링) 동시에 메모리에 올라가는 항목은 workers * 2개 이하'''
+    if workers <= 1:
+        for args in items:
+            yield func(*args)
+        return
+
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for args in items:
+            pending.append(executor.submit(func, *args))
+            # 앞 항목이 끝났으면 바로 내보내서 다음 단계가 기다리지 않게 한다
+            while pending and (pending[0].done() or len(pending) >= workers * 2):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,9 +1,18 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 from PIL import Image
 
 from file_manager import source_image
 from common_module import write_log, etc_config
+from configs import skew_config
+
+SKEW_MAX_SIDE = int(skew_config['MAX_SIDE'])
+SKEW_MIN_ANGLE = float(skew_config['MIN_ANGLE'])
+SKEW_INTERPOLATION = cv2.INTER_LINEAR if skew_config['INTERPOLATION'] == 'linear' else cv2.INTER_CUBIC
 
 
 def pix_to_image(pix):
@@ -22,7 +31,7 @@ def dec_to_image(decFile):
     return image
 
 
-def convert_tiff_to_png(tiff_path, time_str, file_name, oid):
+def convert_tiff_to_png(tiff_path, time_str, file_name, oid, page_images):
     tiff_image = Image.open(tiff_path)
 
     paths = []
@@ -32,24 +41,24 @@ def convert_tiff_to_png(tiff_path, time_str, file_name, oid):
         png_path = source_image(time_str, i, 'png', file_name)
         rgb_image = frame.convert('RGB')
         cv_image = cv2.cvtColor(np.array(rgb_image), cv2.COLOR_RGB2BGR)
-        angle = correct_skew(png_path, cv_image)
+        angle, cv_image = deskew(cv_image)
+        page_images.put(png_path, cv_image)
         if angle:
             write_log(f'[TIFF → PNG] {png_path}, {angle}˚ rotated', etc_config['LOG_LEVEL_INFO'], oid)
         else:
-            cv2.imwrite(png_path, cv_image)
             write_log(f'[TIFF → PNG] {png_path}', etc_config['LOG_LEVEL_INFO'], oid)
         paths.append(png_path)
     return paths
 
-def convert_gif_to_png(gif_path, png_path, oid):
+def convert_gif_to_png(gif_path, png_path, oid, page_images):
     image = Image.open(gif_path).convert("RGB")
     np_image = np.array(image)
     cv_image = cv2.cvtColor(np.array(np_image), cv2.COLOR_RGB2BGR)
-    angle = correct_skew(png_path, cv_image)
+    angle, cv_image = deskew(cv_image)
+    page_images.put(png_path, cv_image)
     if angle:
         write_log(f'[GIF → PNG] {png_path}, {angle}˚ rotated', etc_config['LOG_LEVEL_INFO'], oid)
     else:
-        cv2.imwrite(png_path, cv_image)
         write_log(f'[GIF → PNG] {png_path}', etc_config['LOG_LEVEL_INFO'], oid)
 
 
@@ -141,20 +150,24 @@ def find_most_frequent_approx_value(values, bin_width, show_hist=False):
 #     return lines
 
 
-def dynamic_houghlines_binary(edges, low=50, high=2000):
-    mid = 200
+def dynamic_houghlines_binary(edges, low=50, high=2000, scale=1.0):
+    '''직선이 10~500개 나오는 Hough 투표 기준을 이분 탐색
+    투표 수(직선 픽셀 길이)와 직선 개수 기준은 원래 해상도(PDF는 PDF_TO_IMAGE_SCALE 렌더링) 기준이라 scale배로 맞춘다'''
+    low, high = max(1, round(low * scale)), max(1, round(high * scale))
+    mid = max(low, round(200 * scale))
+    min_lines, max_lines = max(1, round(10 * scale)), max(1, round(500 * scale))
     lines = None
 
     while low <= high:
         lines = cv2.HoughLines(edges, 1, np.pi / 180, mid)
         if lines is not None:
-            if 10 <= len(lines) <= 500:
+            if min_lines <= len(lines) <= max_lines:
                 return lines
             
-            if len(lines) > 500:
+            if len(lines) > max_lines:
                 low = mid + 1
             
-            elif len(lines) < 10:
+            elif len(lines) < min_lines:
                 high = mid - 1
 
         else:
@@ -166,15 +179,65 @@ def dynamic_houghlines_binary(edges, low=50, high=2000):
     return lines
 
 
-def correct_skew(image_path, image):
-    # 2. 이미지를 회색조로 변환
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-    # 3. 엣지 검출
+class SkewCache:
+    '''기울기 추정용 이미지 해시 -> 각도 (같은 페이지를 다시 처리할 때 Hough 검색 생략)'''
+    def __init__(self, size):
+        self.size = size
+        self.angles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, gray, scale):
+        return (gray.shape, scale, hashlib.blake2b(gray.tobytes(), digest_size=16).digest())
+
+    def get(self, key):
+        with self.lock:
+            angle = self.angles.get(key)
+            if angle is not None:
+                self.angles.move_to_end(key)
+            return angle
+
+    def put(self, key, angle):
+        if self.size <= 0:
+            return
+        with self.lock:
+            self.angles[key] = angle
+            while len(self.angles) > self.size:
+                self.angles.popitem(last=False)
+
+
+skew_cache = SkewCache(int(skew_config['CACHE_SIZE']))
+
+
+def skew_image(image):
+    '''기울기 추정용 회색조 이미지와 줄인 배율, 긴 변이 SKEW_MAX_SIDE보다 크면 줄인다 (Hough 직선 각도는 해상도와 상관없음)'''
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    h, w = gray.shape
+    ratio = 1.0
+    if SKEW_MAX_SIDE and max(h, w) > SKEW_MAX_SIDE:
+        ratio = SKEW_MAX_SIDE / max(h, w)
+        gray = cv2.resize(gray, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA)
+    return gray, ratio
+
+
+def estimate_skew(image, scale=1.0):
+    '''기울기 각도 추정, SKEW_MIN_ANGLE 미만이면 0
+    scale: image가 원래 해상도(PDF는 PDF_TO_IMAGE_SCALE 렌더링)의 몇 배인지 (PREVIEW_SCALE 렌더링이면 PREVIEW_SCALE / PDF_TO_IMAGE_SCALE)'''
+    gray, ratio = skew_image(image)
+    scale = round(scale * ratio, 4)
+    key = skew_cache.key(gray, scale)
+    angle = skew_cache.get(key)
+    if angle is None:
+        angle = hough_angle(gray, scale)
+        skew_cache.put(key, angle)
+    return angle if abs(angle) >= SKEW_MIN_ANGLE else 0
+
+
+def hough_angle(gray, scale=1.0):
+    # 엣지 검출
     edges = cv2.Canny(gray, 50, 150, apertureSize=3)
 
-    # 4. 선 검출
-    lines = dynamic_houghlines_binary(edges)
+    # 선 검출 (Hough 기준은 원래 해상도 대비 scale배)
+    lines = dynamic_houghlines_binary(edges, scale=scale)
 
     if lines is None:
         # 'no hough lines'
@@ -190,30 +253,40 @@ def correct_skew(image_path, image):
         # if len(angles) > maxCount:
         #     break
 
-    # 5. 평균 각도를 계산하여 이미지 회전
-    average_angle = find_angle(angles)
-
-    if average_angle:
-        # 회전
-        (h, w) = image.shape[:2]
-        center = (w // 2, h // 2)
-        rot_mat = cv2.getRotationMatrix2D(center, average_angle, 1.0)
-
-        # 회전 후 이미지의 크기 계산
-        abs_cos = abs(rot_mat[0, 0])
-        abs_sin = abs(rot_mat[0, 1])
-        w = int(h * abs_sin + w * abs_cos)
-        h = int(h * abs_cos + w * abs_sin)
-        rot_mat[0, 2] += (w / 2) - center[0]
-        rot_mat[1, 2] += (h / 2) - center[1]
-
-        # 회전된 이미지 계산
-        rotated = cv2.warpAffine(image, rot_mat, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-        
-    else:
-        # 'no angles'
-        return 0
+    # 평균 각도
+    return float(find_angle(angles))
+
 
-    # 6. 이미지 저장
-    cv2.imwrite(image_path, rotated)
-    return average_angle
\ No newline at end of file
+def rotate(image, angle):
+    '''angle만큼 회전, 잘리지 않게 이미지 크기를 늘린다'''
+    (h, w) = image.shape[:2]
+    center = (w // 2, h // 2)
+    rot_mat = cv2.getRotationMatrix2D(center, angle, 1.0)
+
+    # 회전 후 이미지의 크기 계산
+    abs_cos = abs(rot_mat[0, 0])
+    abs_sin = abs(rot_mat[0, 1])
+    w = int(h * abs_sin + w * abs_cos)
+    h = int(h * abs_cos + w * abs_sin)
+    rot_mat[0, 2] += (w / 2) - center[0]
+    rot_mat[1, 2] += (h / 2) - center[1]
+
+    # 회전된 이미지 계산
+    return cv2.warpAffine(image, rot_mat, (w, h), flags=SKEW_INTERPOLATION, borderMode=cv2.BORDER_REPLICATE)
+
+
+def deskew(image):
+    '''기울기 보정: (각도, 보정된 이미지) 반환, 보정할 필요 없으면 (0, 원본 이미지)'''
+    angle = estimate_skew(image)
+    if not angle:
+        return 0, image
+    return angle, rotate(image, angle)
+
+
+def correct_skew(image_path, image):
+    '''기울기 보정한 이미지를 저장하고 각도 반환 (보정하지 않았으면 0, 저장 안 함)'''
+    angle, rotated = deskew(image)
+    if angle:
+        # 6. 이미지 저장
+        cv2.imwrite(image_path, rotated)
+    return angle
\ No newline at end of file
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+'''int8 양자화 정확도/속도 리포트
+따로 떼어둔 페이지 이미지(와 표 영역 이미지)로 float 모델과 양자화 모델을 CPU에서 실행해서
+모델별로 결과가 얼마나 같은지와 걸린 시간을 비교한다. 정답 라벨 대신 현재(float) 결과를 기준으로 본다.
+    CRAFT (static, backbone)   : box 일치(F1, IoU 0.5), score map 최대 차이
+    인식기 (dynamic, BiLSTM/decoder): 글자 완전 일치율, 문자 오류율(CER), confidence 차이
+    TATR (dynamic, transformer) : 행/열 수 일치율, 셀 위치 IoU 평균
+
+실행 (uniocr_ai 경로에서):
+    PYTHONPATH=plugins python -m quant_report --pages 페이지이미지경로 --tables 표이미지경로 --json report.json
+CRAFT는 python -m quantization craft로 [OCR] QUANT_CALIBRATION_PATH 이미지(평가 페이지와 겹치지 않게 둔다)를 calibration해서 저장한 DETECT_QUANT_PATH를 평가한다
+'''
+import argparse
+import copy
+import glob
+import json
+import os
+import sys
+
+import cv2
+import editdistance
+import numpy as np
+import torch
+from PIL import Image
+
+import ocr.ocr as ocr_module
+from configs import tatr_config
+from craft.detection import forward, post_process, to_tensor
+from craft.imgproc import resize_aspect_ratio
+from ocr.export_models import LINK_THRESHOLD, crops, load_eager, timed
+from quantization import CRAFT_QUANT_PATH, IMAGE_EXTENSIONS, load_quantized_craft, quantize_recognizer, quantize_tatr
+from recognition.dataset import AlignCollate
+
+OID = 'quant_report'
+MODELS = ('craft', 'recognizer', 'tatr')
+IOU_THRESHOLD = 0.5
+REPEAT = 1
+
+
+def image_files(path):
+    return sorted(f for f in glob.glob(os.path.join(path, '*')) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_rgb(files):
+    images = [cv2.imread(f) for f in files]
+    return [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in images if image is not None]
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_rect(box):
+    box = np.array(box)
+    return [*box.min(axis=0), *box.max(axis=0)]
+
+
+def box_f1(expected, actual):
+    '''IoU가 IOU_THRESHOLD 이상인 box끼리 1:1로 맞춘 F1'''
+    if not expected and not actual:
+        return 1.0
+    expected, actual = [box_rect(b) for b in expected], [box_rect(b) for b in actual]
+    used = set()
+    matched = 0
+    for a in expected:
+        best, best_j = IOU_THRESHOLD, None
+        for j, b in enumerate(actual):
+            if j not in used and iou(a, b) >= best:
+                best, best_j = iou(a, b), j
+        if best_j is not None:
+            used.add(best_j)
+            matched += 1
+    return 2 * matched / (len(expected) + len(actual))
+
+
+def speed(float_time, quant_time):
+    return {'float_sec': round(float_time, 4), 'int8_sec': round(quant_time, 4), 'speedup': round(float_time / max(quant_time, 1e-9), 2)}
+
+
+def report_craft(net, opt, pages):
+    '''(리포트 dict, 페이지별 float box 목록)'''
+    quant = load_quantized_craft(net, oid=OID)
+    if quant is net:
+        raise RuntimeError(f'{CRAFT_QUANT_PATH} 없음, 먼저 PYTHONPATH=plugins python -m quantization craft')
+    f1s, diffs, page_boxes = [], [], []
+    float_time = quant_time = 0.0
+    for page in pages:
+        img_resized, target_ratio = resize_aspect_ratio(page, square_size=opt.canvas_size, interpolation=cv2.INTER_LINEAR, mag_ratio=opt.mag_ratio)
+        x = to_tensor(img_resized).unsqueeze(0)
+        (text_a, link_a), t0 = timed(lambda: forward(net, x, False), REPEAT)
+        (text_b, link_b), t1 = timed(lambda: forward(quant, x, False), REPEAT)
+        float_time, quant_time = float_time + t0, quant_time + t1
+        boxes = post_process(text_a[0], link_a[0], target_ratio, opt.text_threshold, LINK_THRESHOLD, opt.low_text)
+        quant_boxes = post_process(text_b[0], link_b[0], target_ratio, opt.text_threshold, LINK_THRESHOLD, opt.low_text)
+        f1s.append(box_f1(boxes, quant_boxes))
+        diffs.append(float(max(np.abs(text_a - text_b).max(), np.abs(link_a - link_b).max())))
+        page_boxes.append(boxes)
+    result = {'pages': len(pages), 'box_f1': round(float(np.mean(f1s)), 4), 'box_f1_min': round(float(np.min(f1s)), 4),
+              'score_max_diff': round(max(diffs), 4), **speed(float_time, quant_time)}
+    return result, page_boxes
+
+
+def report_recognizer(model, converter, opt, images):
+    quant = quantize_recognizer(copy.deepcopy(model), oid=OID)
+    collate = AlignCollate(imgH=opt.imgH, imgW=opt.imgW, keep_ratio_with_pad=opt.PAD)
+    same = chars = errors = 0
+    conf_diffs = []
+    float_time = quant_time = 0.0
+    with torch.no_grad():
+        for start in range(0, len(images), opt.batch_size):
+            x, _ = collate([(image, i) for i, image in enumerate(images[start:start + opt.batch_size])])
+            expected, t0 = timed(lambda: model.predict(x), REPEAT)
+            actual, t1 = timed(lambda: quant.predict(x), REPEAT)
+            float_time, quant_time = float_time + t0, quant_time + t1
+            for (tokens_a, conf_a), (tokens_b, conf_b) in zip(expected, actual):
+                text_a = ''.join(converter.character[t] for t in tokens_a)
+                text_b = ''.join(converter.character[t] for t in tokens_b)
+                same += text_a == text_b
+                chars += max(len(text_a), 1)
+                errors += editdistance.eval(text_a, text_b)
+                conf_diffs.append(abs(conf_a - conf_b))
+    count = max(len(images), 1)
+    return {'crops': len(images), 'exact_match': round(same / count, 4), 'cer': round(errors / max(chars, 1), 4),
+            'confidence_mean_diff': round(float(np.mean(conf_diffs)) if conf_diffs else 0.0, 4), **speed(float_time, quant_time)}
+
+
+def grid(cells):
+    rows = {r for cell in cells for r in cell['row_nums']}
+    columns = {c for cell in cells for c in cell['column_nums']}
+    return len(rows), len(columns)
+
+
+def cell_iou(expected, actual):
+    '''같은 (행, 열) 위치 셀의 bbox IoU 평균 (다른 쪽에 없는 셀은 0)'''
+    def positions(cells):
+        return {(tuple(cell['row_nums']), tuple(cell['column_nums'])): cell['bbox'] for cell in cells}
+    a, b = positions(expected), positions(actual)
+    keys = set(a) | set(b)
+    if not keys:
+        return 1.0
+    return float(np.mean([iou(a[k], b[k]) if k in a and k in b else 0.0 for k in keys]))
+
+
+def report_tatr(tables):
+    from tatr.inference import TableExtractionPipeline
+    pipeline = TableExtractionPipeline(str_config_path=tatr_config['config_path'], str_model_path=tatr_config['model_path'], quantize=False)
+    quant = copy.deepcopy(pipeline)
+    quant.str_model = quantize_tatr(quant.str_model, oid=OID)
+    same_grid, ious = 0, []
+    float_time = quant_time = 0.0
+    with torch.no_grad():
+        for table in tables:
+            image = Image.fromarray(table)
+            expected, t0 = timed(lambda: pipeline.recognize(image), REPEAT)
+            actual, t1 = timed(lambda: quant.recognize(image), REPEAT)
+            float_time, quant_time = float_time + t0, quant_time + t1
+            same_grid += grid(expected) == grid(actual)
+            ious.append(cell_iou(expected, actual))
+    count = max(len(tables), 1)
+    return {'tables': len(tables), 'grid_match': round(same_grid / count, 4),
+            'cell_iou': round(float(np.mean(ious)) if ious else 0.0, 4), **speed(float_time, quant_time)}
+
+
+def main(args):
+    torch.set_grad_enabled(False)
+    models = [name.strip() for name in args.models.split(',') if name.strip()]
+    report = dict()
+
+    if 'craft' in models or 'recognizer' in models:
+        error_code = ocr_module.init_opt(OID)
+        if error_code:
+            print(f'OCR 설정 실패 ({error_code})')
+            return None
+        opt = ocr_module.opt
+        pages = read_rgb(image_files(args.pages)) if args.pages else []
+        if not pages:
+            print('--pages에 평가할 페이지 이미지 없음')
+            return None
+        net, model, converter = load_eager(opt)
+        report['craft'], page_boxes = report_craft(net, opt, pages)
+        if 'recognizer' in models:
+            report['recognizer'] = report_recognizer(model, converter, opt, crops(pages, page_boxes))
+        if 'craft' not in models:
+            del report['craft']
+
+    if 'tatr' in models:
+        tables = read_rgb(image_files(args.tables)) if args.tables else []
+        if tables:
+            report['tatr'] = report_tatr(tables)
+        else:
+            print('--tables에 표 이미지가 없어서 TATR 생략')
+
+    for name, result in report.items():
+        print(f'[{name}] ' + ', '.join(f'{k}={v}' for k, v in result.items()))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='int8 양자화 정확도/속도 리포트')
+    parser.add_argument('--pages', help='평가용 페이지 이미지 경로 (CRAFT, 인식기)')
+    parser.add_argument('--tables', help='평가용 표 영역 이미지 경로 (TATR)')
+    parser.add_argument('--models', default=','.join(MODELS), help='craft, recognizer, tatr')
+    parser.add_argument('--json', help='리포트 JSON 저장 경로')
+    sys.exit(0 if main(parser.parse_args()) is not None else 1)
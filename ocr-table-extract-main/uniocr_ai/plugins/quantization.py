@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import copy
+import glob
+import os
+import sys
+import warnings
+
+import cv2
+import torch
+import torch.nn as nn
+from torch.ao.quantization import QuantWrapper, convert, fuse_modules, get_default_qconfig, prepare, quantize_dynamic
+
+from common_module import write_log
+from configs import etc_config, ocr_config, tatr_config
+
+# CPU 추론에서만 사용 (quantized kernel은 CPU 전용), 설정이 바뀌면 결과 캐시 버전도 바뀐다
+RECOG_QUANTIZE = ocr_config['RECOG_QUANTIZE'] == 'True'
+DETECT_QUANTIZE = ocr_config['DETECT_QUANTIZE'] == 'True'
+TATR_QUANTIZE = tatr_config['QUANTIZE'] == 'True'
+CALIBRATION_PATH = ocr_config['QUANT_CALIBRATION_PATH']
+CALIBRATION_PAGES = 8
+# 오프라인에서 calibration한 CRAFT int8 state_dict (서버는 불러오기만 하고 calibration 추론은 하지 않는다)
+CRAFT_QUANT_PATH = ocr_config['DETECT_QUANT_PATH']
+CRAFT_SLICES = ('slice1', 'slice2', 'slice3', 'slice4', 'slice5')
+QUANT_OID = 'quantization'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+
+def quant_engine():
+    '''x86은 fbgemm, ARM은 qnnpack'''
+    engines = torch.backends.quantized.supported_engines
+    engine = 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
+    torch.backends.quantized.engine = engine
+    return engine
+
+
+def on_cpu(model, name, device, oid=''):
+    if str(device).startswith('cuda'):
+        write_log(f'[양자화] {name}: GPU에서는 양자화하지 않음', etc_config['LOG_LEVEL_WARNING'], oid)
+        return False
+    return True
+
+
+def quantize_recognizer(model, device='cpu', oid=''):
+    '''인식기의 BiLSTM과 attention decoder(LSTMCell, Linear)를 int8 dynamic 양자화 (DataParallel이면 벗겨서 반환)
+    TPS localization의 Linear는 fiducial 좌표를 직접 내므로 양자화하지 않는다'''
+    model = model.module if isinstance(model, nn.DataParallel) else model
+    if not on_cpu(model, '인식기', device, oid):
+        return model
+    quant_engine()
+    model.eval()
+    model.SequenceModeling = quantize_dynamic(model.SequenceModeling, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+    model.Prediction = quantize_dynamic(model.Prediction, {nn.LSTMCell, nn.Linear}, dtype=torch.qint8)
+    write_log('[양자화] 인식기 BiLSTM/decoder int8 dynamic', etc_config['LOG_LEVEL_INFO'], oid)
+    return model
+
+
+def quantize_tatr(model, device='cpu', oid=''):
+    '''TATR transformer의 Linear(FFN)를 int8 dynamic 양자화, backbone과 box/class head는 그대로'''
+    if not on_cpu(model, 'TATR', device, oid):
+        return model
+    quant_engine()
+    model.eval()
+    model.transformer = quantize_dynamic(model.transformer, {nn.Linear}, dtype=torch.qint8)
+    write_log('[양자화] TATR transformer int8 dynamic', etc_config['LOG_LEVEL_INFO'], oid)
+    return model
+
+
+def fuse_sequential(sequential):
+    '''Sequential 안의 Conv-BN(-ReLU)를 하나로 합친다 (eval 모드)'''
+    modules = list(sequential.named_children())
+    groups = []
+    i = 0
+    while i < len(modules):
+        if isinstance(modules[i][1], nn.Conv2d) and i + 1 < len(modules) and isinstance(modules[i + 1][1], nn.BatchNorm2d):
+            size = 3 if i + 2 < len(modules) and isinstance(modules[i + 2][1], nn.ReLU) else 2
+            groups.append([name for name, _ in modules[i:i + size]])
+            i += size
+        else:
+            i += 1
+    if groups:
+        fuse_modules(sequential, groups, inplace=True)
+
+
+def calibration_pages(path=CALIBRATION_PATH, count=CALIBRATION_PAGES):
+    '''CRAFT static 양자화 calibration용 RGB 페이지 (평가 페이지와 겹치지 않는 실제 문서 이미지)'''
+    files = sorted(f for f in glob.glob(os.path.join(path, '*')) if f.lower().endswith(IMAGE_EXTENSIONS))[:count]
+    pages = [cv2.imread(f) for f in files]
+    return [cv2.cvtColor(page, cv2.COLOR_BGR2RGB) for page in pages if page is not None]
+
+
+def prepare_craft(net, engine):
+    '''CRAFT VGG16-BN backbone slice마다 Conv-BN(-ReLU) fuse 후 quant/dequant로 감싸서 observer 삽입 (net을 바로 바꾼다)'''
+    basenet = net.basenet
+    for name in CRAFT_SLICES:
+        sequential = getattr(basenet, name)
+        fuse_sequential(sequential)
+        wrapped = QuantWrapper(sequential)
+        wrapped.qconfig = get_default_qconfig(engine)
+        setattr(basenet, name, prepare(wrapped))
+
+
+def convert_craft(net):
+    for name in CRAFT_SLICES:
+        setattr(net.basenet, name, convert(getattr(net.basenet, name)))
+
+
+def quantize_craft(net, pages, canvas_size=1280, mag_ratio=1.0, device='cpu', oid=''):
+    '''CRAFT VGG16-BN backbone을 int8 static 양자화 (slice마다 quant/dequant, U network와 head는 float)
+    pages(RGB)로 activation 범위를 calibration한다 (추론을 실행하므로 오프라인에서만: python -m quantization craft)
+    net은 바꾸지 않고 양자화한 복사본 반환'''
+    from craft.detection import forward, to_tensor
+    from craft.imgproc import resize_aspect_ratio
+
+    if not on_cpu(net, 'CRAFT', device, oid):
+        return net
+    engine = quant_engine()
+    net = copy.deepcopy(net.module if isinstance(net, nn.DataParallel) else net).eval()
+    prepare_craft(net, engine)
+
+    for page in pages:
+        img_resized, _ = resize_aspect_ratio(page, square_size=canvas_size, interpolation=cv2.INTER_LINEAR, mag_ratio=mag_ratio)
+        forward(net, to_tensor(img_resized).unsqueeze(0), False)
+
+    convert_craft(net)
+    write_log(f'[양자화] CRAFT backbone int8 static (calibration {len(pages)}페이지)', etc_config['LOG_LEVEL_INFO'], oid)
+    return net
+
+
+def load_quantized_craft(net, path=CRAFT_QUANT_PATH, device='cpu', oid=''):
+    '''오프라인에서 calibration해서 저장한 CRAFT int8 state_dict를 불러온다 (추론하지 않으므로 prefork 부모에서 불러도 된다)
+    파일이 없으면 경고 후 float 모델을 그대로 반환'''
+    if not on_cpu(net, 'CRAFT', device, oid):
+        return net
+    if not os.path.isfile(path):
+        write_log(f'[양자화] {path} 없음, CRAFT는 float로 추론 (python -m quantization craft로 만든다)', etc_config['LOG_LEVEL_WARNING'], oid)
+        return net
+    engine = quant_engine()
+    net = copy.deepcopy(net.module if isinstance(net, nn.DataParallel) else net).eval()
+    prepare_craft(net, engine)
+    with warnings.catch_warnings():     # observer를 실행하지 않아서 나는 경고, qparams는 저장된 값으로 덮어쓴다
+        warnings.simplefilter('ignore')
+        convert_craft(net)
+    net.load_state_dict(torch.load(path, map_location='cpu'))
+    write_log(f'[양자화] CRAFT backbone int8 static ({path})', etc_config['LOG_LEVEL_INFO'], oid)
+    return net
+
+
+def save_quantized_craft(path=CRAFT_QUANT_PATH):
+    '''QUANT_CALIBRATION_PATH 페이지로 CRAFT를 calibration해서 int8 state_dict 저장'''
+    import ocr.ocr as ocr_module
+    from craft.detection import get_detector
+
+    pages = calibration_pages()
+    if not pages:
+        print(f'{CALIBRATION_PATH}에 calibration 페이지 이미지가 없습니다.')
+        return False
+    error_code = ocr_module.init_opt(QUANT_OID)
+    if error_code:
+        print(f'OCR 설정 실패 ({error_code})')
+        return False
+    opt = ocr_module.opt
+    net, _ = get_detector(opt.detector, False, False, opt.refiner)
+    net = quantize_craft(net.eval(), pages, opt.canvas_size, opt.mag_ratio, oid=QUANT_OID)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    torch.save(net.state_dict(), path)
+    print(f'CRAFT int8 저장: {path} (calibration {len(pages)}페이지)')
+    return True
+
+
+if __name__ == '__main__':
+    # 실행 (uniocr_ai 경로에서): PYTHONPATH=plugins python -m quantization craft
+    if sys.argv[1:] == ['craft']:
+        sys.exit(0 if save_quantized_craft() else 1)
+    print('사용법: PYTHONPATH=plugins python -m quantization craft')
+    sys.exit(1)
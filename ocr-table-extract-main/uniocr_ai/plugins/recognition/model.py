@@ -67,7 +67,7 @@ class Model(nn.Module):
         else:
             raise Exception('Prediction is neither CTC or Attn')
 
-    def forward(self, input, text, is_train=True):
+    def encode(self, input):
         """ Transformation stage """
         if not self.stages['Trans'] == "None":
             input = self.Transformation(input)
@@ -83,10 +83,19 @@ class Model(nn.Module):
         else:
             contextual_feature = visual_feature  # for convenience. this is NOT contextually modeled by BiLSTM
 
+        return contextual_feature.contiguous()
+
+    def forward(self, input, text, is_train=True):
+        contextual_feature = self.encode(input)
+
         """ Prediction stage """
         if self.stages['Pred'] == 'CTC':
-            prediction = self.Prediction(contextual_feature.contiguous())
+            prediction = self.Prediction(contextual_feature)
         else:
-            prediction = self.Prediction(contextual_feature.contiguous(), text, is_train, batch_max_length=self.opt.batch_max_length)
+            prediction = self.Prediction(contextual_feature, text, is_train, batch_max_length=self.opt.batch_max_length)
 
         return prediction
+
+    def predict(self, input):
+        """ inference only (Attn): [(token index list, confidence), ...] with early exit at [s] """
+        return self.Prediction.greedy_decode(self.encode(input), batch_max_length=self.opt.batch_max_length)
@@ -47,6 +47,7 @@ class Attention(nn.Module):
             targets = torch.LongTensor(batch_size).fill_(0).to(device)  # [GO] token
             probs = torch.FloatTensor(batch_size, num_steps, self.num_classes).fill_(0).to(device)
 
+            finished = torch.zeros(batch_size, dtype=torch.bool, device=probs.device)
             for i in range(num_steps):
                 char_onehots = self._char_to_onehot(targets, onehot_dim=self.num_classes)
                 hidden, alpha = self.attention_cell(hidden, batch_H, char_onehots)
@@ -55,8 +56,75 @@ class Attention(nn.Module):
                 _, next_input = probs_step.max(1)
                 targets = next_input
 
+                # 배치의 모든 문장이 [s] (index 1)를 냈으면 남은 step은 버려지므로 중단
+                finished |= targets == 1
+                if finished.all():
+                    probs = probs[:, :i + 1, :]
+                    break
+
         return probs  # batch_size x num_steps x num_classes
 
+    def _onehot_table(self, device):
+        # 매 step마다 one-hot을 새로 만들지 않도록 단위행렬을 한 번만 만들어 두고 행을 골라 쓴다
+        eye = getattr(self, '_eye', None)
+        if eye is None or eye.device != device:
+            eye = torch.eye(self.num_classes, device=device)
+            self._eye = eye
+        return eye
+
+    def greedy_decode(self, batch_H, batch_max_length=25):
+        """
+        inference only greedy decoding
+        input:
+            batch_H : contextual_feature H = hidden state of encoder. [batch_size x num_steps x contextual_feature_channels]
+        output: [(token index list without [s], confidence), ...] for each sequence
+            sequences that emitted [s] (index 1) are removed from the active batch.
+            confidence is the product of max probabilities of the tokens before [s].
+        """
+        batch_size = batch_H.size(0)
+        num_steps = batch_max_length + 1  # +1 for [s] at end of sentence.
+        eye = self._onehot_table(batch_H.device)
+
+        hidden = (batch_H.new_zeros(batch_size, self.hidden_size), batch_H.new_zeros(batch_size, self.hidden_size))
+        batch_H_proj = self.attention_cell.i2h(batch_H)
+        targets = torch.zeros(batch_size, dtype=torch.long, device=batch_H.device)  # [GO] token
+        active = torch.arange(batch_size, device=batch_H.device)
+
+        steps = []
+        for i in range(num_steps):
+            hidden, alpha = self.attention_cell(hidden, batch_H, eye[targets], batch_H_proj)
+            probs_step = F.softmax(self.generator(hidden[0]), dim=1)
+            max_prob, targets = probs_step.max(1)
+            steps.append((active, targets, max_prob))
+
+            running = targets != 1
+            if not running.all():
+                if not running.any():
+                    break
+                active, targets = active[running], targets[running]
+                hidden = (hidden[0][running], hidden[1][running])
+                batch_H, batch_H_proj = batch_H[running], batch_H_proj[running]
+
+        tokens = [[] for _ in range(batch_size)]
+        token_probs = [[] for _ in range(batch_size)]
+        finished = [False] * batch_size
+        for active, targets, max_prob in steps:
+            for b, token, prob in zip(active.tolist(), targets.tolist(), max_prob.tolist()):
+                if token == 1:
+                    finished[b] = True
+                else:
+                    tokens[b].append(token)
+                    token_probs[b].append(prob)
+
+        results = []
+        for b in range(batch_size):
+            if not finished[b]:
+                # 기존 후처리와 같게 [s]가 없으면 (find == -1) 마지막 글자를 버린다
+                tokens[b], token_probs[b] = tokens[b][:-1], token_probs[b][:-1]
+            confidence = float(torch.tensor(token_probs[b]).prod()) if token_probs[b] else 0
+            results.append((tokens[b], confidence))
+        return results
+
 
 class AttentionCell(nn.Module):
 
@@ -68,9 +136,10 @@ class AttentionCell(nn.Module):
         self.rnn = nn.LSTMCell(input_size + num_embeddings, hidden_size)
         self.hidden_size = hidden_size
 
-    def forward(self, prev_hidden, batch_H, char_onehots):
+    def forward(self, prev_hidden, batch_H, char_onehots, batch_H_proj=None):
         # [batch_size x num_encoder_step x num_channel] -> [batch_size x num_encoder_step x hidden_size]
-        batch_H_proj = self.i2h(batch_H)
+        if batch_H_proj is None:
+            batch_H_proj = self.i2h(batch_H)
         prev_hidden_proj = self.h2h(prev_hidden[0]).unsqueeze(1)
         e = self.score(torch.tanh(batch_H_proj + prev_hidden_proj))  # batch_size x num_encoder_step * 1
 
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from configs import cache_config, path_config, properties
+
+CACHE_ENABLED = cache_config['ENABLED'] == 'True'
+CACHE_PATH = path_config['RESULT_CACHE_PATH']
+CACHE_MAX_BYTES = int(cache_config['MAX_MB']) * 1024 * 1024
+# 값이 바뀌면 결과가 달라질 수 있는 설정 section (모델 경로, 임계값, 렌더링 배율 등)
+VERSION_SECTIONS = ('PDF', 'OCR', 'TATR', 'Detectron', 'SKEW', 'TRIAGE')
+# section 전체가 아니라 값 하나만 결과에 영향을 주는 설정 (LLAMA_POSTPRO: 최종 JSON 후처리)
+VERSION_KEYS = (('ETC', 'LLAMA_POSTPRO'),)
+# 설정에 경로가 없는 OCR 모델 (ocr.init_opt)
+OCR_MODEL_FILES = ('./plugins/ocr/craft_mlt_25k.pth', './plugins/ocr/craft_refiner_CTW1500.pth', './plugins/ocr/best_accuracy.pth')
+ENTRY_FILE = 'entry.json'
+
+
+def config_version(sections=VERSION_SECTIONS, files=OCR_MODEL_FILES, keys=()):
+    '''모델/설정 버전: VERSION, 결과에 영향을 주는 설정 값, 모델 파일의 크기와 수정 시각'''
+    h = hashlib.sha256(cache_config['VERSION'].encode())
+    for section in sections:
+        for key, value in sorted(properties[section].items()):
+            h.update(f'{section}.{key}={value}\n'.encode())
+            if os.path.isfile(value):   # 같은 경로에 모델을 덮어쓴 경우
+                h.update(file_version(value))
+    for section, key in keys:
+        h.update(f'{section}.{key}={properties[section].get(key, "")}\n'.encode())
+    for path in files:
+        h.update(file_version(path))
+    return h.hexdigest()
+
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return b'-\n'
+    return f'{path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode()
+
+
+class ResultCache:
+    '''파일 내용 해시 + propertyType + 모델/설정 버전을 키로 작업 결과 파일을 저장해두는 캐시
+    항목마다 CACHE_PATH/<key>/ 폴더에 파일과 entry.json(부가 정보)을 두고,
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 지운다 (여러 프로세스가 같이 써도 된다)'''
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = None
+        self.lock = threading.Lock()
+
+    def key(self, file_bytes, property_type):
+        if self.version is None:
+            self.version = config_version(keys=VERSION_KEYS)
+        h = hashlib.sha256(file_bytes)
+        h.update(f'\n{property_type}\n{self.version}'.encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        '''(항목 폴더, entry) 반환, 없으면 (None, None)'''
+        entry_dir = os.path.join(self.path, key)
+        entry_path = os.path.join(entry_dir, ENTRY_FILE)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(entry_path)    # 최근 사용 시각 (LRU)
+        except (OSError, ValueError):
+            return None, None
+        return entry_dir, entry
+
+    def put(self, key, files, entry):
+        '''files: {캐시 안 파일 이름: 원본 경로}를 복사하고 entry(dict)를 저장
+        다 쓴 뒤 폴더 이름을 바꿔서 읽는 쪽이 중간 상태를 보지 않게 한다'''
+        os.makedirs(self.path, exist_ok=True)
+        tmp_dir = os.path.join(self.path, f'.tmp_{uuid.uuid4().hex}')
+        try:
+            os.makedirs(tmp_dir)
+            for name, src in files.items():
+                shutil.copyfile(src, os.path.join(tmp_dir, name))
+            with open(os.path.join(tmp_dir, ENTRY_FILE), 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2)
+            os.rename(tmp_dir, os.path.join(self.path, key))
+        except OSError:
+            # 다른 프로세스가 먼저 같은 키를 저장한 경우 포함
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        '''전체 크기가 max_bytes 이하가 될 때까지 오래 사용하지 않은 항목 삭제'''
+        with self.lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.path):
+                entry_dir = os.path.join(self.path, name)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+                    used = os.path.getmtime(os.path.join(entry_dir, ENTRY_FILE))
+                except OSError:
+                    continue
+                entries.append((used, size, entry_dir))
+                total += size
+
+            for used, size, entry_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+
+
+result_cache = ResultCache()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+'''TATR 후처리용 box 연산 (NumPy)
+box는 [x0, y0, x1, y1] 배열. fitz.Rect의 intersect/include_rect/get_area와 같은 값을 내도록 맞췄다
+    - x0 >= x1 또는 y0 >= y1이면 빈 box (넓이 0)
+    - intersect: 상대가 비었으면 상대, 자신이 비었으면 자신, 아니면 교집합 (MuPDF가 float32로 계산)
+    - include_rect: 상대가 비었으면 그대로, 자신이 비었으면 상대, 아니면 합집합 (float32)
+그래서 기존 Rect 반복문과 같은 구조(셀 좌표, 번호)가 나온다. 비교: python -m tatr.check_postprocess'''
+import numpy as np
+
+EMPTY = (0.0, 0.0, 0.0, 0.0)    # fitz.Rect()
+
+
+def boxes(bboxes):
+    '''bbox 목록 -> (n, 4) float64 배열'''
+    return np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+
+
+def object_boxes(objects, key='bbox'):
+    return boxes([obj[key] for obj in objects])
+
+
+def f32(values):
+    '''MuPDF fz_rect(float) 좌표로 반올림'''
+    return np.asarray(values, dtype=np.float64).astype(np.float32).astype(np.float64)
+
+
+def is_empty(b):
+    return (b[..., 0] >= b[..., 2]) | (b[..., 1] >= b[..., 3])
+
+
+def width(b):
+    return np.where(b[..., 2] > b[..., 0], b[..., 2] - b[..., 0], 0.0)
+
+
+def height(b):
+    return np.where(b[..., 3] > b[..., 1], b[..., 3] - b[..., 1], 0.0)
+
+
+def area(b):
+    return width(b) * height(b)
+
+
+def intersect(a, b):
+    '''Rect(a).intersect(b) (broadcast)'''
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    common = f32(np.concatenate([np.maximum(a[..., :2], b[..., :2]), np.minimum(a[..., 2:], b[..., 2:])], axis=-1))
+    out = np.where(is_empty(a)[..., None], a, common)
+    return np.where(is_empty(b)[..., None], b, out)
+
+
+def intersection_area(a, b):
+    '''(n, m) 교집합 넓이, a[i]와 b[j]'''
+    a, b = boxes(a), boxes(b)
+    return area(intersect(a[:, None, :], b[None, :, :]))
+
+
+def iob(a, b):
+    '''(n, m) a[i] 넓이 중 b[j]와 겹치는 비율 (a[i] 넓이가 0이면 0)'''
+    a = boxes(a)
+    inter = intersection_area(a, b)
+    a_area = area(a)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(a_area > 0, inter / a_area, 0.0)
+
+
+def include_all(bboxes, start=EMPTY):
+    '''Rect(start)에 bboxes를 순서대로 include_rect 한 결과 [x0, y0, x1, y1]'''
+    x0, y0, x1, y1 = (float(v) for v in start)
+    for bbox in bboxes:
+        r0, s0, r1, s1 = (float(v) for v in bbox)
+        if r0 >= r1 or s0 >= s1:
+            continue
+        if x0 >= x1 or y0 >= y1:
+            x0, y0, x1, y1 = r0, s0, r1, s1
+        else:
+            x0, y0, x1, y1 = f32([min(x0, r0), min(y0, s0), max(x1, r1), max(y1, s1)]).tolist()
+    return [x0, y0, x1, y1]
+
+
+def intersect_one(a, b):
+    '''Rect(a).intersect(b) -> [x0, y0, x1, y1]'''
+    return intersect(boxes(a)[0], boxes(b)[0]).tolist()
+
+
+def nms_suppression(bboxes, match_criteria='object2_overlap', match_threshold=0.05):
+    '''점수 순으로 정렬된 box에서 앞의 (남은) box와 match_threshold 이상 겹쳐서 지울 box (bool 배열)
+    넓이가 0이라 비율을 구할 수 없는 쌍은 겹치지 않는 것으로 본다'''
+    b = boxes(bboxes)
+    n = len(b)
+    suppression = np.zeros(n, dtype=bool)
+    if n < 2 or match_criteria not in ('object1_overlap', 'object2_overlap', 'iou'):
+        return suppression
+
+    inter = intersection_area(b, b)     # [object1, object2]
+    areas = area(b)
+    if match_criteria == 'object1_overlap':
+        denominator = np.broadcast_to(areas[:, None], inter.shape)
+    elif match_criteria == 'object2_overlap':
+        denominator = np.broadcast_to(areas[None, :], inter.shape)
+    else:
+        denominator = areas[:, None] + areas[None, :] - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        match = (denominator != 0) & (inter / denominator >= match_threshold)
+
+    for object2_num in range(1, n):
+        suppression[object2_num] = np.any(match[:object2_num, object2_num] & ~suppression[:object2_num])
+    return suppression
+
+
+def overlap_fraction(lo, hi, span_lo, span_hi, size):
+    '''1차원 구간 [lo, hi] 여러 개와 [span_lo, span_hi]가 겹치는 길이 / size (size가 0이면 ZeroDivisionError)'''
+    if len(lo) and np.any(size == 0):
+        raise ZeroDivisionError('float division by zero')
+    return (np.minimum(hi, span_hi) - np.maximum(lo, span_lo)) / size
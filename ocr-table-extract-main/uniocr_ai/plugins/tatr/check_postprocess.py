@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+'''TATR 후처리(objects_to_structures, structure_to_cells) 회귀 확인과 속도 측정
+저장해둔 TATR 검출 결과(행/열/header/spanning cell)로 후처리를 다시 실행해서 저장된 셀 구조와 완전히 같은지 비교한다.
+
+실행 (uniocr_ai 경로에서):
+    # 표 영역 이미지로 TATR을 실행해서 검출 결과와 현재 셀 구조를 저장
+    PYTHONPATH=plugins python -m tatr.check_postprocess record 저장경로 표이미지...
+    # 저장된 검출 결과로 후처리를 다시 실행해서 셀 구조 비교 (다르면 종료 코드 1)
+    # 저장경로를 주지 않으면 postprocess_fixtures (box_algebra 이전 fitz.Rect 후처리로 저장한 합성 표 60개)
+    PYTHONPATH=plugins python -m tatr.check_postprocess check [저장경로]
+    # 표 한 개 후처리 시간 (저장경로를 주지 않으면 행 60 x 열 10 합성 표)
+    PYTHONPATH=plugins python -m tatr.check_postprocess bench [저장경로]
+'''
+import copy
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+from PIL import Image
+
+from tatr.inference import objects_to_structures, pipe, structure_class_thresholds, structure_to_cells
+
+BENCH_REPEAT = 20
+# fitz.Rect로 후처리하던 코드로 셀 구조를 저장한 합성 검출 결과 (행/열 경계 어긋남, 중복 검출, 크기 0인 box 포함)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'postprocess_fixtures')
+
+
+def postprocess(objects):
+    '''TableExtractionPipeline.recognize_batch와 같은 후처리 (objects는 바꾸지 않는다)'''
+    structures = objects_to_structures(copy.deepcopy(objects), structure_class_thresholds)
+    return [structure_to_cells(structure) for structure in structures][0]
+
+
+def saved_files(path):
+    return sorted(glob.glob(os.path.join(path, '*.json')))
+
+
+def record(path, image_paths):
+    os.makedirs(path, exist_ok=True)
+    images = [Image.open(image_path).convert('RGB') for image_path in image_paths]
+    for image_path, image, objects in zip(image_paths, images, pipe.get().detect_objects(images)):
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        with open(os.path.join(path, name + '.json'), 'w') as f:
+            json.dump({'image': image_path, 'objects': objects, 'cells': postprocess(objects)}, f)
+        print(f'{name}: 검출 {len(objects)}개 저장')
+    return True
+
+
+def check(path):
+    files = saved_files(path)
+    different = 0
+    for file in files:
+        with open(file) as f:
+            saved = json.load(f)
+        # JSON으로 저장/읽은 값과 비교하기 위해 한 번 변환
+        cells = json.loads(json.dumps(postprocess(saved['objects'])))
+        if cells != saved['cells']:
+            different += 1
+            print(f'{os.path.basename(file)}: 다름 (셀 {len(saved["cells"])}개 -> {len(cells)}개)')
+    print(f'표 {len(files)}개 중 {different}개 다름')
+    return len(files) > 0 and different == 0
+
+
+def synthetic_objects(rows=60, columns=10, spanning=8, seed=0):
+    '''행/열 경계가 조금씩 어긋나고 겹치는 검출이 섞인 표'''
+    rng = random.Random(seed)
+    width, height = 1000.0, rows * 20.0
+    jitter = lambda v: v + rng.gauss(0, 1.5)
+    objects = [{'label': 'table', 'score': 0.99, 'bbox': [0.0, 0.0, width, height]}]
+    for i in range(rows):
+        objects.append({'label': 'row', 'score': rng.uniform(0.5, 1), 'bbox': [jitter(0), jitter(i * 20), jitter(width), jitter(i * 20 + 20)]})
+    for j in range(columns):
+        x0, x1 = j * width / columns, (j + 1) * width / columns
+        objects.append({'label': 'column', 'score': rng.uniform(0.5, 1), 'bbox': [jitter(x0), jitter(0), jitter(x1), jitter(height)]})
+    objects.append({'label': 'column header', 'score': 0.9, 'bbox': [0.0, 0.0, width, 40.0]})
+    for _ in range(spanning):
+        i, j = rng.randrange(rows - 3), rng.randrange(columns - 1)
+        objects.append({'label': 'spanning cell', 'score': rng.uniform(0.5, 1),
+                        'bbox': [jitter(j * width / columns), jitter(i * 20), jitter((j + 2) * width / columns), jitter(i * 20 + 60)]})
+    return objects
+
+
+def bench(path=None):
+    if path:
+        tables = []
+        for file in saved_files(path):
+            with open(file) as f:
+                tables.append(json.load(f)['objects'])
+    else:
+        tables = [synthetic_objects(seed=seed) for seed in range(5)]
+    if not tables:
+        return False
+    start = time.time()
+    for _ in range(BENCH_REPEAT):
+        for objects in tables:
+            postprocess(objects)
+    elapsed = (time.time() - start) / (BENCH_REPEAT * len(tables))
+    print(f'표 {len(tables)}개, 후처리 {elapsed * 1000:.2f}ms/표')
+    return True
+
+
+if __name__ == '__main__':
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('', [])
+    if command == 'record' and len(args) >= 2:
+        ok = record(args[0], args[1:])
+    elif command == 'check' and len(args) <= 1:
+        ok = check(args[0] if args else BASELINE_PATH)
+    elif command == 'bench':
+        ok = bench(args[0] if args else None)
+    else:
+        print(__doc__)
+        ok = False
+    sys.exit(0 if ok else 1)
@@ -1,17 +1,18 @@
 import json
+import numpy as np
 import torch
 from torchvision import transforms
 from PIL import Image
-from fitz import Rect
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 
+from artifact_cache import artifact_cache, image_key
+from artifact_writer import artifact_writer
 from configs import tatr_config
+from model_registry import LazyModel
+from quantization import TATR_QUANTIZE, quantize_tatr
 from file_manager import page_table_structure_path as structure_path, table_vis_path as vis_path
 from tatr.detr.models.detr import build
 from tatr.detr.util.box_ops import box_cxcywh_to_xyxy
+import tatr.box_algebra as box_algebra
 import tatr.postprocess as postprocess
 
 class MaxResize(object):
@@ -63,13 +64,7 @@ def iob(bbox1, bbox2):
     """
     Compute the intersection area over box area, for bbox1.
     """
-    intersection = Rect(bbox1).intersect(bbox2)
-    
-    bbox1_area = Rect(bbox1).get_area()
-    if bbox1_area > 0:
-        return intersection.get_area() / bbox1_area
-    
-    return 0
+    return float(box_algebra.iob([bbox1], [bbox2])[0, 0])
 
 
 def align_headers(headers, rows):
@@ -87,28 +82,24 @@ def align_headers(headers, rows):
         row['column header'] = False
 
     header_row_nums = []
+    row_boxes = box_algebra.object_boxes(rows)
     for header in headers:
-        for row_num, row in enumerate(rows):
-            row_height = row['bbox'][3] - row['bbox'][1]
-            min_row_overlap = max(row['bbox'][1], header['bbox'][1])
-            max_row_overlap = min(row['bbox'][3], header['bbox'][3])
-            overlap_height = max_row_overlap - min_row_overlap
-            if overlap_height / row_height >= 0.5:
-                header_row_nums.append(row_num)
+        overlap_fraction = box_algebra.overlap_fraction(row_boxes[:, 1], row_boxes[:, 3], header['bbox'][1], header['bbox'][3], row_boxes[:, 3] - row_boxes[:, 1])
+        header_row_nums.extend(np.flatnonzero(overlap_fraction >= 0.5).tolist())
 
     if len(header_row_nums) == 0:
         return aligned_headers
 
-    header_rect = Rect()
     if header_row_nums[0] > 0:
         header_row_nums = list(range(header_row_nums[0]+1)) + header_row_nums
 
+    header_boxes = []
     last_row_num = -1
     for row_num in header_row_nums:
         if row_num == last_row_num + 1:
             row = rows[row_num]
             row['column header'] = True
-            header_rect = header_rect.include_rect(row['bbox'])
+            header_boxes.append(row['bbox'])
             last_row_num = row_num
         else:
             # Break as soon as a non-header row is encountered.
@@ -116,7 +107,7 @@ def align_headers(headers, rows):
             # Having more than 1 header is not supported currently.
             break
 
-    header = {'bbox': list(header_rect)}
+    header = {'bbox': box_algebra.include_all(header_boxes)}
     aligned_headers.append(header)
 
     return aligned_headers
@@ -171,6 +162,13 @@ def outputs_to_objects(outputs, img_size, class_idx2name):
 
     return objects
 
+def mark_header_rows(rows, column_headers):
+    '''column header와 절반 이상 겹치는 행 표시 (행 x header 한 번에 계산)'''
+    in_header = box_algebra.iob(box_algebra.object_boxes(rows), box_algebra.object_boxes(column_headers)) >= 0.5
+    for obj, header in zip(rows, in_header.any(axis=1)):
+        obj['column header'] = bool(header)
+
+
 def objects_to_structures(objects, class_thresholds):
     """
     Process the bounding boxes produced by the table structure recognition model into
@@ -191,11 +189,7 @@ def objects_to_structures(objects, class_thresholds):
         rows = [obj for obj in table_objects if obj['label'] == 'row']
         column_headers = [obj for obj in table_objects if obj['label'] == 'column header']
         spanning_cells = [obj for obj in table_objects if obj['label'] == 'spanning cell']
-        for obj in rows:
-            obj['column header'] = False
-            for header_obj in column_headers:
-                if iob(obj['bbox'], header_obj['bbox']) >= 0.5:
-                    obj['column header'] = True
+        mark_header_rows(rows, column_headers)
 
         # Refine table structures
         rows = postprocess.refine_rows(rows)
@@ -203,12 +197,8 @@ def objects_to_structures(objects, class_thresholds):
 
         # Shrink table bbox to just the total height of the rows
         # and the total width of the columns
-        row_rect = Rect()
-        for obj in rows:
-            row_rect.include_rect(obj['bbox'])
-        column_rect = Rect() 
-        for obj in columns:
-            column_rect.include_rect(obj['bbox'])
+        row_rect = box_algebra.include_all([obj['bbox'] for obj in rows])
+        column_rect = box_algebra.include_all([obj['bbox'] for obj in columns])
         row_column_bbox = [column_rect[0], row_rect[1], column_rect[2], row_rect[3]]
 
         # Process the rows and columns into a complete segmented table
@@ -227,7 +217,8 @@ def objects_to_structures(objects, class_thresholds):
 
 
     for table in tables:
-        table_objects = [obj for obj in objects if iob(obj['bbox'], table['bbox']) >= 0.5]
+        in_table = box_algebra.iob(box_algebra.object_boxes(objects), [table['bbox']])[:, 0] >= 0.5
+        table_objects = [obj for obj, inside in zip(objects, in_table) if inside]
 
         structure = {}
 
@@ -236,11 +227,7 @@ def objects_to_structures(objects, class_thresholds):
         column_headers = [obj for obj in table_objects if obj['label'] == 'column header']
         spanning_cells = [obj for obj in table_objects if obj['label'] == 'spanning cell']
 
-        for obj in rows:
-            obj['column header'] = False
-            for header_obj in column_headers:
-                if iob(obj['bbox'], header_obj['bbox']) >= 0.5:
-                    obj['column header'] = True
+        mark_header_rows(rows, column_headers)
 
         # Refine table structures
         rows = postprocess.refine_rows(rows)
@@ -248,12 +235,8 @@ def objects_to_structures(objects, class_thresholds):
 
         # Shrink table bbox to just the total height of the rows
         # and the total width of the columns
-        row_rect = Rect()
-        for obj in rows:
-            row_rect.include_rect(obj['bbox'])
-        column_rect = Rect() 
-        for obj in columns:
-            column_rect.include_rect(obj['bbox'])
+        row_rect = box_algebra.include_all([obj['bbox'] for obj in rows])
+        column_rect = box_algebra.include_all([obj['bbox'] for obj in columns])
         table['row_column_bbox'] = [column_rect[0], row_rect[1], column_rect[2], row_rect[3]]
         table['bbox'] = table['row_column_bbox']
 
@@ -288,48 +271,49 @@ def structure_to_cells(table_structure):
     cells = []
     subcells = []
 
+    # 격자 셀 [column, row] = 행과 열의 교집합, 모든 셀 x spanning cell의 겹침을 한 번에 계산
+    column_boxes = box_algebra.object_boxes(columns)
+    row_boxes = box_algebra.object_boxes(rows)
+    spanning_boxes = box_algebra.object_boxes(spanning_cells)
+    grid_boxes = box_algebra.intersect(row_boxes[None, :, :], column_boxes[:, None, :]).reshape(-1, 4)
+    grid_areas = box_algebra.area(grid_boxes)
+    if len(spanning_cells) > 0 and np.any(grid_areas == 0):
+        raise ZeroDivisionError('float division by zero')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        in_spanning = (box_algebra.intersection_area(grid_boxes, spanning_boxes) / grid_areas[:, None] > 0.5).any(axis=1)
+
     # Identify complete cells and subcells
-    for column_num, column in enumerate(columns):
+    grid_bboxes = grid_boxes.tolist()
+    cell_num = 0
+    for column_num in range(len(columns)):
         for row_num, row in enumerate(rows):
-            column_rect = Rect(list(column['bbox']))
-            row_rect = Rect(list(row['bbox']))
-            cell_rect = row_rect.intersect(column_rect)
             header = 'column header' in row and row['column header']
-            cell = {'cell_bbox': list(cell_rect), 'column_nums': [column_num], 'row_nums': [row_num],
+            cell = {'cell_bbox': grid_bboxes[cell_num], 'column_nums': [column_num], 'row_nums': [row_num],
                     'column header': header}
-
-            for spanning_cell in spanning_cells:
-                spanning_cell_rect = Rect(list(spanning_cell['bbox']))
-                if (spanning_cell_rect.intersect(cell_rect).get_area()
-                        / cell_rect.get_area()) > 0.5:
-                    subcells.append(cell)
-                    break
+            if in_spanning[cell_num]:
+                subcells.append(cell)
             else:
                 cells.append(cell)
+            cell_num += 1
 
-    for spanning_cell in spanning_cells:
-        spanning_cell_rect = Rect(list(spanning_cell['bbox']))
+    # subcell은 넓이가 0보다 크다 (위에서 spanning cell과 겹친 비율을 구한 셀)
+    subcell_boxes = box_algebra.object_boxes(subcells, 'cell_bbox')
+    subcell_in_spanning = box_algebra.intersection_area(subcell_boxes, spanning_boxes) / box_algebra.area(subcell_boxes)[:, None] > 0.5
+    for spanning_num in range(len(spanning_cells)):
         cell_columns = set()
         cell_rows = set()
-        cell_rect = None
         header = True
-        for subcell in subcells:
-            subcell_rect = Rect(list(subcell['cell_bbox']))
-            subcell_rect_area = subcell_rect.get_area()
-            if (subcell_rect.intersect(spanning_cell_rect).get_area()
-                    / subcell_rect_area) > 0.5:
-                if cell_rect is None:
-                    cell_rect = Rect(list(subcell['cell_bbox']))
-                else:
-                    cell_rect.include_rect(Rect(list(subcell['cell_bbox'])))
-                cell_rows = cell_rows.union(set(subcell['row_nums']))
-                cell_columns = cell_columns.union(set(subcell['column_nums']))
-                # By convention here, all subcells must be classified
-                # as header cells for a spanning cell to be classified as a header cell;
-                # otherwise, this could lead to a non-rectangular header region
-                header = header and 'column header' in subcell and subcell['column header']
+        matched = [subcells[i] for i in np.flatnonzero(subcell_in_spanning[:, spanning_num])]
+        for subcell in matched:
+            cell_rows = cell_rows.union(set(subcell['row_nums']))
+            cell_columns = cell_columns.union(set(subcell['column_nums']))
+            # By convention here, all subcells must be classified
+            # as header cells for a spanning cell to be classified as a header cell;
+            # otherwise, this could lead to a non-rectangular header region
+            header = header and 'column header' in subcell and subcell['column header']
         if len(cell_rows) > 0 and len(cell_columns) > 0:
-            cell = {'cell_bbox': list(cell_rect), 'column_nums': list(cell_columns), 'row_nums': list(cell_rows),
+            cell_rect = box_algebra.include_all([subcell['cell_bbox'] for subcell in matched[1:]], start=matched[0]['cell_bbox'])
+            cell = {'cell_bbox': cell_rect, 'column_nums': list(cell_columns), 'row_nums': list(cell_rows),
                     'column header': header}
             cells.append(cell)
 
@@ -338,20 +322,21 @@ def structure_to_cells(table_structure):
     dilated_columns = columns
     #dilated_rows = fill_row_gaps(rows, table_bbox)
     dilated_rows = rows
-    for cell in cells:
-        column_rect = Rect()
-        for column_num in cell['column_nums']:
-            column_rect.include_rect(list(dilated_columns[column_num]['bbox']))
-        row_rect = Rect()
-        for row_num in cell['row_nums']:
-            row_rect.include_rect(list(dilated_rows[row_num]['bbox']))
-        cell_rect = column_rect.intersect(row_rect)
-        cell['cell_bbox'] = list(cell_rect)
+    column_rects = [box_algebra.include_all([dilated_columns[column_num]['bbox'] for column_num in cell['column_nums']]) for cell in cells]
+    row_rects = [box_algebra.include_all([dilated_rows[row_num]['bbox'] for row_num in cell['row_nums']]) for cell in cells]
+    for cell, cell_rect in zip(cells, box_algebra.intersect(box_algebra.boxes(column_rects), box_algebra.boxes(row_rects)).tolist()):
+        cell['cell_bbox'] = cell_rect
 
     return cells
 
 
 def visualize_cells(img, cells, out_path):
+    # 시각화는 디버그 모드에서만 하므로 matplotlib은 쓸 때 import
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
     plt.imshow(img, interpolation="lanczos")
     plt.gcf().set_size_inches(20, 20)
     ax = plt.gca()
@@ -401,7 +386,7 @@ def visualize_cells(img, cells, out_path):
 
 
 class TableExtractionPipeline(object):
-    def __init__(self, str_model_path=None, str_config_path=None):
+    def __init__(self, str_model_path=None, str_config_path=None, quantize=TATR_QUANTIZE):
         self.str_class_name2idx = get_class_map()
         self.str_class_idx2name = {v:k for k, v in self.str_class_name2idx.items()}
         self.str_class_thresholds = structure_class_thresholds
@@ -422,50 +407,84 @@ class TableExtractionPipeline(object):
 
         self.str_model.to(self.str_device)
         self.str_model.eval()
+        if quantize:
+            self.str_model = quantize_tatr(self.str_model, self.str_device)
         print("TATR loaded.")
 
     def recognize(self, img):
-        out_formats = {}
+        return self.recognize_batch([img])[0]
 
+    def recognize_batch(self, imgs):
+        '''표 이미지 목록의 셀 구조 목록 (입력 순서대로, 표마다 따로 추론)'''
         if self.str_model is None:
             print("No structure model loaded.")
-            return out_formats
+            return [{} for _ in imgs]
 
-        # Transform the image how the model expects it
-        img_tensor = structure_transform(img)
+        results = []
+        for objects in self.detect_objects(imgs):
+            # Further process the detected objects so they correspond to a consistent table
+            tables_structure = objects_to_structures(objects, self.str_class_thresholds)
 
-        # Run input image through the model
-        outputs = self.str_model([img_tensor.to(self.str_device)])
+            # Enumerate all table cells: grid cells and spanning cells
+            tables_cells = [structure_to_cells(structure) for structure in tables_structure]
 
-        # Post-process detected objects, assign class labels
-        objects = outputs_to_objects(outputs, img.size, self.str_class_idx2name)
+            results.append(tables_cells[0])  # detectron 했으니 하나의 table만 있다고 간주
+        return results
 
-        # Further process the detected objects so they correspond to a consistent table 
-        tables_structure = objects_to_structures(objects, self.str_class_thresholds)
+    def detect_objects(self, imgs):
+        '''표 이미지 목록의 모델 검출 결과 (행, 열, header, spanning cell 목록) 목록
+        표마다 따로 추론한다 (MaxResize가 비율을 유지해서 크기가 같은 표가 거의 없고, padding해서 묶으면 표 가장자리 feature가 달라진다)
+        autograd 없이 (inference_mode) 실행해서 중간 activation을 남기지 않는다'''
+        results = []
+        with torch.inference_mode():
+            for img in imgs:
+                # Transform the image how the model expects it
+                img_tensor = structure_transform(img)
 
-        # Enumerate all table cells: grid cells and spanning cells
-        tables_cells = [structure_to_cells(structure) for structure in tables_structure]
+                # Run input image through the model
+                outputs = self.str_model([img_tensor.to(self.str_device)])
 
-        return tables_cells[0]  # detectron 했으니 하나의 table만 있다고 간주
+                # Post-process detected objects, assign class labels
+                results.append(outputs_to_objects(outputs, img.size, self.str_class_idx2name))
+        return results
 
 
-pipe = TableExtractionPipeline(
+# 처음 표를 인식할 때 로드
+pipe = LazyModel('TATR', lambda: TableExtractionPipeline(
     str_config_path=tatr_config['config_path'],
     str_model_path=tatr_config['model_path']
-)
+))
+
+def table_image(image_path, table_xyxy, page_images=None):
+    if page_images is not None:
+        # 표 영역만 원래 해상도로 (렌더링하지 않은 PDF 페이지는 그 영역만 렌더링)
+        return Image.fromarray(page_images.clip_rgb(image_path, table_xyxy))
+    return Image.open(image_path).convert("RGB").crop(table_xyxy)
+
+
+def infer_batch(tables, page_images=None, oid=''):
+    '''여러 페이지의 표 [(image_path, table_xyxy, table_meta), ...]를 표마다 인식하고 (저장된 셀 구조가 있으면 재사용)
+    표별 셀 구조 목록 반환 (입력 순서대로), 셀 구조 JSON은 디버그/감사 모드에서만 저장'''
+    images = [table_image(image_path, table_xyxy, page_images) for image_path, table_xyxy, _ in tables]
 
-def infer(image_path, table_xyxy, table_meta):
-    image = Image.open(image_path).convert("RGB")
-    image = image.crop(table_xyxy)
+    # 같은 표 이미지를 이전에 인식했으면 저장된 셀 구조 사용
+    cache_keys = [image_key(np.asarray(image)) for image in images]
+    structures = [artifact_cache.get('tatr', key) for key in cache_keys]
+    missing = [i for i, structure in enumerate(structures) if structure is None]
+    if missing:
+        recognized = pipe.get().recognize_batch([images[i] for i in missing])
+        for i, table_structure in zip(missing, recognized):
+            structures[i] = postprocess.widen_row(table_structure)
+            artifact_cache.put('tatr', cache_keys[i], structures[i])
 
-    table_structure = pipe.recognize(image)
-    table_structure = postprocess.widen_row(table_structure)
-    table_structure_json = structure_path(*table_meta)
+    for image, table_structure, (_, _, table_meta) in zip(images, structures, tables):
+        if artifact_writer.enabled:
+            artifact_writer.write_json(structure_path(*table_meta), table_structure, oid)
 
-    with open(table_structure_json, 'w') as f:
-        json.dump(table_structure, f, indent=2)
+        if tatr_config['debug_mode'] == 'True':
+            visualize_cells(image, table_structure, vis_path(*table_meta))
+    return structures
 
-    if tatr_config['debug_mode'] == 'True':
-        visualize_cells(image, table_structure, vis_path(*table_meta))
 
-    return table_structure_json
\ No newline at end of file
+def infer(image_path, table_xyxy, table_meta, page_images=None, oid=''):
+    return infer_batch([(image_path, table_xyxy, table_meta)], page_images, oid)[0]
@@ -1,21 +1,20 @@
 import fitz
 import re
-from common_module import load_json
-
-def get_x_overlap(a, b):
-    a_x0, a_x1 = a[0], a[2]
-    b_x0, b_x1 = b[0], b[1]
-    return max(0, min(a_x1, b_x1) - max(a_x0, b_x0))
-
-def assign_column_by_overlap(ocr_bbox, column_x):
-    max_overlap = 0
-    best_col = None
-    for col_idx, col_x in column_x.items():
-        overlap = get_x_overlap(ocr_bbox, col_x)
-        if overlap > max_overlap:
-            max_overlap = overlap
-            best_col = col_idx
-    return best_col
+import numpy as np
+from check_pdf import fitz_lock
+from tatr.word_index import WordIndex
+
+def assign_columns_by_overlap(ocr_bboxes, column_x):
+    """행의 bbox마다 가로로 가장 많이 겹치는 열 (겹침이 같으면 앞 열, 겹치지 않으면 None)"""
+    if not ocr_bboxes or not column_x:
+        return [None] * len(ocr_bboxes)
+    col_ids = list(column_x)
+    cols = np.array([column_x[c] for c in col_ids], dtype=np.float64)
+    boxes = np.array([b[:4] for b in ocr_bboxes], dtype=np.float64)
+    overlap = np.minimum(boxes[:, 2:3], cols[None, :, 1]) - np.maximum(boxes[:, 0:1], cols[None, :, 0])
+    best = overlap.argmax(axis=1)
+    best_overlap = overlap[np.arange(len(boxes)), best]
+    return [col_ids[b] if o > 0 else None for b, o in zip(best.tolist(), best_overlap.tolist())]
 
 def convert_tatr_bbox(tatr_bbox, detectron_bbox):
     """ TATR 셀 좌표를 디텍트론 절대 좌표로 변환 """
@@ -72,15 +71,18 @@ def extract_table_ocr_data(filtered_ocr_data, table_bbox, scale, inclusion_thres
 
     return filtered_fields
 
-def ocr_texts_in_bbox(fields_by_y, cell_bbox):
-    x1, y1, x2, y2 = cell_bbox
+def ocr_field_index(fields):
+    """OCR 필드 중심점 index (FIELD_RELM은 [x, y, w, h])"""
+    centers = [(fx + fw / 2, fy + fh / 2) for fx, fy, fw, fh in (field["FIELD_RELM"] for field in fields)]
+    return WordIndex(fields, centers)
+
+
+def ocr_texts_in_bbox(field_index, cell_bbox):
     matched = []
-    for field in fields_by_y:
-        fx, fy, fw, fh = field["FIELD_RELM"]
-        cx = fx + fw / 2
-        cy = fy + fh / 2
-        if y1 <= cy <= y2 and x1 <= cx <= x2:
-            matched.append(((cy, cx), field["FIELD_TEXT"], [fx, fy, fx + fw, fy + fh]))
+    for i in field_index.in_box(cell_bbox):
+        fx, fy, fw, fh = field_index.items[i]["FIELD_RELM"]
+        cx, cy = field_index.centers[i]
+        matched.append(((cy, cx), field_index.items[i]["FIELD_TEXT"], [fx, fy, fx + fw, fy + fh]))
     matched.sort()
     return [t[1] for t in matched], [t[2] for t in matched]
 
@@ -93,6 +95,7 @@ def map_ocr_with_cell(tatr_data, ocr_fields, detectron_bbox):
     new_cells = []
     simple_cells = []  # 병합되지 않은 컬럼헤더 셀 후보
     fields_by_y = sorted(ocr_fields, key=lambda f: f["FIELD_RELM"][1] + f["FIELD_RELM"][3]/2)
+    field_index = ocr_field_index(fields_by_y)
 
     # 1차 처리: 셀 병합 분리 및 텍스트 추출
     for cell in tatr_data:
@@ -100,7 +103,7 @@ def map_ocr_with_cell(tatr_data, ocr_fields, detectron_bbox):
 
         row_nums = cell["row_nums"]
         col_nums = cell["column_nums"]
-        text, text_bbox = ocr_texts_in_bbox(fields_by_y, cell["cell_bbox"])
+        text, text_bbox = ocr_texts_in_bbox(field_index, cell["cell_bbox"])
 
         for row in row_nums:
             for col in col_nums:
@@ -132,25 +135,26 @@ def map_ocr_with_cell(tatr_data, ocr_fields, detectron_bbox):
     return new_cells
 
 
-def pdf_texts_in_bbox(words, cell_bbox):
-    x1, y1, x2, y2 = cell_bbox
-    matched_words = []
-    for word in words:
-        if x1 <= word[5] <= x2 and y1 <= word[6] <= y2:
-            matched_words.append(word)
-    return matched_words
+def pdf_text_index(words):
+    """scale_texts_data 결과의 중심점(word[5], word[6]) index"""
+    return WordIndex(words, [(word[5], word[6]) for word in words])
+
+
+def pdf_texts_in_bbox(word_index, cell_bbox):
+    return word_index.items_in_box(cell_bbox)
 
 
 def map_pdf_with_cell(tatr_data, texts_data, detectron_bbox):
     """row_nums 또는 column_nums에 병합된 셀을 개별 셀로 나눠 동일한 텍스트를 복제"""
     new_cells = []
+    word_index = pdf_text_index(texts_data)    # 셀마다 표 단어 전체를 훑지 않도록 한 번만 만든다
 
     for cell in tatr_data:
         cell["cell_bbox"] = convert_tatr_bbox(cell["cell_bbox"], detectron_bbox)
 
         row_nums = cell["row_nums"]
         col_nums = cell["column_nums"]
-        matched_words = pdf_texts_in_bbox(texts_data, cell["cell_bbox"])
+        matched_words = pdf_texts_in_bbox(word_index, cell["cell_bbox"])
 
         for row in row_nums:
             for col in col_nums:
@@ -312,8 +316,13 @@ def build_page_table_structure(texts_data, tatr_data, split_cells, source):
         min_y = float('inf')
         max_y = float('-inf')
         texts_by_column = {col: [] for col in range(total_columns)}
+        if source == 'OCR':
+            group_bboxes = [[x, y, x + w, y + h] for x, y, w, h in (field["FIELD_RELM"] for field in group)]
+        else:
+            group_bboxes = [field[:4] for field in group]
+        group_columns = assign_columns_by_overlap(group_bboxes, column_x)
 
-        for field in group:
+        for field, col_idx in zip(group, group_columns):
             if source == 'OCR': # OCR 그룹에서 y 좌표 범위 계산 (행의 위아래 좌표)
                 x, y, w, h = field["FIELD_RELM"]
                 min_y = min(min_y, y)
@@ -328,7 +337,6 @@ def build_page_table_structure(texts_data, tatr_data, split_cells, source):
                 ocr_bbox = field[:4]
                 text = field[4]
 
-            col_idx = assign_column_by_overlap(ocr_bbox, column_x)
             if col_idx is not None:
                 texts_by_column[col_idx].append((x, text, ocr_bbox))
 
@@ -349,7 +357,7 @@ def build_page_table_structure(texts_data, tatr_data, split_cells, source):
                 "value": " ".join(text_value),
                 "text": text_value,
                 "text_bbox": text_bbox,
-                "cell_bbox": save_bbox
+                "cell_bbox": list(save_bbox)    # 열이 없으면 앞 열 bbox를 다시 쓰므로 복사
             })
 
         table.append(row)
@@ -359,11 +367,12 @@ def build_page_table_structure(texts_data, tatr_data, split_cells, source):
 
 
 def ocr_row_values(row):
+    # 병합셀을 나눈 셀들은 text, bbox 목록을 같이 쓰므로 행 값마다 복사
     return [{
         "value": " ".join(c["text"]),
-        "text": c["text"],
-        "text_bbox": c["text_bbox"],
-        "cell_bbox": c["cell_bbox"]
+        "text": list(c["text"]),
+        "text_bbox": list(c["text_bbox"]),
+        "cell_bbox": list(c["cell_bbox"])
     } for c in row]
 
 
@@ -372,7 +381,7 @@ def pdf_text_row_values(row):
         "value": " ".join(word[4] for word in c['words']),
         "text": [word[4] for word in c['words']],
         "text_bbox": [word[:4] for word in c['words']],
-        "cell_bbox": c["cell_bbox"]
+        "cell_bbox": list(c["cell_bbox"])   # 병합셀을 나눈 셀들이 같이 쓰는 bbox라 복사
     } for c in row]
 
 
@@ -407,11 +416,12 @@ def pdf_text_row_values(row):
 #     }
 
 
-def join_table_structure_with_pdf_text(text_page, tatr_json_path, table_bbox, scale):
-    """텍스트PDF의 텍스트 정보와 TATR 테이블 구조 병합"""
-    tatr_data = load_json(tatr_json_path)    # TATR 데이터 로드
+def join_table_structure_with_pdf_text(text_page, table_structure, table_bbox, scale):
+    """텍스트PDF의 텍스트 정보와 TATR 테이블 구조(infer_batch 결과) 병합, table_structure는 바꾸지 않는다"""
+    tatr_data = [dict(cell) for cell in table_structure]    # cell_bbox를 페이지 좌표로 바꾸므로 셀만 복사
 
-    texts_data = text_page.get_text("words", clip=[x / scale for x in table_bbox])
+    with fitz_lock:  # 다른 스레드의 페이지 렌더링과 겹치지 않게
+        texts_data = text_page.get_text("words", clip=[x / scale for x in table_bbox])
 
     texts_data = scale_texts_data(texts_data, scale)
 
@@ -3,8 +3,11 @@ Copyright (C) 2021 Microsoft Corporation
 """
 from collections import defaultdict
 
+import numpy as np
 from fitz import Rect
 
+import tatr.box_algebra as box_algebra
+
 
 def apply_threshold(objects, threshold):
     """
@@ -194,30 +197,8 @@ def nms(objects, match_criteria="object2_overlap", match_threshold=0.05, keep_hi
 
     objects = sort_objects_by_score(objects, reverse=keep_higher)
 
-    num_objects = len(objects)
-    suppression = [False for obj in objects]
-
-    for object2_num in range(1, num_objects):
-        object2_rect = Rect(objects[object2_num]['bbox'])
-        object2_area = object2_rect.get_area()
-        for object1_num in range(object2_num):
-            if not suppression[object1_num]:
-                object1_rect = Rect(objects[object1_num]['bbox'])
-                object1_area = object1_rect.get_area()
-                intersect_area = object1_rect.intersect(object2_rect).get_area()
-                try:
-                    if match_criteria=="object1_overlap":
-                        metric = intersect_area / object1_area
-                    elif match_criteria=="object2_overlap":
-                        metric = intersect_area / object2_area
-                    elif match_criteria=="iou":
-                        metric = intersect_area / (object1_area + object2_area - intersect_area)
-                    if metric >= match_threshold:
-                        suppression[object2_num] = True
-                        break
-                except Exception:
-                    # Intended to recover from divide-by-zero
-                    pass
+    # 모든 쌍의 겹침을 한 번에 계산 (넓이가 0이라 비율을 구할 수 없는 쌍은 건너뜀)
+    suppression = box_algebra.nms_suppression(box_algebra.object_boxes(objects), match_criteria, match_threshold)
 
     return [obj for idx, obj in enumerate(objects) if not suppression[idx]]
 
@@ -230,28 +211,27 @@ def align_supercells(supercells, rows, columns):
     """
     aligned_supercells = []
 
+    row_boxes = box_algebra.object_boxes(rows)
+    column_boxes = box_algebra.object_boxes(columns)
+    header_rows = ['header' in row and row['header'] for row in rows]
+    row_heights = row_boxes[:, 3] - row_boxes[:, 1]
+    column_widths = column_boxes[:, 2] - column_boxes[:, 0]
+
     for supercell in supercells:
         supercell['header'] = False
-        row_bbox_rect = None
-        col_bbox_rect = None
+        # 모든 행과 겹치는 높이 비율을 한 번에 계산
+        supercell_height = supercell['bbox'][3] - supercell['bbox'][1]
+        overlap_fraction = box_algebra.overlap_fraction(row_boxes[:, 1], row_boxes[:, 3], supercell['bbox'][1], supercell['bbox'][3], row_heights)
+        if 'span' in supercell:
+            overlap_fraction = np.maximum(overlap_fraction,
+                                          box_algebra.overlap_fraction(row_boxes[:, 1], row_boxes[:, 3], supercell['bbox'][1], supercell['bbox'][3], supercell_height))
         intersecting_header_rows = set()
         intersecting_data_rows = set()
-        for row_num, row in enumerate(rows):
-            row_height = row['bbox'][3] - row['bbox'][1]
-            supercell_height = supercell['bbox'][3] - supercell['bbox'][1]
-            min_row_overlap = max(row['bbox'][1], supercell['bbox'][1])
-            max_row_overlap = min(row['bbox'][3], supercell['bbox'][3])
-            overlap_height = max_row_overlap - min_row_overlap
-            if 'span' in supercell:
-                overlap_fraction = max(overlap_height/row_height,
-                                       overlap_height/supercell_height)
+        for row_num in np.flatnonzero(overlap_fraction >= 0.5).tolist():
+            if header_rows[row_num]:
+                intersecting_header_rows.add(row_num)
             else:
-                overlap_fraction = overlap_height / row_height
-            if overlap_fraction >= 0.5:
-                if 'header' in row and row['header']:
-                    intersecting_header_rows.add(row_num)
-                else:
-                    intersecting_data_rows.add(row_num)
+                intersecting_data_rows.add(row_num)
 
         # Supercell cannot span across the header boundary; eliminate whichever
         # group of rows is the smallest
@@ -267,39 +247,25 @@ def align_supercells(supercells, rows, columns):
             continue # Require span supercell to be in the header
         intersecting_rows = intersecting_data_rows.union(intersecting_header_rows)
         # Determine vertical span of aligned supercell
-        for row_num in intersecting_rows:
-            if row_bbox_rect is None:
-                row_bbox_rect = Rect(rows[row_num]['bbox'])
-            else:
-                row_bbox_rect = row_bbox_rect.include_rect(rows[row_num]['bbox'])
-        if row_bbox_rect is None:
+        if len(intersecting_rows) == 0:
             continue
-
-        intersecting_cols = []
-        for col_num, col in enumerate(columns):
-            col_width = col['bbox'][2] - col['bbox'][0]
-            supercell_width = supercell['bbox'][2] - supercell['bbox'][0]
-            min_col_overlap = max(col['bbox'][0], supercell['bbox'][0])
-            max_col_overlap = min(col['bbox'][2], supercell['bbox'][2])
-            overlap_width = max_col_overlap - min_col_overlap
-            if 'span' in supercell:
-                overlap_fraction = max(overlap_width/col_width,
-                                       overlap_width/supercell_width)
-                # Multiply by 2 effectively lowers the threshold to 0.25
-                if supercell['header']:
-                    overlap_fraction = overlap_fraction * 2
-            else:
-                overlap_fraction = overlap_width / col_width
-            if overlap_fraction >= 0.5:
-                intersecting_cols.append(col_num)
-                if col_bbox_rect is None:
-                    col_bbox_rect = Rect(col['bbox'])
-                else:
-                    col_bbox_rect = col_bbox_rect.include_rect(col['bbox'])
-        if col_bbox_rect is None:
+        row_nums = list(intersecting_rows)
+        row_bbox_rect = box_algebra.include_all([rows[row_num]['bbox'] for row_num in row_nums[1:]], start=rows[row_nums[0]]['bbox'])
+
+        supercell_width = supercell['bbox'][2] - supercell['bbox'][0]
+        overlap_fraction = box_algebra.overlap_fraction(column_boxes[:, 0], column_boxes[:, 2], supercell['bbox'][0], supercell['bbox'][2], column_widths)
+        if 'span' in supercell:
+            overlap_fraction = np.maximum(overlap_fraction,
+                                          box_algebra.overlap_fraction(column_boxes[:, 0], column_boxes[:, 2], supercell['bbox'][0], supercell['bbox'][2], supercell_width))
+            # Multiply by 2 effectively lowers the threshold to 0.25
+            if supercell['header']:
+                overlap_fraction = overlap_fraction * 2
+        intersecting_cols = np.flatnonzero(overlap_fraction >= 0.5).tolist()
+        if len(intersecting_cols) == 0:
             continue
+        col_bbox_rect = box_algebra.include_all([columns[col_num]['bbox'] for col_num in intersecting_cols[1:]], start=columns[intersecting_cols[0]]['bbox'])
 
-        supercell_bbox = list(row_bbox_rect.intersect(col_bbox_rect))
+        supercell_bbox = box_algebra.intersect_one(row_bbox_rect, col_bbox_rect)
         supercell['bbox'] = supercell_bbox
 
         # Only a true supercell if it joins across multiple rows or columns
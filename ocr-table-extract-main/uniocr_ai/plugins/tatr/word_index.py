@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+'''표 단어(텍스트 PDF 단어, OCR 필드)를 셀에 배정할 때 쓰는 중심점 grid index
+셀마다 표 단어 전체를 훑던 반복(셀 수 x 단어 수)을 셀이 걸친 grid 칸의 단어만 비교하도록 바꾼다.
+결과(단어와 순서)는 기존 반복문과 같다: 중심점이 셀 안(경계 포함)인 단어를 넣은 순서대로'''
+import math
+
+CELL_WORDS = 4      # grid 칸 하나에 들어갈 평균 단어 수
+
+
+class WordIndex:
+    '''단어 목록을 한 번 넣어두고 영역별로 중심점이 안에 있는 단어를 찾는다
+    items: 단어(원래 객체 그대로 돌려준다), centers: 단어별 중심점 (x, y)'''
+    def __init__(self, items, centers, cell_size=None):
+        self.items = list(items)
+        self.centers = [(c[0], c[1]) for c in centers]
+        self.cells = dict()     # (칸 x, 칸 y) -> 단어 번호 목록 (오름차순)
+        if not self.items:
+            return
+
+        xs = [c[0] for c in self.centers]
+        ys = [c[1] for c in self.centers]
+        self.x0, self.y0 = min(xs), min(ys)
+        width, height = max(max(xs) - self.x0, 1.0), max(max(ys) - self.y0, 1.0)
+        if cell_size is None:
+            cell_size = math.sqrt(width * height * CELL_WORDS / len(self.items))
+        self.cell_size = max(cell_size, 1e-3)
+        self.columns = int(width // self.cell_size) + 1
+        self.rows = int(height // self.cell_size) + 1
+        for i, (cx, cy) in enumerate(self.centers):
+            self.cells.setdefault(self._cell(cx, cy), []).append(i)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cell(self, x, y):
+        cx = min(max(int((x - self.x0) // self.cell_size), 0), self.columns - 1)
+        cy = min(max(int((y - self.y0) // self.cell_size), 0), self.rows - 1)
+        return cx, cy
+
+    def in_box(self, bbox):
+        '''중심점이 bbox [x1, y1, x2, y2] 안(경계 포함)인 단어 번호 (넣은 순서)'''
+        x1, y1, x2, y2 = bbox[:4]
+        if not self.cells or x1 > x2 or y1 > y2:
+            return []
+        cx1, cy1 = self._cell(x1, y1)
+        cx2, cy2 = self._cell(x2, y2)
+        centers = self.centers
+        matched = []
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                for i in self.cells.get((cx, cy), ()):
+                    if x1 <= centers[i][0] <= x2 and y1 <= centers[i][1] <= y2:
+                        matched.append(i)
+        matched.sort()
+        return matched
+
+    def items_in_box(self, bbox):
+        return [self.items[i] for i in self.in_box(bbox)]
@@ -1,44 +1,153 @@
+import time
+
+import cv2
 import fitz # PyMuPDF
 from PIL import Image
 
-from common_module import page_status, write_log
-from configs import etc_config, pdf_config
+from check_pdf import fitz_lock
+from common_module import Status, page_status, write_log
+from configs import etc_config, page_image_config, pdf_config
 from file_manager import source_image
-from preprocess_image import correct_skew, pix_to_image
+from page_pool import ordered_map
+from preprocess_image import correct_skew, estimate_skew, pix_to_image, rotate
 
 PDF_TO_IMAGE_SCALE = float(pdf_config['PDF_TO_IMAGE_SCALE'])
+PREVIEW_SCALE = float(pdf_config['PREVIEW_SCALE'])
+# 텍스트 PDF 페이지와 기울지 않은 이미지 페이지는 픽셀이 필요할 때만 렌더링 (False면 모든 페이지를 렌더링/기울기 보정)
+LAZY_RENDER = page_image_config['LAZY_RENDER'] == 'True'
+
+def render_page(page, scale=PDF_TO_IMAGE_SCALE, clip=None):
+    '''페이지를 scale로 렌더링해서 cv2 이미지로 반환, clip (PDF 좌표)이 있으면 그 영역만'''
+    mat = fitz.Matrix(scale, scale)  # zoom factor 2 in each dimension
+    with fitz_lock:
+        pix = page.get_pixmap(matrix=mat, clip=clip)  # render page to an image
+    return pix_to_image(pix)
+
+
+def page_size(page, scale=PDF_TO_IMAGE_SCALE):
+    '''렌더링하지 않고 구한 페이지 이미지 (width, height) 픽셀 (get_pixmap 결과와 같은 크기)'''
+    rect = (page.rect * fitz.Matrix(scale, scale)).irect
+    return rect.width, rect.height
+
+
+def save_page_image(image_path, image, uid, page_images, page_no=None, size=None):
+    '''기울기 보정 후 페이지 이미지를 page_images에 등록 (페이지별로 병렬 실행 가능)
+    image가 None이면 렌더링하지 않고 등록만 한 텍스트 페이지
+    page_no가 있으면 image는 PDF 페이지의 저해상도 렌더링이라 기울기만 추정하고,
+    기울지 않았으면 원래 해상도 렌더링 없이 등록, 기울었으면 원래 해상도로 렌더링해서 회전한다
+    (image_path, 기울기 보정에 걸린 시간) 반환'''
+    if image is None:
+        write_log(f'[page_to_image] path:{image_path}, 텍스트 페이지 렌더링 생략', etc_config['LOG_LEVEL_INFO'], uid)
+        return image_path, 0.0
+
+    start = time.time()
+    # 저해상도 렌더링이면 Hough 기준도 그 배율만큼 줄여서 추정
+    angle = estimate_skew(image, PREVIEW_SCALE / PDF_TO_IMAGE_SCALE if page_no is not None else 1.0)
+    estimate_time = time.time() - start
+    log = f'[page_to_image] path:{image_path}, 기울기 추정 {estimate_time:.3f}초'
+
+    if page_no is not None:
+        if not angle:
+            page_images.put_pdf_page(image_path, page_no, size)
+            write_log(log + ', 렌더링 생략', etc_config['LOG_LEVEL_INFO'], uid)
+            return image_path, estimate_time
+        image = page_images.render(page_no)
+
+    rotate_time = 0.0
+    if angle:
+        start = time.time()
+        image = rotate(image, angle)
+        rotate_time = time.time() - start
+        log += f', {angle}˚ rotated ({rotate_time:.3f}초)'
+    page_images.put(image_path, image)
+    write_log(log, etc_config['LOG_LEVEL_INFO'], uid)
+    return image_path, estimate_time + rotate_time
+
 
 def page_to_image(file_name, page, time_str, uid):
-    mat = fitz.Matrix(PDF_TO_IMAGE_SCALE, PDF_TO_IMAGE_SCALE)  # zoom factor 2 in each dimension
-    pix = page.get_pixmap(matrix=mat)  # render page to an image
     image_path = source_image(time_str, page.number, 'png', file_name)
-    angle = correct_skew(image_path, pix_to_image(pix))
-    if angle:
-        write_log(f'[page_to_image] path:{image_path}, {angle}˚ rotated', etc_config['LOG_LEVEL_INFO'], uid)
-    else:
-        pix.save(image_path)  # store image as a PNG
-        write_log(f'[page_to_image] path:{image_path}', etc_config['LOG_LEVEL_INFO'], uid)
+    image = render_page(page)
+    angle = correct_skew(image_path, image)
+    if not angle:
+        cv2.imwrite(image_path, image)  # store image as a PNG
     return image_path
 
 
-def to_image(doc, time_str, file_name: str, uid: str):
-    '''텍스트PDF 여부 검사, 페이지 이미지 저장을 fitz로 수행'''
-    write_log(f'[to_image] 페이지 수: {len(doc)}', etc_config['LOG_LEVEL_INFO'], uid)
-    pdf_status = list()
-    image_path_list = list()
+class PageStream:
+    '''PDF 페이지를 순서대로 렌더링/기울기 보정하면서 image_path를 하나씩 내보내는 스트림
+    소비하는 단계(detectron, OCR 미리 시작)가 앞 페이지를 처리하는 동안 뒤 페이지를 렌더링한다.
+    LAZY_RENDER이면 텍스트 페이지는 렌더링하지 않고 등록만 해서, detectron/OCR/TATR 등이 요청할 때 필요한 해상도/영역만 렌더링한다.
+    이미지 페이지도 PREVIEW_SCALE로 기울기를 추정해서 기울지 않았으면 같은 방식으로 등록만 한다.
+    pdf_status, rotate, image_path_list는 페이지가 나올 때마다 채워지고, 실패하면 error에 예외를 남기고 멈춘다'''
+    def __init__(self, doc, time_str, file_name: str, uid: str, page_images):
+        self.doc = doc
+        self.time_str = time_str
+        self.file_name = file_name
+        self.uid = uid
+        self.page_images = page_images
+        self.pdf_status = list()
+        self.rotate = dict()
+        self.image_path_list = list()
+        self.error = None
+        self.skew_time = 0.0
+        with fitz_lock:
+            self.page_count = len(doc)
+        page_images.open_pdf(doc.name, PDF_TO_IMAGE_SCALE)
+
+    def _rendered_pages(self):
+        for i in range(self.page_count):
+            # 앞 페이지를 렌더링하는 OCR/detectron 스레드와 겹치지 않게 페이지 정보도 fitz_lock 안에서 읽는다
+            with fitz_lock:
+                page = self.doc.load_page(i)
+                status = page_status(page)
+                rotation = page.rotation
+                size = page_size(page)
+            self.pdf_status.append(status)
+            if rotation:
+                self.rotate[i] = rotation
+            image_path = source_image(self.time_str, i, 'png', self.file_name)
+            if not LAZY_RENDER:
+                yield image_path, render_page(page), self.uid, self.page_images
+            elif status == Status.TEXT:
+                self.page_images.put_pdf_page(image_path, i, size)
+                yield image_path, None, self.uid, self.page_images
+            else:
+                yield image_path, render_page(page, PREVIEW_SCALE), self.uid, self.page_images, i, size
+
+    def __iter__(self):
+        write_log(f'[to_image] 페이지 수: {self.page_count}', etc_config['LOG_LEVEL_INFO'], self.uid)
+        try:
+            for image_path, skew_time in ordered_map(save_page_image, self._rendered_pages()):
+                self.image_path_list.append(image_path)
+                self.skew_time += skew_time
+                yield image_path
+            write_log(f'[to_image] 기울기 보정 총 {self.skew_time:.2f}초', etc_config['LOG_LEVEL_INFO'], self.uid)
+            lazy_pages = self.page_images.lazy_pages()
+            if lazy_pages:
+                write_log(f'[to_image] {lazy_pages}페이지는 필요할 때 렌더링', etc_config['LOG_LEVEL_INFO'], self.uid)
+        except Exception as e:
+            self.error = e
+            write_log(f'[to_image] {len(self.image_path_list)}페이지 이미지 생성 실패: {e}', etc_config['LOG_LEVEL_ERROR'], self.uid)
+
+
+def to_image(doc, time_str, file_name: str, uid: str, page_images):
+    '''텍스트PDF 여부 검사, 페이지 이미지를 fitz로 만들어 page_images에 등록
+    렌더링은 순서대로, 기울기 보정은 페이지별로 병렬 처리'''
+    stream = PageStream(doc, time_str, file_name, uid, page_images)
+    for _ in stream:
+        pass
+    if stream.error:
+        raise stream.error
 
-    rotate = dict()
-    for i, page in enumerate(doc):
-        pdf_status.append(page_status(page))
-        if page.rotation:
-            rotate[i] = page.rotation
-        page_image_path = page_to_image(file_name, page, time_str, uid)
-        image_path_list.append(page_image_path)
+    return stream.image_path_list, stream.rotate, stream.pdf_status
 
-    return image_path_list, rotate, pdf_status
 
+def get_image_size(image_file_path, scale, page_images=None):
+    '''페이지 (height, width), page_images가 있으면 렌더링하지 않은 PDF 페이지도 PDF 페이지 크기로 구한다'''
+    if page_images is not None:
+        width, height = page_images.size(image_file_path)
+        return height / scale, width / scale
 
-def get_image_size(image_file_path, scale):
     # (image_h, image_w, _) = image.shape  # 비상식적으로 height가 먼저 나온다
     # 스캔한 PDF인 경우 image.shape는 width가 먼저 나온다.
     # 경우를 특정하기 애매하기 때문에 PIL로 이미지 크기를 구한다.
@@ -47,4 +156,4 @@ def get_image_size(image_file_path, scale):
     h = image_w / scale
     w = image_h / scale
     im.close()
-    return h, w
\ No newline at end of file
+    return h, w
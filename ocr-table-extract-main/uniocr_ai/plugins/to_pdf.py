@@ -1,5 +1,8 @@
+import threading
 import traceback
 
+from PIL import Image
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
@@ -30,7 +33,18 @@ FONT_FILE = f'./resources/{FONT_NAME}.ttf'
 font_scale = float(pdf_config['FONT_SCALE'])
 font_fit_in: str = pdf_config['FONT_FIT_IN']
 
-pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE))
+font_lock = threading.Lock()
+font_registered = False
+
+
+def register_font():
+    '''OCR 텍스트를 쓸 폰트 등록 (처음 PDF를 만들 때 한 번)'''
+    global font_registered
+    with font_lock:
+        if not font_registered:
+            pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE))
+            font_registered = True
+
 
 def get_pdf_pos_y(y:float, height:float) -> float:
     return height - y
@@ -108,20 +122,29 @@ def put_ocr_fields(page, c):
         c.drawCentredString(x, y, t)
 
 
-def create_image_pdf(output_file_path, ocr_meta, oid):
+def page_image(page_meta, page_images):
+    '''drawImage에 넘길 페이지 이미지 (page_images에 있으면 PNG 파일 없이 메모리에서)'''
+    if page_images is None:
+        return page_meta['PAGE_PATH']
+    return ImageReader(Image.fromarray(page_images.rgb(page_meta['PAGE_PATH'])))
+
+
+def create_image_pdf(output_file_path, ocr_meta, oid, page_images=None):
+    register_font()
     c = canvas.Canvas(output_file_path)
     for page_meta in ocr_meta['PAGES']:
         pw, ph = page_meta['PAGE_WIDTH'], page_meta['PAGE_HEIGHT']
         c.setPageSize((pw, ph))
-        c.drawImage(page_meta['PAGE_PATH'], x=0, y=0, width=pw, height=ph, mask=None)
+        c.drawImage(page_image(page_meta, page_images), x=0, y=0, width=pw, height=ph, mask=None)
         write_log(f"[draw image] {page_meta['PAGE_NO']}페이지", etc_config['LOG_LEVEL_INFO'], oid)
         put_ocr_fields(page_meta, c)
         c.showPage()
     c.save()
 
 
-def create_pdf(input_file_path, output_file_path, ocr_pages: set, ocr_meta: dict, pdf_status:list, rotate: dict, pdf_textfields: dict, oid: str):
+def create_pdf(input_file_path, output_file_path, ocr_pages: set, ocr_meta: dict, pdf_status:list, rotate: dict, pdf_textfields: dict, oid: str, page_images=None):
     """PDF 생성"""
+    register_font()
     reader = PdfReader(input_file_path, decompress=False)
     c = canvas.Canvas(output_file_path)
 
@@ -131,7 +154,7 @@ def create_pdf(input_file_path, output_file_path, ocr_pages: set, ocr_meta: dict
         obj = None
 
         if i in rotate: # 회전 페이지
-            c.drawImage(page_meta['PAGE_PATH'], x=0, y=0, width=pw, height=ph, mask=None)
+            c.drawImage(page_image(page_meta, page_images), x=0, y=0, width=pw, height=ph, mask=None)
             write_log(f"[draw image] {page_meta['PAGE_NO']}페이지 /Rotate: {rotate[i]}", etc_config['LOG_LEVEL_INFO'], oid)
         else:
             try:
@@ -139,7 +162,7 @@ def create_pdf(input_file_path, output_file_path, ocr_pages: set, ocr_meta: dict
                 write_log(f"[draw xobj] {page_meta['PAGE_NO']}페이지, xobj_name:{obj}", etc_config['LOG_LEVEL_INFO'], oid)
 
             except:
-                c.drawImage(page_meta['PAGE_PATH'], x=0, y=0, width=pw, height=ph, mask=None)
+                c.drawImage(page_image(page_meta, page_images), x=0, y=0, width=pw, height=ph, mask=None)
                 write_log(f"[draw image] {page_meta['PAGE_NO']}페이지, Error in pagexobj", etc_config['LOG_LEVEL_INFO'], oid)
 
         if i in ocr_pages:
@@ -1,13 +1,18 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from PIL import Image
 
 from common_module import load_json
 
-def visualize_table_boxes(image_path, json_path, output_path):
+def visualize_table_boxes(image_path, data, output_path):
     """
     테이블과 (선택적) OCR 박스를 시각화하여 저장합니다.
+    data: 페이지 표 구조 (pts, merged)
     """
+    # 디버그 모드에서만 쓰므로 matplotlib은 서버 시작 시 import하지 않음
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
     # 이미지 로드
     img = Image.open(image_path)
     img_width, img_height = img.size
@@ -16,9 +21,6 @@ def visualize_table_boxes(image_path, json_path, output_path):
     dpi = 100
     figsize = (img_width / dpi, img_height / dpi)
     
-    # JSON 로드        
-    data = load_json(json_path)
-
     # 시각화 시작
     fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
     ax.imshow(img)
@@ -160,6 +162,6 @@ if __name__ == "__main__":
     
     visualize_table_boxes(
         image_path=image_path,
-        json_path=json_path,
+        data=load_json(json_path),
         output_path=output_path,
     )
\ No newline at end of file